@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from lark.exceptions import LarkError
+
+import parsetc.parsetc as pt
+
+from parsetc.completion import syllables
+
+# Benchmarks of each stage of conversion, on generated text, so that they
+# can be run offline and repeated exactly: startup (interpreter, import and
+# building parsers), parsing in each input scheme, rendering parse trees in
+# each output scheme, transliterate_all, tone diacritic conversion, and the
+# command line tool. Each is run on corpora of several numbers of lines and
+# words per line. Results are saved as JSON, and can be compared with the
+# results of an earlier run to find regressions.
+
+RESULTS_VERSION = 1
+
+STAGES = ["startup", "parse", "transform", "transliterate_all", "diacritics", "cli"]
+
+# Numbers of lines, and of words per line, of the generated corpora
+SIZES = (100, 1000)
+LENGTHS = (4, 16, 64)
+QUICK_SIZES = (20, 100)
+QUICK_LENGTHS = (4, 16)
+
+# Earley parsing is slow, so it is only run on the smaller corpora
+EARLEY_MAX_SYLLABLES = 1000
+QUICK_EARLEY_MAX_SYLLABLES = 100
+
+# Most syllables per word
+MAX_WORD = 3
+
+# Times each benchmark is run; the fastest run is reported
+REPEAT = 3
+
+# A benchmark regresses if it is slower (or uses more memory) by more than
+# this fraction, and by more than MIN_DELTA seconds
+THRESHOLD = 0.1
+MIN_DELTA = 0.002
+
+# Python code of the command line tool
+CLI = "from parsetc.daemon import main; main()"
+
+# Prepended to the code of commands, to report their peak resident memory
+# (bytes) in the file $PARSETC_BENCH_PEAK when they exit. The maximum
+# resident set size from wait4 cannot be used, as on Linux it includes the
+# memory of the benchmark process before the command was executed. Only on
+# systems with /proc.
+PEAK_HOOK = """import atexit, os
+def _peak():
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmHWM:"):
+                with open(os.environ["PARSETC_BENCH_PEAK"], "w") as out:
+                    out.write(str(int(line.split()[1]) * 1024))
+if os.path.exists("/proc/self/status"):
+    atexit.register(_peak)
+"""
+
+
+# Syllables by input scheme, see `inventory`
+_INVENTORIES = {}
+
+
+def inventory(scheme):
+    """Syllables of an input scheme, without tone
+
+    Only syllables that can be parsed with any tone, and converted into
+    every output scheme, are included.
+    """
+    try:
+        return _INVENTORIES[scheme]
+    except KeyError:
+        pass
+    out = []
+    parser = pt.LALR_PARSER_DICT[scheme]
+    for spelling in syllables(scheme):
+        try:
+            for tone in "18":
+                tree = parser.parse(spelling + tone)
+                for o in pt.TRANSFORMER_DICT:
+                    pt.TRANSFORMER_DICT[o].transform(tree)
+        except (LarkError, KeyError):
+            continue
+        out.append(spelling)
+    _INVENTORIES[scheme] = out
+    return out
+
+
+def make_corpus(scheme, lines, words, seed=0):
+    """Random text in an input scheme, with tone numbers
+
+    Returns
+    -------
+    tuple
+        Lines (list of str), and number of syllables
+    """
+    rng = random.Random(f"{scheme} {lines} {words} {seed}")
+    spellings = inventory(scheme)
+    out = []
+    count = 0
+    for n in range(lines):
+        line = []
+        for w in range(words):
+            size = rng.randint(1, MAX_WORD)
+            count += size
+            line.append(
+                "-".join(rng.choice(spellings) + str(rng.randint(1, 8)) for s in range(size))
+            )
+        out.append(" ".join(line))
+    return out, count
+
+
+def measure(fn, repeat=REPEAT, memory=True):
+    """Time a function, and measure its peak memory use
+
+    Returns
+    -------
+    dict
+        Fastest and mean time (seconds), and peak size of memory allocated
+        by Python in an extra run (bytes, None if not measured)
+    """
+    times = []
+    for n in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": min(times), "mean": statistics.mean(times), "peak_memory": peak}
+
+
+def run_process(code, args=(), repeat=REPEAT, stdin=None):
+    """Time Python code in a new interpreter, and measure its peak memory use
+
+    The command line tool is run in the new interpreter, not by a daemon.
+
+    Arguments
+    ---------
+    code : str
+        Python code
+    args : list
+        Command line arguments (str)
+    stdin : str
+        Standard input, default none
+
+    Returns
+    -------
+    dict
+        As `measure`; peak memory is the largest resident set size (bytes),
+        None where it cannot be measured
+    """
+    times = []
+    peak = None
+    with tempfile.TemporaryDirectory() as tmp:
+        report = os.path.join(tmp, "peak")
+        env = dict(os.environ, PARSETC_NO_DAEMON="1", PARSETC_BENCH_PEAK=report)
+        command = [sys.executable, "-c", PEAK_HOOK + code] + list(args)
+        for n in range(repeat):
+            start = time.perf_counter()
+            proc = subprocess.run(
+                command,
+                env=env,
+                input=None if stdin is None else stdin.encode("utf8"),
+                stdin=subprocess.DEVNULL if stdin is None else None,
+                stdout=subprocess.DEVNULL,
+            )
+            times.append(time.perf_counter() - start)
+            if proc.returncode != 0:
+                raise RuntimeError(f"{' '.join(command)} failed with status {proc.returncode}")
+            if os.path.exists(report):
+                with open(report) as fh:
+                    peak = max(peak or 0, int(fh.read()))
+    return {"seconds": min(times), "mean": statistics.mean(times), "peak_memory": peak}
+
+
+class Suite:
+    """Run benchmarks and collect their results
+
+    Arguments
+    ---------
+    sizes, lengths : tuple
+        Numbers of lines, and of words per line, of the corpora
+    schemes : list
+        Input schemes, default all
+    parser : str
+        Parser for transliterate_all and the command line tool
+    repeat : int
+        Times each benchmark is run
+    memory : bool
+        Measure peak memory use
+    earley_max : int
+        Only parse corpora of at most this many syllables with Earley
+    progress : file
+        Report each result here, None for no reports
+    """
+
+    def __init__(
+        self,
+        sizes=SIZES,
+        lengths=LENGTHS,
+        schemes=None,
+        parser="scan",
+        repeat=REPEAT,
+        memory=True,
+        earley_max=EARLEY_MAX_SYLLABLES,
+        progress=sys.stderr,
+    ):
+        self.sizes = sizes
+        self.lengths = lengths
+        self.schemes = list(pt.INPUT_SCHEMES) if schemes is None else schemes
+        self.parser = parser
+        self.repeat = repeat
+        self.memory = memory
+        self.earley_max = earley_max
+        self.progress = progress
+        self.results = {}
+        self._corpora = {}
+
+    def corpus(self, scheme, lines, words):
+        key = (scheme, lines, words)
+        if key not in self._corpora:
+            self._corpora[key] = make_corpus(scheme, lines, words)
+        return self._corpora[key]
+
+    def _corpora_grid(self):
+        for lines in self.sizes:
+            for words in self.lengths:
+                yield lines, words
+
+    def record(self, name, result, lines=None, syllables=None, **info):
+        result = dict(info, **result)
+        if lines is not None:
+            result["lines"] = lines
+            result["lines_per_second"] = lines / result["seconds"]
+        if syllables is not None:
+            result["syllables"] = syllables
+            result["syllables_per_second"] = syllables / result["seconds"]
+        self.results[name] = result
+        if self.progress is not None:
+            rate = ""
+            if syllables is not None:
+                rate = f"{result['syllables_per_second']:12.0f} syl/s"
+            memory = ""
+            if result.get("peak_memory") is not None:
+                memory = f"{result['peak_memory'] / 1024:10.0f} kB"
+            print(
+                f"{name:48} {result['seconds']:10.4f} s {rate}{memory}",
+                file=self.progress,
+                flush=True,
+            )
+
+    def startup(self):
+        self.record("startup/python", run_process("pass", repeat=self.repeat))
+        self.record("startup/import", run_process("import parsetc.parsetc", repeat=self.repeat))
+        self.record(
+            "startup/cli",
+            run_process(
+                CLI,
+                ["-i", "gdpi", "-o", "tlo", "--parser", "lalr"],
+                self.repeat,
+                stdin="ua2 ain3 oh8\n",
+            ),
+        )
+        # in an empty cache directory, to build from the grammar, and then
+        # load from the cache
+        saved = os.environ.get("PARSETC_CACHE_DIR")
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["PARSETC_CACHE_DIR"] = tmp
+            try:
+                for scheme in self.schemes:
+                    for parser in ["earley", "lalr"]:
+                        self.record(
+                            f"startup/build/{scheme}/{parser}",
+                            measure(
+                                lambda: pt.build_parser(scheme, parser, rebuild=True),
+                                self.repeat,
+                                self.memory,
+                            ),
+                        )
+                        self.record(
+                            f"startup/load/{scheme}/{parser}",
+                            measure(
+                                lambda: pt.build_parser(scheme, parser),
+                                self.repeat,
+                                self.memory,
+                            ),
+                        )
+            finally:
+                if saved is None:
+                    del os.environ["PARSETC_CACHE_DIR"]
+                else:
+                    os.environ["PARSETC_CACHE_DIR"] = saved
+
+    def parse(self):
+        for scheme in self.schemes:
+            for lines, words in self._corpora_grid():
+                text, count = self.corpus(scheme, lines, words)
+                for parser in ["earley", "lalr", "scan"]:
+                    if parser == "earley" and count > self.earley_max:
+                        continue
+                    self.record(
+                        f"parse/{scheme}/{parser}/{lines}x{words}",
+                        measure(
+                            lambda: [pt.analyze(line, i=scheme, parser=parser) for line in text],
+                            self.repeat,
+                            self.memory,
+                        ),
+                        lines,
+                        count,
+                    )
+
+    def transform(self):
+        for lines, words in self._corpora_grid():
+            text, count = self.corpus("gdpi", lines, words)
+            trees = [pt.parse(line, i="gdpi", parser="lalr") for line in text]
+            for o in pt.TRANSFORMER_DICT:
+                renderer = pt.TRANSFORMER_DICT[o]
+                self.record(
+                    f"transform/{o}/{lines}x{words}",
+                    measure(
+                        lambda: [renderer.transform(tree) for tree in trees],
+                        self.repeat,
+                        self.memory,
+                    ),
+                    lines,
+                    count,
+                )
+
+    def transliterate_all(self):
+        for lines, words in self._corpora_grid():
+            text, count = self.corpus("gdpi", lines, words)
+            self.record(
+                f"transliterate_all/gdpi/{self.parser}/{lines}x{words}",
+                measure(
+                    lambda: [
+                        pt.transliterate_all(line, i="gdpi", parser=self.parser)
+                        for line in text
+                    ],
+                    self.repeat,
+                    self.memory,
+                ),
+                lines,
+                count,
+            )
+
+    def diacritics(self):
+        for lines, words in self._corpora_grid():
+            text, count = self.corpus("gdpi", lines, words)
+            tlo = [pt.transliterate(line, i="gdpi", o="tlo", parser="scan") for line in text]
+            self.record(
+                f"diacritics/tlo_convert_to_numeric/{lines}x{words}",
+                measure(
+                    lambda: [pt.tlo_convert_to_numeric(line) for line in tlo],
+                    self.repeat,
+                    self.memory,
+                ),
+                lines,
+                count,
+            )
+
+    def cli(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for lines, words in self._corpora_grid():
+                text, count = self.corpus("gdpi", lines, words)
+                infile = os.path.join(tmp, f"{lines}x{words}.txt")
+                with open(infile, "w", encoding="utf8") as fh:
+                    fh.write("\n".join(text) + "\n")
+                args = [
+                    "-i",
+                    "gdpi",
+                    "-o",
+                    "tlo",
+                    "--parser",
+                    self.parser,
+                    "--input-file",
+                    infile,
+                    "--output-file",
+                    os.path.join(tmp, "out.txt"),
+                ]
+                self.record(
+                    f"cli/gdpi/tlo/{self.parser}/{lines}x{words}",
+                    run_process(CLI, args, self.repeat),
+                    lines,
+                    count,
+                )
+
+    def run(self, stages=STAGES):
+        """Run benchmarks of some stages, see STAGES
+
+        Returns
+        -------
+        dict
+            Results, see `results`
+        """
+        # parsers and renderers are built before the benchmarks, except in
+        # the startup stage
+        for scheme in self.schemes:
+            pt.PARSER_DICT[scheme]
+            pt.LALR_PARSER_DICT[scheme]
+            pt.SCANNER_DICT[scheme]
+        for stage in stages:
+            if stage not in STAGES:
+                raise ValueError(f"Unknown stage {stage}, must be one of {', '.join(STAGES)}")
+            getattr(self, stage)()
+        return self.report()
+
+    def report(self):
+        """Results, with a description of the environment and settings"""
+        return {
+            "version": RESULTS_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {
+                "sizes": list(self.sizes),
+                "lengths": list(self.lengths),
+                "schemes": self.schemes,
+                "parser": self.parser,
+                "repeat": self.repeat,
+                "earley_max": self.earley_max,
+            },
+            "results": self.results,
+        }
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """Compare results with the results of an earlier run
+
+    Arguments
+    ---------
+    baseline, current : dict
+        Results from `Suite.run`
+    threshold : float
+        Fraction by which time or memory may grow
+
+    Returns
+    -------
+    list
+        Changes, tuples of benchmark name, measure ("seconds" or
+        "peak_memory"), baseline and current values, ratio, and whether it is
+        a regression; for benchmarks in both runs only
+    """
+    out = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for measure_name in ["seconds", "peak_memory"]:
+            old = base.get(measure_name)
+            new = result.get(measure_name)
+            if not old or new is None:
+                continue
+            ratio = new / old
+            regression = ratio > 1 + threshold
+            if measure_name == "seconds" and new - old <= MIN_DELTA:
+                regression = False
+            out.append((name, measure_name, old, new, ratio, regression))
+    return out
+
+
+def _run_command(args):
+    if args.quick:
+        sizes, lengths = QUICK_SIZES, QUICK_LENGTHS
+        earley_max = QUICK_EARLEY_MAX_SYLLABLES
+    else:
+        sizes, lengths = SIZES, LENGTHS
+        earley_max = EARLEY_MAX_SYLLABLES
+    if args.sizes:
+        sizes = tuple(int(s) for s in args.sizes.split(","))
+    if args.lengths:
+        lengths = tuple(int(s) for s in args.lengths.split(","))
+    suite = Suite(
+        sizes=sizes,
+        lengths=lengths,
+        schemes=args.schemes.split(",") if args.schemes else None,
+        parser=args.parser,
+        repeat=args.repeat,
+        memory=not args.no_memory,
+        earley_max=earley_max,
+    )
+    results = suite.run(args.stages.split(",") if args.stages else STAGES)
+    with open(args.output, "w", encoding="utf8") as fh:
+        json.dump(results, fh, indent=1)
+    print(f"Results saved to {args.output}", file=sys.stderr)
+
+
+def _compare_command(args):
+    with open(args.baseline, encoding="utf8") as fh:
+        baseline = json.load(fh)
+    with open(args.results, encoding="utf8") as fh:
+        current = json.load(fh)
+    changes = compare(baseline, current, args.threshold)
+    regressions = 0
+    for name, measure_name, old, new, ratio, regression in changes:
+        if regression:
+            regressions += 1
+        if regression or args.verbose:
+            flag = "REGRESSION" if regression else ""
+            print(f"{name:48} {measure_name:12} {old:12.4g} {new:12.4g} {ratio:7.2f}x {flag}")
+    missing = sorted(set(baseline["results"]) - set(current["results"]))
+    if missing:
+        print(f"{len(missing)} benchmarks of the baseline were not run", file=sys.stderr)
+    print(f"{regressions} regressions in {len(changes)} comparisons", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="parsetc bench",
+        description="Benchmark each stage of conversion on generated text, and compare results",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run benchmarks and save results as JSON")
+    run.add_argument(
+        "--output", "-o", type=str, default="benchmark.json", help="Path to results file"
+    )
+    run.add_argument(
+        "--stages", type=str, default=None, help=f"Comma-separated stages, default all: {', '.join(STAGES)}"
+    )
+    run.add_argument(
+        "--schemes", type=str, default=None, help="Comma-separated input schemes, default all"
+    )
+    run.add_argument(
+        "--sizes", type=str, default=None, help="Comma-separated numbers of lines of the corpora"
+    )
+    run.add_argument(
+        "--lengths", type=str, default=None, help="Comma-separated numbers of words per line"
+    )
+    run.add_argument(
+        "--quick", action="store_true", help="Smaller corpora, for a quick check"
+    )
+    run.add_argument(
+        "--parser",
+        type=str,
+        choices=pt.PARSERS,
+        default="scan",
+        help="Parser for the transliterate_all and cli stages",
+    )
+    run.add_argument(
+        "--repeat", type=int, default=REPEAT, help="Times each benchmark is run; the fastest is reported"
+    )
+    run.add_argument(
+        "--no-memory", action="store_true", help="Do not measure peak memory, which takes an extra run"
+    )
+    comparison = commands.add_parser(
+        "compare", help="Compare results with a baseline; exit status 1 if there are regressions"
+    )
+    comparison.add_argument("baseline", type=str, help="Results file of the baseline")
+    comparison.add_argument("results", type=str, help="Results file to check")
+    comparison.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="Fraction by which time or memory may grow before it is a regression",
+    )
+    comparison.add_argument(
+        "--verbose", "-v", action="store_true", help="Show all comparisons, not only regressions"
+    )
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        _run_command(args)
+    else:
+        sys.exit(_compare_command(args))
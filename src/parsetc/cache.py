@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+
+import lark
+
+from lark import Lark
+from lark.load_grammar import load_grammar
+
+# Increase when the format of cached files changes
+CACHE_VERSION = 1
+
+
+def cache_dir():
+    """Directory where compiled parsers are cached
+
+    Set with the environment variable PARSETC_CACHE_DIR, otherwise defaults to
+    `parsetc` in XDG_CACHE_HOME or ~/.cache. Each cache format version has its
+    own subdirectory.
+
+    Returns
+    -------
+    str
+        Path to cache directory, which may not exist yet
+    """
+    base = os.environ.get("PARSETC_CACHE_DIR")
+    if not base:
+        xdg = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        base = os.path.join(xdg, "parsetc")
+    return os.path.join(base, f"v{CACHE_VERSION}")
+
+
+def cache_key(grammar, terminals, options):
+    """Hash of everything that the compiled parser depends on
+
+    Arguments
+    ---------
+    grammar : str
+        Grammar in Lark format
+    terminals : str
+        Contents of terminals.json
+    options : dict
+        Options passed to Lark
+
+    Returns
+    -------
+    str
+        Hex digest
+    """
+    h = hashlib.sha256()
+    for part in [
+        str(CACHE_VERSION),
+        lark.__version__,
+        str(sys.version_info[:2]),
+        repr(sorted(options.items())),
+        grammar,
+        terminals,
+    ]:
+        h.update(part.encode("utf8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _read(path, key):
+    with open(path, "rb") as fh:
+        header = pickle.load(fh)
+        if header != {"version": CACHE_VERSION, "key": key}:
+            raise ValueError(f"Stale cache file {path}")
+        kind = pickle.load(fh)
+        if kind == "lalr":
+            return Lark.load(fh)
+        elif kind == "grammar":
+            grammar, options = pickle.load(fh)
+            return Lark(grammar, **options)
+        raise ValueError(f"Unknown cache entry {kind} in {path}")
+
+
+def _write(path, key, parser, grammar, options):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump({"version": CACHE_VERSION, "key": key}, fh)
+            if options.get("parser") == "lalr":
+                # parse tables can be serialized by Lark directly
+                pickle.dump("lalr", fh)
+                parser.save(fh)
+            else:
+                # Lark cannot serialize Earley parsers, so store the grammar
+                # after it has been parsed from text, which is the slow part
+                pickle.dump("grammar", fh)
+                pickle.dump((grammar, options), fh)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_parser(grammar, terminals, rebuild=False, **options):
+    """Get a Lark parser, from the on-disk cache if available
+
+    Cache entries are keyed by a hash of the grammar, terminals.json, parser
+    options, and Lark and Python versions, so they are invalidated when any of
+    these change. Errors reading or writing the cache are not fatal; the parser
+    is simply built from the grammar.
+
+    Arguments
+    ---------
+    grammar : str
+        Grammar in Lark format
+    terminals : str
+        Contents of terminals.json
+    rebuild : bool
+        Ignore existing cache entry and overwrite it
+    options
+        Passed to Lark
+
+    Returns
+    -------
+    lark.Lark
+    """
+    key = cache_key(grammar, terminals, options)
+    path = os.path.join(cache_dir(), f"{key}.pickle")
+    if not rebuild:
+        try:
+            return _read(path, key)
+        except Exception:
+            pass
+    if options.get("parser") == "lalr":
+        compiled = None
+        parser = Lark(grammar, **options)
+    else:
+        compiled, _ = load_grammar(grammar, "<string>", None, False)
+        parser = Lark(compiled, **options)
+    try:
+        _write(path, key, parser, compiled, options)
+    except OSError:
+        pass
+    return parser
+
+
+def prune(keep):
+    """Remove cache entries that are not in use
+
+    Arguments
+    ---------
+    keep : set
+        Cache keys to keep
+
+    Returns
+    -------
+    int
+        Number of files removed
+    """
+    removed = 0
+    try:
+        entries = os.listdir(cache_dir())
+    except FileNotFoundError:
+        return removed
+    for entry in entries:
+        if entry.endswith(".pickle") and entry[: -len(".pickle")] not in keep:
+            os.unlink(os.path.join(cache_dir(), entry))
+            removed += 1
+    return removed
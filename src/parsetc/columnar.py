@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import parsetc.ir as ir
+
+from lark.exceptions import LarkError
+
+from parsetc.parsetc import PARSER_DICT, TRANSFORMER_DICT, to_ir
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Conversion of columns of text, e.g. in data frames, where the same values
+# are often repeated. Each distinct value is converted only once, and the
+# results are looked up for every row, so the cost depends on the number of
+# distinct values rather than the number of rows. pandas and pyarrow are
+# optional dependencies; any sequence of str works without them.
+
+
+def factorize(values):
+    """Distinct values of a column, and the position of each row among them
+
+    Arguments
+    ---------
+    values : pandas.Series, pyarrow.Array, pyarrow.ChunkedArray or sequence
+        Column of text, may contain nulls (None or NaN)
+
+    Returns
+    -------
+    tuple
+        Position of each row's value among the distinct values (sequence of
+        int, -1 for nulls), and list of the distinct values
+    """
+    if pd is not None and isinstance(values, pd.Series):
+        codes, uniques = pd.factorize(values)
+        return codes, list(uniques)
+    if pa is not None and isinstance(values, (pa.Array, pa.ChunkedArray)):
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        encoded = values.dictionary_encode()
+        codes = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        return codes, encoded.dictionary.to_pylist()
+    index = {}
+    codes = []
+    for value in values:
+        # NaN is not equal to itself
+        if value is None or value != value:
+            codes.append(-1)
+        else:
+            codes.append(index.setdefault(value, len(index)))
+    return codes, list(index)
+
+
+def _error_message(e):
+    """First line of an error, without the context that Lark adds"""
+    lines = str(e).splitlines()
+    return f"{type(e).__name__}: {lines[0] if lines else ''}"
+
+
+def convert_values(values, i="gdpi", o="tlo", parser="scan"):
+    """Convert distinct values, capturing errors
+
+    Documents are rendered with `parsetc.vectorized` if numpy is available,
+    otherwise with `parsetc.ir.DocumentRenderer`.
+
+    Arguments
+    ---------
+    values : list
+        Text (str) to be converted
+    i, o, parser : str
+        Input format, output format and parser, see `transliterate_column`
+
+    Returns
+    -------
+    tuple
+        Lists of converted text (None where conversion failed) and of error
+        messages (None where conversion succeeded)
+    """
+    renderer = TRANSFORMER_DICT[o]
+    converted = [None] * len(values)
+    errors = [None] * len(values)
+    docs = []
+    positions = []
+    for n, text in enumerate(values):
+        if not isinstance(text, str):
+            errors[n] = f"TypeError: expected str, got {type(text).__name__}"
+            continue
+        try:
+            docs.append(to_ir(text, i=i, parser=parser))
+        except (LarkError, KeyError) as e:
+            errors[n] = _error_message(e)
+            continue
+        positions.append(n)
+    rendered = None
+    if np is not None and docs:
+        import parsetc.vectorized as vectorized
+
+        try:
+            rendered = vectorized.render(docs, renderer)
+        except KeyError:
+            # render separately, to find the documents that fail
+            pass
+    if rendered is not None:
+        for n, text in zip(positions, rendered):
+            converted[n] = text
+        return converted, errors
+    doc_renderer = ir.DocumentRenderer([renderer])
+    for n, doc in zip(positions, docs):
+        try:
+            converted[n] = doc_renderer.render(doc)[0]
+        except KeyError as e:
+            errors[n] = _error_message(e)
+    return converted, errors
+
+
+def _broadcast(results, codes):
+    """Result for each row, from results for distinct values"""
+    if np is not None:
+        # position -1 of nulls gives the last entry, None
+        table = np.empty(len(results) + 1, dtype=object)
+        table[:-1] = results
+        return table[np.asarray(codes, dtype=np.intp)]
+    return [results[c] if c >= 0 else None for c in codes]
+
+
+def transliterate_column(values, i="gdpi", o="tlo", parser="scan"):
+    """Transliterate a column of romanized Teochew
+
+    Each distinct value is converted once. Rows are converted the same as by
+    `parsetc.parsetc.transliterate`; rows that cannot be converted are null,
+    and the error is given in a separate column. Null rows stay null without
+    an error.
+
+    Arguments
+    ---------
+    values : pandas.Series, pyarrow.Array, pyarrow.ChunkedArray or sequence
+        Column of text, may contain nulls (None or NaN)
+    i : str
+        Input format. Must match one of the available inputs
+    o : str
+        Output format. Must match one of the available outputs
+    parser : str
+        Parser to use, one of parsetc.parsetc.PARSERS, see
+        `parsetc.parsetc.analyze`
+
+    Returns
+    -------
+    tuple
+        Converted column and error column, of the same type as `values`:
+        pandas.Series with the same index, pyarrow.Array, or list. Error
+        messages are str, or null where there is no error.
+    """
+    if i not in PARSER_DICT:
+        raise ValueError(f"Invalid input scheme {i}, must be one of {', '.join(PARSER_DICT)}")
+    if o not in TRANSFORMER_DICT:
+        raise ValueError(
+            f"Invalid output scheme {o}, must be one of {', '.join(TRANSFORMER_DICT)}"
+        )
+    codes, uniques = factorize(values)
+    converted, errors = convert_values(uniques, i=i, o=o, parser=parser)
+    converted = _broadcast(converted, codes)
+    errors = _broadcast(errors, codes)
+    if pd is not None and isinstance(values, pd.Series):
+        return (
+            pd.Series(converted, index=values.index, name=values.name),
+            pd.Series(errors, index=values.index, name="error"),
+        )
+    if pa is not None and isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return pa.array(converted, type=pa.string()), pa.array(errors, type=pa.string())
+    return list(converted), list(errors)
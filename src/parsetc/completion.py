@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+from parsetc.scanner import Scanner
+from parsetc.segment import syllable_key
+from parsetc.translit import TERMINALS
+
+# Completion of partially typed syllables, e.g. for input methods. All
+# syllables that the grammar accepts are listed from the terminals, and
+# every prefix of every syllable is indexed, so that a lookup is a single
+# dict access.
+
+# Indexes by input scheme and frequency model, see `_index`
+_INDEXES = {}
+
+
+def _terminals(group, scheme):
+    """Strings of a group of terminals in a scheme, without duplicates"""
+    out = []
+    for spellings in TERMINALS[group].values():
+        if scheme in spellings and spellings[scheme] not in out:
+            out.append(spellings[scheme])
+    return out
+
+
+def syllables(scheme):
+    """All syllables of an input scheme, without tone
+
+    Syllables have the same structure as the 'syllable_toneless' rule: an
+    optional initial, and a medial with optional coda or nasal and stop, or
+    a nasal coda on its own.
+
+    Returns
+    -------
+    dict
+        Syllable keys (see `parsetc.segment.syllable_key`) by spelling (str).
+        Spellings that can be split in several ways, e.g. "ngm", have the
+        key of the split that the scanner makes.
+    """
+    initials = [""] + _terminals("initials", scheme)
+    medials = _terminals("medials", scheme)
+    codanasals = _terminals("codanasals", scheme)
+    codastops = _terminals("codastops", scheme)
+    nasal = TERMINALS["nasal"]["NASAL"][scheme]
+    finals = []
+    for m in medials:
+        finals.append(m)
+        for coda in codanasals + codastops:
+            finals.append(m + coda)
+        finals.append(m + nasal)
+        for coda in codastops:
+            finals.append(m + nasal + coda)
+    finals += codanasals
+    scanner = Scanner(scheme)
+    fullmatch = scanner.syllable_regex.fullmatch
+    out = {}
+    for initial in initials:
+        for final in finals:
+            spelling = initial + final
+            if spelling not in out:
+                out[spelling] = syllable_key(scanner.syllable(fullmatch(spelling)))
+    return out
+
+
+def _index(scheme, model=None):
+    """Ranked syllables by every prefix of their spelling"""
+    try:
+        return _INDEXES[scheme, model]
+    except KeyError:
+        pass
+    inventory = syllables(scheme)
+    if model is None:
+        ranked = sorted(inventory, key=lambda s: (len(s), s))
+    else:
+        ranked = sorted(
+            inventory, key=lambda s: (-model.unigram_prob(inventory[s]), len(s), s)
+        )
+    index = {}
+    for spelling in ranked:
+        for n in range(len(spelling) + 1):
+            index.setdefault(spelling[:n], []).append(spelling)
+    _INDEXES[scheme, model] = index
+    return index
+
+
+def complete(prefix, scheme="gdpi", limit=10, model=None):
+    """Syllables that begin with a prefix
+
+    The index for a scheme and model is built the first time that it is
+    used.
+
+    Arguments
+    ---------
+    prefix : str
+        Partially typed syllable, lowercase, without tone
+    scheme : str
+        Input scheme
+    limit : int
+        Maximum number of completions, None for all
+    model : parsetc.segment.FrequencyModel
+        Syllable frequencies to rank completions by; by default shorter
+        syllables are ranked first
+
+    Returns
+    -------
+    list
+        Completions (str), best first, including the prefix itself if it is
+        a syllable
+    """
+    if scheme not in TERMINALS["nasal"]["NASAL"]:
+        raise ValueError(f"Unknown input scheme {scheme}")
+    return _index(scheme, model).get(prefix, [])[:limit]
+
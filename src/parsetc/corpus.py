@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+import hashlib
+import mmap
+import struct
+
+from array import array
+
+from parsetc.ir import Document, RECORD_SIZE
+from parsetc.translit import TERMINALS_JSON
+
+# Binary file of analyzed documents, which can be rendered into any output
+# scheme again without parsing.
+#
+# Layout, all integers little-endian:
+#   header   HEADER
+#   documents, each DOC_HEADER followed by
+#       syllable records (RECORD_SIZE bytes each, see parsetc.ir)
+#       byte lengths of separators (u32 each)
+#       separators, UTF-8
+#       original text, UTF-8
+#   index    offset of each document (u64 each)
+
+MAGIC = b"PARSETC\0"
+CORPUS_VERSION = 1
+# magic, version, sha256 of terminals.json, input scheme, number of
+# documents, offset of index
+HEADER = struct.Struct("<8sI32s16sQQ")
+# Written in place of the header until the file is complete, so that files
+# that were not closed cannot be read
+INCOMPLETE = bytes(HEADER.size)
+# number of syllables, number of separators, size of separators, size of
+# original text, flags
+DOC_HEADER = struct.Struct("<IIIIB")
+
+# Document flags
+LINE_END = 1
+
+# Output buffer for writing corpus files
+WRITE_BUFFER = 1 << 20
+
+
+def terminals_hash():
+    """SHA-256 digest of terminals.json, which determines the syllable ids"""
+    return hashlib.sha256(TERMINALS_JSON.encode("utf8")).digest()
+
+
+class CorpusWriter:
+    """Write analyzed documents to a corpus file
+
+    Use as a context manager, or call `close` when done. The file can only be
+    read after it is closed; if an error is raised in the with block, or the
+    process ends before, the file is left incomplete.
+
+    Arguments
+    ---------
+    path : str
+        Path to corpus file, which is overwritten
+    scheme : str
+        Input scheme of all documents
+    """
+
+    def __init__(self, path, scheme):
+        self.scheme = scheme
+        self._offsets = array("Q")
+        self._file = open(path, "wb", buffering=WRITE_BUFFER)
+        self._file.write(INCOMPLETE)
+
+    def _header(self, index_offset):
+        return HEADER.pack(
+            MAGIC,
+            CORPUS_VERSION,
+            terminals_hash(),
+            self.scheme.encode("ascii"),
+            len(self._offsets),
+            index_offset,
+        )
+
+    def add(self, doc, text, line_end=True):
+        """Add a document
+
+        Arguments
+        ---------
+        doc : parsetc.ir.Document
+            Analyzed text, in the input scheme of the corpus
+        text : str
+            Original text
+        line_end : bool
+            Document is the end of a line of the original text
+        """
+        if doc.scheme != self.scheme:
+            raise ValueError(
+                f"Document in scheme {doc.scheme} cannot be added to corpus in scheme {self.scheme}"
+            )
+        separators = [s.encode("utf8") for s in doc.separators]
+        text = text.encode("utf8")
+        self._offsets.append(self._file.tell())
+        self._file.write(
+            DOC_HEADER.pack(
+                len(doc),
+                len(separators),
+                sum(len(s) for s in separators),
+                len(text),
+                LINE_END if line_end else 0,
+            )
+        )
+        self._file.write(doc.syllables.tobytes())
+        self._file.write(struct.pack(f"<{len(separators)}I", *map(len, separators)))
+        self._file.write(b"".join(separators))
+        self._file.write(text)
+
+    def close(self):
+        """Write the index and header, and close the file"""
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        self._file.write(struct.pack(f"<{len(self._offsets)}Q", *self._offsets))
+        self._file.seek(0)
+        self._file.write(self._header(index_offset))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # documents may be missing, so the header is not written
+            self._file.close()
+
+
+class Corpus:
+    """Read a corpus file, memory-mapped
+
+    Documents can be read in order or by position. Use as a context manager,
+    or call `close` when done.
+
+    Arguments
+    ---------
+    path : str
+        Path to corpus file written by CorpusWriter
+
+    Raises
+    ------
+    ValueError
+        If the file is not a corpus file, was not completely written, or was
+        written with a different version of terminals.json
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, digest, scheme, count, index_offset = HEADER.unpack_from(
+                self._map
+            )
+        except struct.error:
+            magic = None
+        if magic == INCOMPLETE[: len(MAGIC)]:
+            self.close()
+            raise ValueError(f"{path} is an incomplete corpus file, which was not closed")
+        if magic != MAGIC or version != CORPUS_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a parsetc corpus file (version {CORPUS_VERSION})")
+        if digest != terminals_hash():
+            self.close()
+            raise ValueError(f"{path} was written with a different terminals.json")
+        self.scheme = scheme.rstrip(b"\0").decode("ascii")
+        self._offsets = struct.unpack_from(f"<{count}Q", self._map, index_offset)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, n):
+        """Document at position n
+
+        Returns
+        -------
+        tuple
+            parsetc.ir.Document, original text (str), and whether the
+            document is the end of a line (bool)
+        """
+        pos = self._offsets[n]
+        nsyl, nsep, sep_size, text_size, flags = DOC_HEADER.unpack_from(self._map, pos)
+        pos += DOC_HEADER.size
+        syllables = array("B", self._map[pos : pos + nsyl * RECORD_SIZE])
+        pos += nsyl * RECORD_SIZE
+        separators = []
+        sep_pos = pos + 4 * nsep
+        for size in struct.unpack_from(f"<{nsep}I", self._map, pos):
+            separators.append(self._map[sep_pos : sep_pos + size].decode("utf8"))
+            sep_pos += size
+        text = self._map[sep_pos : sep_pos + text_size].decode("utf8")
+        return (
+            Document(self.scheme, syllables, separators),
+            text,
+            bool(flags & LINE_END),
+        )
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
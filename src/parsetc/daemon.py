@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+
+from array import array
+
+# Background process that keeps parsers built, so that short runs of the
+# command line tool do not each pay for importing and building them. The
+# command line tool connects to the daemon's Unix domain socket, if it is
+# running, and passes its arguments, working directory, and its standard
+# input, output and error as open files. The daemon forks a process that
+# runs the command as usual with those files, so the output is the same as
+# without the daemon. Only the standard library is imported here, so that
+# connecting is fast.
+
+# Environment variable for path to the socket
+SOCKET_ENV = "PARSETC_SOCKET"
+# Environment variable to always convert in the current process
+NO_DAEMON_ENV = "PARSETC_NO_DAEMON"
+
+# Largest request, in bytes
+MAX_HEADER = 1 << 20
+
+# Seconds to wait for a client to send its request
+RECEIVE_TIMEOUT = 1
+
+# Name of the socket in the daemon's directory
+SOCKET_NAME = "daemon.sock"
+
+# Standard input, output and error
+STDIO = (0, 1, 2)
+
+# Subcommands of the command line tool that are never run by the daemon
+LOCAL_COMMANDS = ["serve", "bench"]
+
+
+def socket_path():
+    """Path to the socket of the daemon
+
+    Set with the environment variable PARSETC_SOCKET, otherwise daemon.sock
+    in the directory parsetc-UID in $XDG_RUNTIME_DIR or the temporary
+    directory, which only the user can access.
+    """
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(base, f"parsetc-{os.getuid()}", SOCKET_NAME)
+
+
+def _private(path):
+    """Whether a file or directory belongs to the user and no one else can use it"""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return st.st_uid == os.getuid() and st.st_mode & 0o077 == 0
+
+
+def _make_directory(path):
+    """Create the directory of the socket, which only the user can access
+
+    Raises
+    ------
+    RuntimeError
+        If the directory exists and other users can access it
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    if not (stat.S_ISDIR(os.lstat(directory).st_mode) and _private(directory)):
+        raise RuntimeError(
+            f"{directory} must be a directory that only the current user can access"
+        )
+
+
+def _same_user(sock, path=None):
+    """Whether the other end of a connected socket runs as the current user
+
+    Checked with the peer's credentials where available, otherwise the
+    socket file must belong to the user and no one else can use it.
+    """
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = struct.Struct("3i")
+        pid, uid, gid = creds.unpack(
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, creds.size)
+        )
+        return uid == os.getuid()
+    return path is not None and _private(path)
+
+
+def source_stamp():
+    """Modification times of the package's files
+
+    A daemon that was started before parsetc was changed, e.g. upgraded, is
+    not used.
+    """
+    package = os.path.dirname(os.path.abspath(__file__))
+    return sorted(
+        [entry.name, entry.stat().st_mtime_ns]
+        for entry in os.scandir(package)
+        if entry.name.endswith((".py", ".json"))
+    )
+
+
+def forward(argv):
+    """Run a command in the daemon, if it is running
+
+    Arguments
+    ---------
+    argv : list
+        Command line arguments (str), without the program name
+
+    Returns
+    -------
+    int
+        Exit status of the command, or None if there is no daemon that can
+        run it; the command has then not read any input
+    """
+    if os.environ.get(NO_DAEMON_ENV) or not hasattr(socket, "AF_UNIX"):
+        return None
+    if None in (sys.stdin, sys.stdout, sys.stderr):
+        return None
+    path = socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    if not _same_user(sock, path):
+        # the standard streams are only sent to the user's own daemon
+        sock.close()
+        return None
+    with sock:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        header = {
+            "argv": [sys.argv[0]] + list(argv),
+            "cwd": os.getcwd(),
+            "stamp": source_stamp(),
+            "streams": [
+                [f.encoding, f.errors, f.line_buffering, f.write_through]
+                for f in (sys.stdin, sys.stdout, sys.stderr)
+            ],
+        }
+        fds = array("i", [f.fileno() for f in (sys.stdin, sys.stdout, sys.stderr)])
+        try:
+            sock.sendmsg(
+                [json.dumps(header).encode("utf8") + b"\n"],
+                [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)],
+            )
+            replies = sock.makefile("rb")
+            if replies.readline() != b"ok\n":
+                # stale daemon
+                return None
+            status = replies.readline()
+        except OSError:
+            status = b""
+    if not status:
+        print("parsetc: daemon stopped while running the command", file=sys.stderr)
+        return 1
+    return int(status)
+
+
+def _receive(conn):
+    """Read a request and the files sent with it"""
+    data, ancdata, flags, addr = conn.recvmsg(
+        MAX_HEADER, socket.CMSG_LEN(len(STDIO) * array("i").itemsize)
+    )
+    fds = array("i")
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[: len(payload) - len(payload) % fds.itemsize])
+    while not data.endswith(b"\n"):
+        try:
+            more = conn.recv(MAX_HEADER)
+        except OSError:
+            # timed out; the files that were received are closed by the caller
+            break
+        if not more or len(data) > MAX_HEADER:
+            break
+        data += more
+    try:
+        header = json.loads(data)
+    except ValueError:
+        header = None
+    return header, list(fds)
+
+
+def _run(header, fds):
+    """Run a command with the client's files, in a forked process
+
+    Returns
+    -------
+    int
+        Exit status
+    """
+    for target, fd in zip(STDIO, fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    # the same as the client's own standard streams, e.g. unbuffered with
+    # python -u
+    streams = []
+    for fd, mode, (encoding, errors, line_buffering, write_through) in zip(
+        STDIO, ["rb", "wb", "wb"], header["streams"]
+    ):
+        buffering = 0 if write_through and mode == "wb" else -1
+        streams.append(
+            io.TextIOWrapper(
+                open(fd, mode, buffering=buffering, closefd=False),
+                encoding=encoding,
+                errors=errors,
+                newline="\n",
+                line_buffering=line_buffering,
+                write_through=write_through,
+            )
+        )
+    sys.stdin, sys.stdout, sys.stderr = streams
+    sys.argv = header["argv"]
+    from parsetc.parsetc import main
+
+    try:
+        os.chdir(header["cwd"])
+        main()
+        status = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+        status = 1
+    for f in (sys.stdout, sys.stderr):
+        try:
+            f.flush()
+        except OSError:
+            pass
+    return status
+
+
+def serve(path=None):
+    """Run the daemon until it is stopped with SIGTERM or SIGINT
+
+    Arguments
+    ---------
+    path : str
+        Path to socket, default `socket_path()`
+
+    Raises
+    ------
+    RuntimeError
+        If a daemon is already running at path, or the default directory
+        of the socket can be accessed by other users
+    """
+    from parsetc.server import warm
+
+    if path is None:
+        path = socket_path()
+        if not os.environ.get(SOCKET_ENV):
+            _make_directory(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        pass
+    else:
+        sock.close()
+        raise RuntimeError(f"A daemon is already running at {path}")
+    sock.close()
+    if os.path.exists(path):
+        # left by a daemon that was killed
+        os.unlink(path)
+    warm()
+    stamp = source_stamp()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # only the user can connect, from the moment the socket is created
+    umask = os.umask(0o177)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(umask)
+    sock.listen(64)
+    # children are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            conn, addr = sock.accept()
+            if hasattr(socket, "SO_PEERCRED") and not _same_user(conn):
+                conn.close()
+                continue
+            # a client that does not send its request does not hold up others
+            conn.settimeout(RECEIVE_TIMEOUT)
+            try:
+                header, fds = _receive(conn)
+            except OSError:
+                conn.close()
+                continue
+            conn.settimeout(None)
+            if header is None or len(fds) != len(STDIO) or header.get("stamp") != stamp:
+                for fd in fds:
+                    os.close(fd)
+                try:
+                    conn.sendall(b"stale\n")
+                except OSError:
+                    pass
+                conn.close()
+                continue
+            conn.sendall(b"ok\n")
+            if os.fork() == 0:
+                sock.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                status = 1
+                try:
+                    status = _run(header, fds)
+                    conn.sendall(f"{status}\n".encode("ascii"))
+                finally:
+                    os._exit(status)
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        os.unlink(path)
+
+
+def main():
+    """Command line tool: run in the daemon if it is running, else here"""
+    argv = sys.argv[1:]
+    if "--daemon" not in argv and argv[:1] not in [[c] for c in LOCAL_COMMANDS]:
+        status = forward(argv)
+        if status is not None:
+            sys.exit(status)
+    from parsetc.parsetc import main as run
+
+    run()
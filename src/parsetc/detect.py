@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import math
+import re
+import unicodedata
+
+import parsetc.diacritics as diacritics
+
+from parsetc.segment import Segmenter
+from parsetc.translit import TERMINALS
+
+# Guess the input scheme of text from the spellings of terminals, without
+# parsing. Each run of letters must be made of valid syllables of a scheme,
+# and spellings that only some schemes use (e.g. "ê" in gdpi, "ch" in ggn,
+# "tsh" in tlo) count as evidence for those schemes, more so the fewer
+# schemes use them.
+
+# Input schemes that can be detected, in order of preference where schemes
+# cannot be told apart
+SCHEMES = ["gdpi", "dieghv", "ggn", "ggnn", "tlo", "tailo"]
+
+# Runs of letters, between tone numbers, spaces and punctuation
+RUNS = re.compile(r"[^\W\d_]+")
+TONE_NUMBERS = re.compile(r"[0-8]")
+
+# Penalty for a run of letters that is not valid in a scheme, in the same
+# units as the weights of spellings (natural log)
+MISMATCH = 4.0
+
+# Runs longer than this are not checked, as they are unlikely to be words
+MAX_RUN = 24
+
+# Checked runs per scheme; there are few distinct runs, so most are looked up
+MEMO_SIZE = 100000
+
+
+def _spellings():
+    """Spellings of terminals, and the schemes that use each one"""
+    out = {}
+    for group in TERMINALS.values():
+        for spellings in group.values():
+            for scheme, s in spellings.items():
+                if scheme in SCHEMES:
+                    out.setdefault(s, set()).add(scheme)
+    return out
+
+
+def _distinct_schemes(spellings):
+    """Schemes with different sets of spellings; the first of each set is kept"""
+    seen = {}
+    for scheme in SCHEMES:
+        key = frozenset(s for s, schemes in spellings.items() if scheme in schemes)
+        seen.setdefault(key, scheme)
+    return [s for s in SCHEMES if s in seen.values()]
+
+
+SPELLINGS = _spellings()
+# e.g. ggn and ggnn accept the same text, and ggn is reported
+CANDIDATES = _distinct_schemes(SPELLINGS)
+# Weight of each spelling that is used by only some schemes
+WEIGHTS = {
+    s: math.log(len(SCHEMES) / len(schemes))
+    for s, schemes in SPELLINGS.items()
+    if len(schemes) < len(SCHEMES)
+}
+# Distinctive spellings in a run of letters, longest first, e.g. "tsh"
+# rather than "ts"
+GRAPHEMES = re.compile(
+    "|".join(re.escape(s) for s in sorted(WEIGHTS, key=len, reverse=True))
+)
+
+_SEGMENTERS = {}
+_MEMO = {scheme: {} for scheme in SCHEMES}
+
+
+def _run_score(run, scheme):
+    """Evidence for a scheme from a run of letters"""
+    memo = _MEMO[scheme]
+    try:
+        return memo[run]
+    except KeyError:
+        pass
+    if len(memo) > MEMO_SIZE:
+        # replaced rather than cleared, for other threads that are using it
+        memo = _MEMO[scheme] = {}
+    try:
+        segmenter = _SEGMENTERS[scheme]
+    except KeyError:
+        segmenter = _SEGMENTERS[scheme] = Segmenter(scheme)
+    if not segmenter.segment(run):
+        out = -MISMATCH
+    else:
+        out = sum(
+            WEIGHTS[g] for g in GRAPHEMES.findall(run) if scheme in SPELLINGS[g]
+        )
+    memo[run] = out
+    return out
+
+
+def _text_score(text, scheme):
+    return sum(
+        _run_score(run, scheme)
+        for run in RUNS.findall(text)
+        if len(run) <= MAX_RUN
+    )
+
+
+def has_tone_numbers(text):
+    """Check if text has tone numbers, so it does not use tone diacritics"""
+    return TONE_NUMBERS.search(text) is not None
+
+
+def scores(text):
+    """Probability of each input scheme for a text
+
+    Arguments
+    ---------
+    text : str
+        Romanized Teochew, lowercase
+
+    Returns
+    -------
+    dict
+        Probability (float) of each scheme in CANDIDATES, highest first
+    """
+    text = unicodedata.normalize("NFC", text)
+    numeric = has_tone_numbers(text)
+    raw = {}
+    for scheme in CANDIDATES:
+        raw[scheme] = _text_score(text, scheme)
+        if not numeric and scheme in diacritics.SCHEMES:
+            # tone diacritics, or letters such as "ê" that are not
+            raw[scheme] = max(
+                raw[scheme],
+                _text_score(diacritics.to_numeric(text, scheme), scheme),
+            )
+    top = max(raw.values())
+    total = sum(math.exp(s - top) for s in raw.values())
+    probs = {scheme: math.exp(s - top) / total for scheme, s in raw.items()}
+    return dict(sorted(probs.items(), key=lambda x: -x[1]))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import re
+import unicodedata
+
+# Input schemes that mark tones with diacritics instead of tone numbers
+SCHEMES = ["tlo", "tailo"]
+
+# Characters between syllables, as in parsetc.parsetc.tlo_convert_to_numeric
+SEPARATORS = r"\s,\.\'\"\?\!\-"
+
+# Combining tone marks and tone numbers, after decomposition (NFD)
+TONE_MARKS = {
+    "tlo": {
+        "́": 2,
+        "̀": 3,
+        "̂": 5,
+        "̆": 6,
+        "̌": 6,  # combining caron, often confused with combining breve
+        "̄": 7,
+        "̍": 5,  # Tai-lo tone 8 mark, tone 8 in checked syllables
+    },
+    "tailo": {
+        "́": 2,
+        "̀": 3,
+        "̂": 5,
+        "̆": 6,
+        "̌": 6,
+        "̄": 7,
+        "̍": 8,
+    },
+}
+
+# Tones are first replaced by placeholder characters from the private use
+# area, one per tone number, so that they are not confused with the text
+PLACEHOLDERS = "".join(chr(0xE000 + tone) for tone in range(9))
+# str.replace is much faster than str.translate for text that is not ASCII
+MARK_PLACEHOLDERS = {
+    scheme: [(mark, PLACEHOLDERS[tone]) for mark, tone in marks.items()]
+    for scheme, marks in TONE_MARKS.items()
+}
+DIGITS = [(p, str(tone)) for tone, p in enumerate(PLACEHOLDERS)]
+# Entering tones: syllables ending in a stop, with tone 1 or tone 5 mark
+STOPS = "ptkh"
+ENTERING = [(PLACEHOLDERS[1], PLACEHOLDERS[4]), (PLACEHOLDERS[5], PLACEHOLDERS[8])]
+
+# Split text into syllables and separators
+SPLIT = re.compile(f"([{SEPARATORS}]+)")
+# Tone mark followed by the rest of its syllable
+MOVE_MARK = re.compile(f"([{PLACEHOLDERS}])([^{SEPARATORS}{PLACEHOLDERS}]+)")
+# End of a syllable without tone mark
+UNMARKED_END = re.compile(f"(?<=[^{SEPARATORS}{PLACEHOLDERS}])(?=[{SEPARATORS}]|\\Z)")
+
+# Converted syllables per scheme; there are few distinct syllables, so most
+# are looked up instead of converted
+MEMO_SIZE = 100000
+_MEMO = {scheme: {} for scheme in SCHEMES}
+
+
+def _swap(m):
+    return m[2] + m[1]
+
+
+def _convert(text, scheme):
+    """Convert tone diacritics with a few passes over the whole text"""
+    text = unicodedata.normalize("NFD", text)
+    for mark, placeholder in MARK_PLACEHOLDERS[scheme]:
+        text = text.replace(mark, placeholder)
+    text = MOVE_MARK.sub(_swap, text)
+    text = UNMARKED_END.sub(PLACEHOLDERS[1], text)
+    for stop in STOPS:
+        for tone, entering in ENTERING:
+            text = text.replace(stop + tone, stop + entering)
+    for placeholder, digit in DIGITS:
+        text = text.replace(placeholder, digit)
+    return text
+
+
+def to_numeric(text, scheme="tlo"):
+    """Convert tone diacritics to tone numbers after each syllable
+
+    Syllables without tone mark are tone 1, or tone 4 if they end in a stop
+    consonant (p, t, k, h); with the tone 5 mark they are tone 8 if they end
+    in a stop. Tone 0 cannot be written with diacritics.
+
+    Arguments
+    ---------
+    text : str
+        Text in Tie-lo or Tai-lo with tone diacritics, lowercase. Every
+        syllable must be separated by spaces, punctuation or hyphens.
+    scheme : str
+        Input scheme, one of SCHEMES
+
+    Returns
+    -------
+    str
+        Text with tone numbers instead of diacritics
+    """
+    memo = _MEMO[scheme]
+    if len(memo) > MEMO_SIZE:
+        # replaced rather than cleared, for other threads that are using it
+        memo = _MEMO[scheme] = {}
+    parts = SPLIT.split(text)
+    # syllables are at even positions, separators at odd positions
+    syllables = parts[0::2]
+    try:
+        parts[0::2] = map(memo.__getitem__, syllables)
+    except KeyError:
+        # syllables that have not been seen are converted together, as a
+        # single text with a syllable per line
+        missing = list({s for s in syllables if s not in memo})
+        memo.update(zip(missing, _convert("\n".join(missing), scheme).split("\n")))
+        parts[0::2] = map(memo.__getitem__, syllables)
+    return "".join(parts)
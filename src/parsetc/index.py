@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+
+import mmap
+import struct
+import sys
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from parsetc.corpus import Corpus, terminals_hash, WRITE_BUFFER
+from parsetc.ir import (
+    Document,
+    INITIALS,
+    MEDIALS,
+    CODAS,
+    TONES,
+    NO_TONE,
+    NASAL,
+    RECORD_SIZE,
+    WORD_START,
+    INITIAL_IDS,
+    MEDIAL_IDS,
+    CODA_IDS,
+)
+from parsetc.scanner import Scanner
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Inverted index of the syllables in a corpus file (see parsetc.corpus), by
+# terminal types and tones, so that syllables can be searched for
+# independently of the spelling scheme. Syllables are numbered through the
+# whole corpus; for each value of each field, the numbers of the syllables
+# with that value are stored (postings), and a search intersects the
+# postings of its terms. Postings are stored as ascending numbers, or as a
+# bitmap with a bit for every syllable where that is smaller, e.g. for tones
+# that many syllables share.
+#
+# Layout, all integers little-endian:
+#   header   HEADER
+#   index of first syllable of each document, and number of syllables
+#       (u32 each, number of documents + 1)
+#   terms    TERM for each term
+#   postings (u32 each, or bitmap with bit n % 8 of byte n // 8 for
+#       syllable n)
+
+MAGIC = b"PARSETCI"
+INDEX_VERSION = 1
+# magic, version, sha256 of terminals.json, input scheme, number of
+# syllables, number of documents, number of terms
+HEADER = struct.Struct("<8sI32s16sQQI")
+# field, value id, whether postings are a bitmap, offset of postings, number
+# of syllables
+TERM = struct.Struct("<BBBQQ")
+
+# Searchable fields, in the order of the syllable records (see parsetc.ir),
+# and their values by id
+FIELDS = ["initial", "medial", "coda", "tone", "sandhi", "nasal"]
+FIELD_IDS = {f: n for n, f in enumerate(FIELDS)}
+# Fields that are given as spelled syllables or finals, see parse_query
+SPELLED = ["syllable", "final"]
+
+
+def value_id(field, value):
+    """Id of a value of a field, as in the syllable records
+
+    Arguments
+    ---------
+    field : str
+        One of FIELDS
+    value : str
+        Terminal type for initial, medial and coda, e.g. "INIT_Z"; tone
+        number for tone and sandhi; "0" or "1" for nasal; "none" where the
+        part is absent
+
+    Raises
+    ------
+    ValueError
+        If the field or value is unknown
+    """
+    if field not in FIELD_IDS:
+        raise ValueError(f"Unknown field {field}, must be one of {', '.join(FIELDS + SPELLED)}")
+    if value.lower() == "none":
+        value = None
+    if field in ["initial", "medial", "coda"]:
+        ids = {"initial": INITIAL_IDS, "medial": MEDIAL_IDS, "coda": CODA_IDS}[field]
+        if value in ids:
+            return ids[value]
+    elif field in ["tone", "sandhi"]:
+        if value is None:
+            return NO_TONE
+        if len(value) == 1 and value in TONES:
+            return int(value)
+    elif value in ["0", "1"]:
+        return int(value)
+    raise ValueError(f"Unknown value {value} for {field}")
+
+
+def value_name(field, vid):
+    """Value of a field by its id, the inverse of `value_id`"""
+    if field in ["initial", "medial", "coda"]:
+        name = {"initial": INITIALS, "medial": MEDIALS, "coda": CODAS}[field][vid]
+    elif field in ["tone", "sandhi"]:
+        name = None if vid == NO_TONE else TONES[vid]
+    else:
+        name = str(vid)
+    return "none" if name is None else name
+
+
+def _spelled_terms(field, text, scheme):
+    """Terms of a syllable or final spelled in an input scheme"""
+    scanner = Scanner(scheme)
+    m = scanner.syllable_regex.fullmatch(text)
+    if m is None:
+        raise ValueError(f"Invalid {field} {text} in {scheme}")
+    initial, medial, nasal, coda, tone, sandhi = scanner.syllable(m)
+    if field == "final" and initial is not None:
+        raise ValueError(f"Invalid final {text} in {scheme}, it has an initial")
+    terms = []
+    if field == "syllable":
+        terms.append(("initial", INITIAL_IDS[initial]))
+    terms += [
+        ("medial", MEDIAL_IDS[medial]),
+        ("coda", CODA_IDS[coda]),
+        ("nasal", int(nasal is not None)),
+    ]
+    if tone is not None:
+        terms.append(("tone", int(tone)))
+    if sandhi is not None:
+        terms.append(("sandhi", int(sandhi)))
+    return terms
+
+
+def parse_query(query, scheme="gdpi"):
+    """Parse a query into terms
+
+    A query is a list of terms separated by spaces, all of which must match,
+    e.g. "initial=INIT_Z tone=8". Fields are given in FIELDS, with values as
+    in `value_id`. Syllables and finals can also be spelled in an input
+    scheme, e.g. "final=ieng" or "syllable=ziang5", which is the same as
+    giving their medial, coda, nasal, and if present initial and tones.
+
+    Arguments
+    ---------
+    query : str
+    scheme : str
+        Input scheme of spelled syllables and finals
+
+    Returns
+    -------
+    list
+        Terms, tuples of field (str) and value id (int)
+
+    Raises
+    ------
+    ValueError
+        If the query is not valid
+    """
+    terms = []
+    for term in query.split():
+        field, sep, value = term.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid term {term}, must be field=value")
+        if field in SPELLED:
+            terms += _spelled_terms(field, value, scheme)
+        else:
+            terms.append((field, value_id(field, value)))
+    return terms
+
+
+def build(corpus_path, path):
+    """Index the syllables of a corpus file
+
+    Arguments
+    ---------
+    corpus_path : str
+        Corpus file written by parsetc.corpus.CorpusWriter
+    path : str
+        Path to index file, which is overwritten
+    """
+    postings = [dict() for f in FIELDS]
+    doc_starts = array("I", [0])
+    n = 0
+    with Corpus(corpus_path) as corpus:
+        scheme = corpus.scheme
+        for doc, text, line_end in corpus:
+            records = doc.syllables
+            for pos in range(0, len(records), RECORD_SIZE):
+                for field in range(len(FIELDS) - 1):
+                    value = records[pos + field]
+                    try:
+                        postings[field][value].append(n)
+                    except KeyError:
+                        postings[field][value] = array("I", [n])
+                nasal = records[pos + RECORD_SIZE - 1] & NASAL
+                try:
+                    postings[-1][nasal].append(n)
+                except KeyError:
+                    postings[-1][nasal] = array("I", [n])
+                n += 1
+            doc_starts.append(n)
+    terms = [
+        (field, value, ids)
+        for field, values in enumerate(postings)
+        for value, ids in sorted(values.items())
+    ]
+    size = _bitmap_size(n)
+    with open(path, "wb", buffering=WRITE_BUFFER) as fh:
+        fh.write(
+            HEADER.pack(
+                MAGIC,
+                INDEX_VERSION,
+                terminals_hash(),
+                scheme.encode("ascii"),
+                n,
+                len(doc_starts) - 1,
+                len(terms),
+            )
+        )
+        fh.write(struct.pack(f"<{len(doc_starts)}I", *doc_starts))
+        offset = fh.tell() + TERM.size * len(terms)
+        for field, value, ids in terms:
+            bitmap = 4 * len(ids) > size
+            fh.write(TERM.pack(field, value, bitmap, offset, len(ids)))
+            offset += size if bitmap else 4 * len(ids)
+        for field, value, ids in terms:
+            if 4 * len(ids) > size:
+                bitmap = bytearray(size)
+                for x in ids:
+                    bitmap[x >> 3] |= 1 << (x & 7)
+                fh.write(bitmap)
+            else:
+                fh.write(struct.pack(f"<{len(ids)}I", *ids))
+
+
+def word_of(doc, pos):
+    """Word that contains a syllable of a Document
+
+    Arguments
+    ---------
+    doc : parsetc.ir.Document
+    pos : int
+        Position of the syllable in the document, e.g. from `Index.locate`
+
+    Returns
+    -------
+    parsetc.ir.Document
+        The word on its own, without separators
+    """
+    records = list(doc.records())
+    start = pos
+    while start > 0 and not records[start][5] & WORD_START:
+        start -= 1
+    end = pos + 1
+    while end < len(records) and not records[end][5] & WORD_START:
+        end += 1
+    return Document(
+        doc.scheme, doc.syllables[start * RECORD_SIZE : end * RECORD_SIZE], ["", ""]
+    )
+
+
+def _bitmap_size(n):
+    return (n + 7) // 8
+
+
+# Positions of the set bits of each byte value
+_BITS = [tuple(k for k in range(8) if b >> k & 1) for b in range(256)]
+
+
+def _intersect(a, b):
+    """Intersection of ascending sequences of syllable numbers"""
+    if np is not None:
+        if len(b) == 0:
+            return b
+        pos = np.searchsorted(b, a)
+        pos[pos == len(b)] = 0
+        return a[b[pos] == a]
+    out = array("I")
+    for x in a:
+        pos = bisect_left(b, x)
+        if pos < len(b) and b[pos] == x:
+            out.append(x)
+    return out
+
+
+def _filter(ids, bitmap):
+    """Syllable numbers whose bit is set in a bitmap"""
+    if np is not None:
+        return ids[(bitmap[ids >> 3] >> (ids & 7)) & 1 == 1]
+    return array("I", [x for x in ids if bitmap[x >> 3] >> (x & 7) & 1])
+
+
+def _set_bits(bitmap):
+    """Syllable numbers whose bit is set in a bitmap, ascending"""
+    if np is not None:
+        return np.flatnonzero(np.unpackbits(bitmap, bitorder="little")).astype("<u4")
+    out = array("I")
+    for n, byte in enumerate(bitmap):
+        if byte:
+            base = n << 3
+            out.extend(base + k for k in _BITS[byte])
+    return out
+
+
+class Index:
+    """Read an index file, memory-mapped
+
+    Use as a context manager, or call `close` when done.
+
+    Arguments
+    ---------
+    path : str
+        Path to index file written by `build`
+
+    Raises
+    ------
+    ValueError
+        If the file is not an index file, or was written with a different
+        version of terminals.json
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, digest, scheme, nsyl, ndocs, nterms = HEADER.unpack_from(
+                self._map
+            )
+        except struct.error:
+            magic = None
+        if magic != MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a parsetc index file (version {INDEX_VERSION})")
+        if digest != terminals_hash():
+            self.close()
+            raise ValueError(f"{path} was written with a different terminals.json")
+        self.scheme = scheme.rstrip(b"\0").decode("ascii")
+        self.syllables = nsyl
+        pos = HEADER.size
+        self._doc_starts = self._read(pos, ndocs + 1)
+        pos += 4 * (ndocs + 1)
+        self._terms = {}
+        for n in range(nterms):
+            field, value, bitmap, offset, count = TERM.unpack_from(
+                self._map, pos + n * TERM.size
+            )
+            self._terms[FIELDS[field], value] = (bool(bitmap), offset, count)
+
+    def _read(self, offset, count):
+        """Array of u32 in the file"""
+        if np is not None:
+            return np.frombuffer(self._map, dtype="<u4", count=count, offset=offset)
+        out = array("I")
+        out.frombytes(self._map[offset : offset + 4 * count])
+        if sys.byteorder == "big":
+            out.byteswap()
+        return out
+
+    def _bitmap(self, offset):
+        """Bitmap in the file"""
+        size = _bitmap_size(self.syllables)
+        if np is not None:
+            return np.frombuffer(self._map, dtype=np.uint8, count=size, offset=offset)
+        return self._map[offset : offset + size]
+
+    def __len__(self):
+        """Number of documents"""
+        return len(self._doc_starts) - 1
+
+    def terms(self):
+        """Number of syllables for each term in the index
+
+        Returns
+        -------
+        dict
+            Numbers of syllables (int) by field and value (str)
+        """
+        return {
+            (field, value_name(field, value)): count
+            for (field, value), (bitmap, offset, count) in self._terms.items()
+        }
+
+    def postings(self, field, value):
+        """Numbers of the syllables with a value of a field, ascending"""
+        try:
+            bitmap, offset, count = self._terms[field, value]
+        except KeyError:
+            return self._read(0, 0)
+        if bitmap:
+            return _set_bits(self._bitmap(offset))
+        return self._read(offset, count)
+
+    def search(self, terms):
+        """Numbers of the syllables that match all terms
+
+        Arguments
+        ---------
+        terms : list or str
+            Terms from `parse_query`, or a query, with spelled syllables in
+            the input scheme of the index
+
+        Returns
+        -------
+        numpy.ndarray or array.array
+            Syllable numbers, ascending
+        """
+        if isinstance(terms, str):
+            terms = parse_query(terms, self.scheme)
+        if not terms:
+            raise ValueError("Empty query")
+        empty = (False, 0, 0)
+        found = sorted((self._terms.get(term, empty) for term in terms), key=lambda t: t[2])
+        lists = [self._read(offset, count) for bitmap, offset, count in found if not bitmap]
+        bitmaps = [self._bitmap(offset) for bitmap, offset, count in found if bitmap]
+        if lists:
+            out = lists[0]
+        elif np is not None:
+            out = _set_bits(np.bitwise_and.reduce(bitmaps))
+            bitmaps = []
+        else:
+            combined = int.from_bytes(bitmaps[0], "little")
+            for other in bitmaps[1:]:
+                combined &= int.from_bytes(other, "little")
+            out = _set_bits(combined.to_bytes(len(bitmaps[0]), "little"))
+            bitmaps = []
+        for other in lists[1:]:
+            out = _intersect(out, other)
+        for other in bitmaps:
+            out = _filter(out, other)
+        return out
+
+    def count(self, terms):
+        """Number of syllables that match all terms, see `search`"""
+        return len(self.search(terms))
+
+    def locate(self, ids):
+        """Positions of syllables in the corpus
+
+        Arguments
+        ---------
+        ids : sequence
+            Syllable numbers
+
+        Returns
+        -------
+        list
+            Tuples of document number and position of the syllable in the
+            document, both counted from 0
+        """
+        starts = self._doc_starts
+        if np is not None:
+            docs = np.searchsorted(starts, ids, side="right") - 1
+            return list(zip(docs.tolist(), (np.asarray(ids) - starts[docs]).tolist()))
+        out = []
+        for n in ids:
+            doc = bisect_right(starts, n) - 1
+            out.append((doc, n - starts[doc]))
+        return out
+
+    def close(self):
+        # arrays from numpy.frombuffer keep the map open until they are
+        # garbage collected
+        self._doc_starts = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+import cProfile
+import heapq
+import pstats
+import threading
+import time
+
+from contextlib import contextmanager
+
+import parsetc.ir as ir
+
+# Time spent converting text, split into stages. Each stage only counts time
+# that is not spent in other stages nested in it, e.g. parsing text while
+# detecting its scheme counts as "parse", so the stages add up to the time
+# spent converting.
+STAGES = [
+    # reading input
+    "read",
+    # detecting the input scheme
+    "detect",
+    # converting tone diacritics to tone numbers
+    "diacritics",
+    # splitting text into syllables without parsing, see parsetc.scanner
+    "scan",
+    # parsing with Lark
+    "parse",
+    # rendering parse trees and syllables with Transformer callbacks
+    "transform",
+    # writing output
+    "write",
+]
+
+# Number of slowest lines that are reported
+SLOWEST = 10
+
+# Number of functions that are reported when profiling function calls
+FUNCTIONS = 30
+
+# Longest text of a line that is reported, in characters
+TEXT_LENGTH = 80
+
+# Rules of the grammars for a syllable
+SYLLABLE_RULES = {"syllable", "syllable_tone", "syllable_toneless"}
+
+
+def count_syllables(analysis):
+    """Number of syllables in output of `parsetc.parsetc.analyze` or `to_ir`"""
+    if isinstance(analysis, ir.Document):
+        return len(analysis)
+    if isinstance(analysis, list):
+        return sum(len(word) for word in analysis if isinstance(word, list))
+    return sum(1 for t in analysis.iter_subtrees() if t.data in SYLLABLE_RULES)
+
+
+class Profiler:
+    """Collect the time spent in each stage of conversion
+
+    Time is measured by conversion functions of `parsetc.parsetc` while the
+    profiler is enabled with `parsetc.parsetc.enable_profiling`, in the
+    current process only. Safe to use from several threads.
+
+    Arguments
+    ---------
+    slowest : int
+        Number of slowest lines to keep
+    callback : callable
+        Called with a dict that can be saved as JSON after each line is
+        converted: its number, time, length in characters, number of
+        syllables, time spent in each stage, and the type of error if it
+        could not be converted
+    functions : bool
+        Also profile function calls with cProfile, see `start`; this slows
+        down conversion considerably
+    """
+
+    def __init__(self, slowest=SLOWEST, callback=None, functions=False):
+        self.slowest = slowest
+        self.callback = callback
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.lines = 0
+        self.characters = 0
+        self.syllables = 0
+        # input that could not be handled by the fast parsers and was
+        # parsed again with a slower one, by parser
+        self.fallbacks = {}
+        # errors by type, including words skipped with on_error
+        self.failures = {}
+        self._slowest = []
+        self._profile = cProfile.Profile() if functions else None
+        self._started = time.perf_counter()
+        self._stopped = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Restart the clock, and profiling function calls in this thread"""
+        self._started = time.perf_counter()
+        self._stopped = None
+        if self._profile is not None:
+            self._profile.enable()
+
+    def stop(self):
+        """Stop the clock and profiling function calls"""
+        if self._profile is not None:
+            self._profile.disable()
+        if self._stopped is None:
+            self._stopped = time.perf_counter()
+
+    def _state(self):
+        """Stack of running stages and the current line of this thread"""
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack = []
+            local.line = None
+        return local
+
+    @contextmanager
+    def stage(self, name):
+        """Count the time spent in the block towards a stage"""
+        local = self._state()
+        stack = local.stack
+        now = time.perf_counter()
+        if stack:
+            # pause the enclosing stage
+            outer = stack[-1]
+            outer[2] += now - outer[1]
+        running = [name, now, 0.0]
+        stack.append(running)
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            stack.pop()
+            seconds = running[2] + now - running[1]
+            if stack:
+                stack[-1][1] = now
+            with self._lock:
+                self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+                self.calls[name] = self.calls.get(name, 0) + 1
+            if local.line is not None:
+                stages = local.line["stages"]
+                stages[name] = stages.get(name, 0.0) + seconds
+
+    def timed(self, name, iterable):
+        """Iterate, counting the time spent getting each item towards a stage"""
+        it = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    @contextmanager
+    def line(self, text):
+        """Record the time spent converting a line of text
+
+        Lines within lines, e.g. parts of a line converted separately, are
+        counted as part of the outermost one. Errors raised in the block are
+        counted as failures.
+        """
+        local = self._state()
+        if local.line is not None:
+            yield
+            return
+        record = {"syllables": 0, "stages": {}, "error": None}
+        local.line = record
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            record["error"] = type(e).__name__
+            self.failure(e)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            local.line = None
+            with self._lock:
+                self.lines += 1
+                self.characters += len(text)
+                number = self.lines
+                entry = (seconds, number, len(text), record["syllables"], text)
+                if len(self._slowest) < self.slowest:
+                    heapq.heappush(self._slowest, entry)
+                elif self._slowest and entry > self._slowest[0]:
+                    heapq.heapreplace(self._slowest, entry)
+            if self.callback is not None:
+                self.callback(
+                    {
+                        "line": number,
+                        "seconds": seconds,
+                        "length": len(text),
+                        "syllables": record["syllables"],
+                        "stages": record["stages"],
+                        "error": record["error"],
+                    }
+                )
+
+    def add_syllables(self, count):
+        """Count syllables that were converted"""
+        with self._lock:
+            self.syllables += count
+        line = self._state().line
+        if line is not None:
+            line["syllables"] += count
+
+    def fallback(self, parser):
+        """Count input that had to be parsed again with parser"""
+        with self._lock:
+            self.fallbacks[parser] = self.fallbacks.get(parser, 0) + 1
+
+    def failure(self, error):
+        """Count an error raised while converting"""
+        name = type(error).__name__
+        with self._lock:
+            self.failures[name] = self.failures.get(name, 0) + 1
+
+    def functions(self, limit=FUNCTIONS):
+        """Functions that took longest, by cumulative time
+
+        Returns
+        -------
+        list
+            For each function a dict with its name, file, line, numbers of
+            calls and primitive (not recursive) calls, and time spent in the
+            function itself and including functions it called. Empty if
+            function calls are not profiled.
+        """
+        if self._profile is None:
+            return []
+        try:
+            stats = pstats.Stats(self._profile).stats
+        except TypeError:
+            # nothing was profiled
+            return []
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            {
+                "function": name,
+                "file": filename,
+                "line": lineno,
+                "calls": calls,
+                "primitive_calls": primitive,
+                "seconds": own,
+                "cumulative_seconds": cumulative,
+            }
+            for (filename, lineno, name), (primitive, calls, own, cumulative, _) in rows[
+                :limit
+            ]
+        ]
+
+    def stats(self):
+        """Statistics that can be saved as JSON
+
+        Returns
+        -------
+        dict
+            Time since the profiler was started, seconds and number of calls
+            per stage, time not spent in any stage, numbers of lines,
+            characters and syllables and rates per second, fallbacks and
+            failures, slowest lines with their lengths, and functions that
+            took longest if profiled
+        """
+        end = self._stopped if self._stopped is not None else time.perf_counter()
+        wall = end - self._started
+        with self._lock:
+            stages = {
+                name: {"seconds": self.seconds[name], "calls": self.calls[name]}
+                for name in self.seconds
+            }
+            slowest = sorted(self._slowest, reverse=True)
+            out = {
+                "seconds": wall,
+                "other_seconds": max(wall - sum(self.seconds.values()), 0.0),
+                "stages": stages,
+                "lines": self.lines,
+                "characters": self.characters,
+                "syllables": self.syllables,
+                "lines_per_second": self.lines / wall if wall else 0.0,
+                "syllables_per_second": self.syllables / wall if wall else 0.0,
+                "fallbacks": dict(self.fallbacks),
+                "failures": dict(self.failures),
+            }
+        out["slowest_lines"] = [
+            {
+                "line": number,
+                "seconds": seconds,
+                "length": length,
+                "syllables": syllables,
+                "text": text[:TEXT_LENGTH],
+            }
+            for seconds, number, length, syllables, text in slowest
+        ]
+        if self._profile is not None:
+            out["functions"] = self.functions()
+        return out
+
+
+def format_stats(stats):
+    """Readable report of `Profiler.stats`"""
+    wall = stats["seconds"]
+    rows = [
+        f"{stats['lines']} lines, {stats['syllables']} syllables in {wall:.3f} s: "
+        f"{stats['lines_per_second']:.0f} lines/s, "
+        f"{stats['syllables_per_second']:.0f} syllables/s",
+        "",
+        f"{'stage':<12}{'seconds':>10}{'share':>8}{'calls':>10}",
+    ]
+    stages = [
+        (name, s["seconds"], s["calls"]) for name, s in stats["stages"].items()
+    ] + [("other", stats["other_seconds"], None)]
+    for name, seconds, calls in stages:
+        share = seconds / wall if wall else 0.0
+        calls = "" if calls is None else calls
+        rows.append(f"{name:<12}{seconds:>10.4f}{share:>8.1%}{calls:>10}")
+    rows.append("")
+    for name, counts in [("fallbacks", stats["fallbacks"]), ("failures", stats["failures"])]:
+        listed = ", ".join(f"{k} {v}" for k, v in sorted(counts.items())) or "none"
+        rows.append(f"{name}: {listed}")
+    if stats["slowest_lines"]:
+        rows += ["", f"{'line':>8}{'seconds':>10}{'length':>8}{'syllables':>10}  text"]
+        for line in stats["slowest_lines"]:
+            rows.append(
+                f"{line['line']:>8}{line['seconds']:>10.4f}{line['length']:>8}"
+                f"{line['syllables']:>10}  {line['text']}"
+            )
+    if stats.get("functions"):
+        rows += ["", f"{'calls':>10}{'seconds':>10}{'cumulative':>12}  function"]
+        for f in stats["functions"]:
+            rows.append(
+                f"{f['calls']:>10}{f['seconds']:>10.4f}{f['cumulative_seconds']:>12.4f}"
+                f"  {f['function']} ({f['file']}:{f['line']})"
+            )
+    return "\n".join(rows)
+
+
+class TimedFile:
+    """File opened for writing, whose writes count towards a stage
+
+    Arguments
+    ---------
+    file : file
+        File to write to; closed with this one
+    profiler : Profiler
+    stage : str
+        Name of stage
+    """
+
+    def __init__(self, file, profiler, stage="write"):
+        self.file = file
+        self.profiler = profiler
+        self.name = stage
+
+    def write(self, text):
+        with self.profiler.stage(self.name):
+            return self.file.write(text)
+
+    def flush(self):
+        with self.profiler.stage(self.name):
+            self.file.flush()
+
+    def close(self):
+        with self.profiler.stage(self.name):
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
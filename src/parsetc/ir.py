@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+from array import array
+
+from lark import Token, Tree
+
+from parsetc.translit import TERMINALS
+
+# Terminal types by id, in the order of terminals.json; id 0 is absent
+INITIALS = [None] + list(TERMINALS["initials"])
+MEDIALS = [None] + list(TERMINALS["medials"])
+CODAS = [None] + list(TERMINALS["codanasals"]) + list(TERMINALS["codastops"])
+INITIAL_IDS = {t: n for n, t in enumerate(INITIALS)}
+MEDIAL_IDS = {t: n for n, t in enumerate(MEDIALS)}
+CODA_IDS = {t: n for n, t in enumerate(CODAS)}
+
+# Tone numbers by id; NO_TONE for toneless syllables and absent sandhi tones
+TONES = "012345678"
+NO_TONE = 255
+
+# Syllable separators within words by id, stored in the flags
+SYLLABLE_SEPS = [None, "-", "'", "’"]
+SYLLABLE_SEP_IDS = {s: n for n, s in enumerate(SYLLABLE_SEPS)}
+
+# Flags
+NASAL = 1
+WORD_START = 2
+SEP_SHIFT = 2  # syllable separator after the syllable, in bits 2-3
+
+# Each syllable is a record of bytes: initial, medial, coda, citation tone,
+# sandhi tone, flags
+RECORD_SIZE = 6
+
+
+class Document:
+    """Compact representation of analyzed text
+
+    Syllables are stored as fixed-size records of small integers in a single
+    array, so that a document can be rendered many times, or pickled and sent
+    to other processes, much more cheaply than a parse tree.
+
+    Arguments
+    ---------
+    scheme : str
+        Input scheme of the text
+    syllables : array.array
+        Syllable records of RECORD_SIZE bytes each, see `add_syllable`
+    separators : list
+        Text between words (str), one more than the number of words
+    """
+
+    __slots__ = ("scheme", "syllables", "separators")
+
+    def __init__(self, scheme, syllables=None, separators=None):
+        self.scheme = scheme
+        self.syllables = array("B") if syllables is None else syllables
+        self.separators = [""] if separators is None else separators
+
+    def __len__(self):
+        """Number of syllables"""
+        return len(self.syllables) // RECORD_SIZE
+
+    def __eq__(self, other):
+        if not isinstance(other, Document):
+            return NotImplemented
+        return (
+            self.scheme == other.scheme
+            and self.syllables == other.syllables
+            and self.separators == other.separators
+        )
+
+    def __getstate__(self):
+        return (self.scheme, self.syllables, self.separators)
+
+    def __setstate__(self, state):
+        self.scheme, self.syllables, self.separators = state
+
+    def add_separator(self, text):
+        """Add text between words"""
+        self.separators[-1] += text
+
+    def add_syllable(
+        self, initial, medial, nasal, coda, tone, sandhi=None, word_start=False
+    ):
+        """Add a syllable
+
+        Arguments
+        ---------
+        initial, medial, coda : str
+            Terminal types, or None if absent
+        nasal : bool
+            Syllable is nasalized
+        tone, sandhi : str
+            Citation and sandhi tone numbers, or None if absent
+        word_start : bool
+            Syllable begins a new word
+        """
+        flags = 0
+        if nasal:
+            flags |= NASAL
+        if word_start:
+            flags |= WORD_START
+            self.separators.append("")
+        self.syllables.extend(
+            (
+                INITIAL_IDS[initial],
+                MEDIAL_IDS[medial],
+                CODA_IDS[coda],
+                NO_TONE if tone is None else int(tone),
+                NO_TONE if sandhi is None else int(sandhi),
+                flags,
+            )
+        )
+
+    def add_syllable_sep(self, sep):
+        """Add a syllable separator after the last syllable"""
+        self.syllables[-1] |= SYLLABLE_SEP_IDS[sep] << SEP_SHIFT
+
+    def records(self):
+        """Iterate over syllable records, as tuples of ints"""
+        s = self.syllables
+        for n in range(0, len(s), RECORD_SIZE):
+            yield tuple(s[n : n + RECORD_SIZE])
+
+
+def _add_tree_syllable(doc, tree, word_start):
+    """Add a 'syllable_tone' or 'syllable_toneless' subtree to a document"""
+    initial = medial = coda = tone = sandhi = None
+    nasal = False
+    for child in tree.children:
+        if child.data == "initial":
+            initial = child.children[0].type
+        elif child.data == "tone":
+            tone = str(child.children[0])
+            if len(child.children) == 2:
+                sandhi = str(child.children[1])
+        else:
+            # final
+            for part in child.children:
+                if isinstance(part, Token):
+                    # NASAL
+                    nasal = True
+                elif part.data == "medial":
+                    medial = part.children[0].type
+                elif part.data == "coda":
+                    coda = part.children[0].children[0].type
+                else:
+                    # codanasal or codastops
+                    coda = part.children[0].type
+    doc.add_syllable(initial, medial, nasal, coda, tone, sandhi, word_start)
+
+
+def from_tree(tree, scheme):
+    """Convert a parse tree into a Document
+
+    Arguments
+    ---------
+    tree : lark.Tree
+        Parse tree with 'sentence' at the root, see `parsetc.parsetc.parse`
+    scheme : str
+        Input scheme of the parsed text
+
+    Returns
+    -------
+    Document
+    """
+    doc = Document(scheme)
+    for child in tree.children:
+        if isinstance(child, Token):
+            doc.add_separator(str(child))
+            continue
+        word_start = True
+        word = child
+        while word is not None:
+            # 'word_sep' is nested: syllable, optional separator, rest of word
+            rest = None
+            for part in word.children:
+                if isinstance(part, Token):
+                    doc.add_syllable_sep(str(part))
+                elif part.data == "word_sep":
+                    rest = part
+                else:
+                    _add_tree_syllable(doc, part, word_start)
+                    word_start = False
+            word = rest
+    return doc
+
+
+def from_scanned(scanned, scheme):
+    """Convert scanned text into a Document
+
+    Arguments
+    ---------
+    scanned : list
+        Output from `parsetc.scanner.Scanner.scan`
+    scheme : str
+        Input scheme of the scanned text
+
+    Returns
+    -------
+    Document
+    """
+    doc = Document(scheme)
+    for item in scanned:
+        if isinstance(item, list):
+            word_start = True
+            for initial, medial, nasal, coda, tone, sandhi in item:
+                doc.add_syllable(
+                    initial, medial, nasal is not None, coda, tone, sandhi, word_start
+                )
+                word_start = False
+        else:
+            doc.add_separator(item)
+    return doc
+
+
+def from_analysis(analysis, scheme):
+    """Convert output of `parsetc.parsetc.analyze` into a Document"""
+    if isinstance(analysis, Tree):
+        return from_tree(analysis, scheme)
+    return from_scanned(analysis, scheme)
+
+
+def _syllable_renderer(renderer, nasal):
+    """Function that renders a syllable record, with memoization"""
+    memo = {}
+
+    def render_syllable(record):
+        try:
+            return memo[record]
+        except KeyError:
+            pass
+        initial, medial, coda, tone, sandhi, flags = record
+        out = renderer.render_parts(
+            INITIALS[initial],
+            MEDIALS[medial],
+            nasal if flags & NASAL else None,
+            CODAS[coda],
+            None if tone == NO_TONE else TONES[tone],
+            None if sandhi == NO_TONE else TONES[sandhi],
+        )
+        memo[record] = out
+        return out
+
+    return render_syllable
+
+
+class DocumentRenderer:
+    """Render Documents with several output Renderers
+
+    Rendered syllables are remembered, so that each distinct syllable is only
+    rendered once per renderer, also across documents.
+
+    Arguments
+    ---------
+    renderers : list
+        Output schemes, parsetc.translit.Renderer instances
+    """
+
+    def __init__(self, renderers):
+        self.renderers = list(renderers)
+        # syllable rendering functions per input scheme, which determines
+        # the nasal string
+        self._syllable_renderers = {}
+
+    def render(self, doc):
+        """Render a Document
+
+        Returns
+        -------
+        list
+            Rendered text, str for each renderer; the same as transforming
+            the parse tree of the text with each renderer
+        """
+        try:
+            syllable_renderers = self._syllable_renderers[doc.scheme]
+        except KeyError:
+            nasal = TERMINALS["nasal"]["NASAL"][doc.scheme]
+            syllable_renderers = [_syllable_renderer(r, nasal) for r in self.renderers]
+            self._syllable_renderers[doc.scheme] = syllable_renderers
+        out = []
+        for renderer, render_syllable in zip(self.renderers, syllable_renderers):
+            pieces = [doc.separators[0]]
+            word = None
+            nwords = 0
+            for record in doc.records():
+                flags = record[5]
+                if flags & WORD_START:
+                    if word is not None:
+                        pieces.append(renderer.word_sep(word))
+                        pieces.append(doc.separators[nwords])
+                    word = []
+                    nwords += 1
+                word.append(render_syllable(record))
+                sep = SYLLABLE_SEPS[flags >> SEP_SHIFT]
+                if sep is not None:
+                    word.append(renderer.SYLLABLE_SEP(sep))
+            if word is not None:
+                pieces.append(renderer.word_sep(word))
+                pieces.append(doc.separators[nwords])
+            out.append(renderer.sentence(pieces))
+        return out
+
+
+def render_all(doc, renderers):
+    """Render a Document with several output Renderers
+
+    Each distinct syllable is only rendered once per renderer. To render
+    many Documents, use DocumentRenderer.
+
+    Arguments
+    ---------
+    doc : Document
+    renderers : list
+        Output schemes, parsetc.translit.Renderer instances
+
+    Returns
+    -------
+    list
+        Rendered text, str for each renderer; the same as transforming the
+        parse tree of the text with each renderer
+    """
+    return DocumentRenderer(renderers).render(doc)
+
+
+def render(doc, renderer):
+    """Render a Document with an output Renderer, see `render_all`"""
+    return render_all(doc, [renderer])[0]
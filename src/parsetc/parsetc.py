@@ -1,19 +1,32 @@
 #!/usr/bin/env python3
 
 import re
-import unicodedata
 import argparse
+import os
 import sys
 import json
+import itertools
 
 import parsetc.translit as translit
+import parsetc.cache as cache
+import parsetc.scanner as scanner
+import parsetc.memo as memo
+import parsetc.stream as stream
+import parsetc.ir as ir
+import parsetc.corpus as corpus
+import parsetc.diacritics as diacritics
+import parsetc.segment as segment
+import parsetc.detect as detect
+import parsetc.instrument as instrument
 
 from textwrap import dedent
-from importlib_resources import files
-from lark import Lark
-
-# Load terminals data
-TERMINALS = json.loads(files("parsetc").joinpath("terminals.json").read_text())
+from contextlib import nullcontext
+from functools import partial
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from lark.exceptions import LarkError, UnexpectedInput
+from parsetc.registry import Registry
+from parsetc.translit import TERMINALS, TERMINALS_JSON
 
 # grammar rules per transcription system
 # written in Lark format
@@ -152,101 +165,779 @@ TONENUMBER : "0".."8"
 SYLLABLE_SEP : "-" | "'" | "’"
 """
 
-# Available input formats for parsers
-PARSER_DICT = {}
-LARK_DICT = {}
-for scheme in ["dieghv", "gdpi", "ggn", "ggnn", "tlo", "tailo"]:
-    lark_rules = [RULES["common"], RULES[scheme]]
+# Deterministic variant of the 'sentence_tone' rules for the LALR(1) parser.
+# Rules are aliased to 'sentence' and 'word_sep' so that the parse tree has the
+# same shape as from the Earley parser, and the same Transformers can be used
+RULES[
+    "lalr"
+] = """
+sentence_lalr : _sep? word_lalr ( _sep word_lalr )* _sep? -> sentence
+word_lalr : syllable_tone word_lalr? -> word_sep
+_sep : ( PUNCTUATION | SPACE )+
+"""
+
+
+def lark_terminals(scheme, prioritize=False):
+    """Terminal definitions in Lark format for a given input scheme
+
+    Arguments
+    ---------
+    scheme : str
+        Input scheme, must be present in terminals.json
+    prioritize : bool
+        Give each terminal an explicit priority, for the contextual lexer of
+        the LALR parser. Longer strings are always matched first; where two
+        terminals have the same string (e.g. "ng" for INIT_NG, MED_NG, COD_NG)
+        the earlier one in terminals.json wins, which mirrors how the Earley
+        parser resolves the ambiguity.
+
+    Returns
+    -------
+    list
+        Terminal definitions, one str per terminal
+    """
+    out = []
+    rank = sum(len(TERMINALS[group]) for group in TERMINALS)
     for group in TERMINALS:
         for term in TERMINALS[group]:
+            rank -= 1
             if scheme in TERMINALS[group][term]:
-                lark_rules.append(f'{term} : "{TERMINALS[group][term][scheme]}"')
-    LARK_DICT[scheme] = "\n".join(lark_rules)
-    PARSER_DICT[scheme] = Lark("\n".join(lark_rules), start="sentence")
+                value = TERMINALS[group][term][scheme]
+                if prioritize:
+                    priority = len(value) * 100 + rank
+                    out.append(f'{term}.{priority} : "{value}"')
+                else:
+                    out.append(f'{term} : "{value}"')
+    return out
 
 
-# Available output formats for transformers
-TRANSFORMER_DICT = {
-    "gdpi": translit.Gdpi(),
-    "ggnn": translit.Ggnn(),
-    "tlo": translit.Tlo(),
-    "duffus": translit.Duffus(),
-    "sinwz": translit.Sinwz(),
-    "15": translit.Zapngou(),
-    "tailo": translit.Tailo(),
+# Options passed to Lark for each parser algorithm
+LARK_OPTIONS = {
+    "earley": {"start": "sentence"},
+    "lalr": {"parser": "lalr", "lexer": "contextual", "start": "sentence_lalr"},
 }
 
+# Input schemes that have grammar rules
+INPUT_SCHEMES = ["dieghv", "gdpi", "ggn", "ggnn", "tlo", "tailo"]
+
+
+def lark_grammar(scheme, parser="earley"):
+    """Full grammar in Lark format for an input scheme
+
+    Arguments
+    ---------
+    scheme : str
+        Input scheme
+    parser : str
+        "earley" or "lalr", see `parse`
+
+    Returns
+    -------
+    str
+    """
+    if parser == "lalr":
+        lark_rules = [RULES["common"], RULES[scheme], RULES["lalr"]]
+        lark_rules += lark_terminals(scheme, prioritize=True)
+    else:
+        lark_rules = [RULES["common"], RULES[scheme]] + lark_terminals(scheme)
+    return "\n".join(lark_rules)
+
+
+def build_parser(scheme, parser="earley", rebuild=False):
+    """Build parser for an input scheme, using the on-disk cache
+
+    Arguments
+    ---------
+    scheme : str
+        Input scheme
+    parser : str
+        "earley" or "lalr", see `parse`
+    rebuild : bool
+        Ignore and overwrite cached parser
+
+    Returns
+    -------
+    lark.Lark
+    """
+    return cache.load_parser(
+        LARK_DICT[scheme] if parser == "earley" else LALR_LARK_DICT[scheme],
+        TERMINALS_JSON,
+        rebuild=rebuild,
+        **LARK_OPTIONS[parser],
+    )
+
+
+# Available input formats for parsers
+# Grammars and parsers are only built the first time that they are used
+LARK_DICT = Registry({s: partial(lark_grammar, s) for s in INPUT_SCHEMES})
+LALR_LARK_DICT = Registry({s: partial(lark_grammar, s, "lalr") for s in INPUT_SCHEMES})
+PARSER_DICT = Registry({s: partial(build_parser, s) for s in INPUT_SCHEMES})
+LALR_PARSER_DICT = Registry({s: partial(build_parser, s, "lalr") for s in INPUT_SCHEMES})
+# Available parser algorithms, see `parse` and `analyze`
+PARSERS = ["earley", "lalr", "scan", "segment"]
+SCANNER_DICT = Registry({s: partial(scanner.Scanner, s) for s in INPUT_SCHEMES})
+
+# Syllable frequencies for the "segment" parser, see load_segment_model
+SEGMENT_MODEL = None
+
+
+def _build_segmenter(scheme):
+    return segment.Segmenter(scheme, SEGMENT_MODEL)
+
+
+SEGMENTER_DICT = Registry({s: partial(_build_segmenter, s) for s in INPUT_SCHEMES})
+
+
+def load_segment_model(path):
+    """Use syllable frequencies from a file for the "segment" parser
+
+    Arguments
+    ---------
+    path : str
+        JSON file of syllable counts, see
+        `parsetc.segment.FrequencyModel.load`; None to go back to all
+        syllables being equally likely
+
+    Returns
+    -------
+    parsetc.segment.FrequencyModel
+    """
+    global SEGMENT_MODEL, SEGMENTER_DICT
+    SEGMENT_MODEL = None if path is None else segment.FrequencyModel.load(path)
+    SEGMENTER_DICT = Registry({s: partial(_build_segmenter, s) for s in INPUT_SCHEMES})
+    cache = WORD_CACHE
+    if cache is not None:
+        # segmentations from the previous model
+        cache.clear()
+    return SEGMENT_MODEL
 
-def tlo_syllable_parse(syllable):
-    """Parse a Tie-lo syllable with diacritics to get tone number
 
-    Will not complain if a syllable has two diacritics. Beware!
+def build_cache():
+    """Compile all parsers and save them to the on-disk cache
+
+    Stale entries from earlier versions of the grammar are removed.
 
     Returns
     -------
-    (str, int) : base syllable string, tone number. Tone 0 not supported
+    str
+        Path to cache directory
     """
-    tonemarks = {
-        769: 2,  # hex 0x301
-        768: 3,  # 0x300
-        770: 5,  # 0x302
-        774: 6,  # 0x306
-        780: 6,  # 0x30C combining caron, often confused with combining breve
-        772: 7,  # 0x304
-        781: 5,  # tailo 8 tonemark
+    keep = set()
+    for parser, grammars in [("earley", LARK_DICT), ("lalr", LALR_LARK_DICT)]:
+        for scheme in grammars:
+            build_parser(scheme, parser, rebuild=True)
+            keep.add(
+                cache.cache_key(grammars[scheme], TERMINALS_JSON, LARK_OPTIONS[parser])
+            )
+    cache.prune(keep)
+    return cache.cache_dir()
+
+
+# Available output formats for transformers
+# Transformers are only instantiated the first time that they are used
+TRANSFORMER_DICT = Registry(
+    {
+        "gdpi": translit.Gdpi,
+        "ggnn": translit.Ggnn,
+        "tlo": translit.Tlo,
+        "duffus": translit.Duffus,
+        "sinwz": translit.Sinwz,
+        "15": translit.Zapngou,
+        "tailo": translit.Tailo,
     }
-    notone = []
-    tone = 1  # default tone
-    for c in syllable:
-        # in case combining marks are in use, cannot be decomposed
-        if ord(c) in tonemarks:
-            # ord returns decimal value
-            tone = tonemarks[ord(c)]
-        else:
-            # decompose each character into diacritics
-            decomp = unicodedata.decomposition(c).split()
-            # convert hex values to decimal
-            decomp = [int("0x" + i, 16) for i in decomp]
-            if len(decomp) > 0:
-                # check if key is present
-                if decomp[1] in tonemarks:
-                    # base letter
-                    notone.append(chr(decomp[0]))
-                    # tone
-                    tone = tonemarks[decomp[1]]
-                else:
-                    print(f"invalid diacritic found in character {c} {syllable}")
-                    return (syllable.upper(), None)
-            else:
-                # not a diacritic, append to the base
-                notone.append(c)
-    # check for entering tones
-    if notone[-1] in ["p", "t", "k", "h"]:
-        if tone == 1:
-            tone = 4
-        elif tone == 5:
-            tone = 8
-    return ("".join(notone), tone)
+)
 
 
 def tlo_convert_to_numeric(text):
     """Convert Tie-lo with diacritics to tone numbers
 
+    See `parsetc.diacritics.to_numeric`, which also handles Tai-lo
+
     Returns
     -------
     str
         Tie-lo with tone numbers instead of diacritics
     """
-    out = []
-    for elem in re.split(r"([\s,\.\'\"\?\!\-]+)", text):
-        if elem != "" and not re.match(r"([\s,\.\'\"\?\!\-]+)", elem):
-            out.append("".join([str(i) for i in tlo_syllable_parse(elem)]))
+    with _stage("diacritics"):
+        return diacritics.to_numeric(text, "tlo")
+
+
+def parse(phrase, i="gdpi", parser="earley"):
+    """Parse romanized Teochew with the grammar for a given input scheme
+
+    Arguments
+    ---------
+    phrase : str
+        Text to be parsed
+    i : str
+        Input format. Must match one of the available inputs
+    parser : str
+        "earley" (default) handles all input. "lalr" is much faster but only
+        accepts text where every syllable has a tone number; input that it
+        rejects is parsed again with the Earley parser. "scan" is the same as
+        "lalr", and "segment" the same as "earley" here, because a parse tree
+        is required, see `analyze`.
+
+    Returns
+    -------
+    lark.Tree
+        Parse tree with 'sentence' at the root
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser {parser}, must be one of {', '.join(PARSERS)}")
+    with _stage("parse"):
+        if parser in ["lalr", "scan"]:
+            try:
+                return LALR_PARSER_DICT[i].parse(phrase)
+            except UnexpectedInput:
+                _fallback("earley")
+        return PARSER_DICT[i].parse(phrase)
+
+
+def analyze(phrase, i="gdpi", parser="earley"):
+    """Parse romanized Teochew, or split it into syllables if possible
+
+    Arguments
+    ---------
+    phrase : str
+        Text to be parsed
+    i : str
+        Input format. Must match one of the available inputs
+    parser : str
+        "scan" splits text where every syllable has a tone number into
+        syllables with a regex, which is much faster than parsing; text that
+        cannot be scanned is parsed with the "lalr" parser. "segment" splits
+        words without tone numbers or syllable separators into their most
+        probable syllables (see `load_segment_model`) instead of leaving the
+        choice to the Earley parser; text that cannot be segmented is parsed
+        with the "earley" parser. Other values are passed to `parse`.
+
+    Returns
+    -------
+    lark.Tree, list or parsetc.ir.Document
+        Parse tree, scanned text (see `parsetc.scanner.Scanner.scan`), or
+        segmented text
+    """
+    if parser in ["scan", "segment"]:
+        with _stage("scan"):
+            if parser == "scan":
+                analysis = SCANNER_DICT[i].scan(phrase)
+            else:
+                analysis = SEGMENTER_DICT[i].analyze(phrase)
+        if analysis is not None:
+            return analysis
+        _fallback("lalr" if parser == "scan" else "earley")
+    return parse(phrase, i=i, parser=parser)
+
+
+def detect_scheme(text, parser="scan"):
+    """Guess the input scheme of romanized Teochew
+
+    Candidate schemes are ranked by the spellings in the text, see
+    `parsetc.detect.scores`, and only the most likely one is confirmed by
+    parsing the text. Schemes that accept the same text, such as ggn and
+    ggnn, cannot be told apart, and the first is reported.
+
+    Arguments
+    ---------
+    text : str
+        Text to be classified, lowercase; tone diacritics are allowed for
+        schemes in `parsetc.diacritics.SCHEMES`
+    parser : str
+        Parser to confirm the scheme with, one of PARSERS, see `analyze`
+
+    Returns
+    -------
+    tuple
+        Most likely input scheme (str), and confidence between 0 and 1
+        (float), which is 0 if the text cannot be parsed in that scheme
+    """
+    return _detect_scheme(text, parser)[:2]
+
+
+def _detect_scheme(text, parser):
+    """Guess the input scheme, see `detect_scheme`
+
+    Returns
+    -------
+    tuple
+        Input scheme, confidence, text with tone diacritics converted to tone
+        numbers if the scheme uses them, and the output of `analyze` that
+        confirmed the scheme (None if the text could not be analyzed or has
+        no words), so that the text need not be analyzed again
+    """
+    with _stage("detect"):
+        probs = detect.scores(text)
+        scheme = next(iter(probs))
+        if text.strip(scanner.SEPARATORS) == "":
+            return scheme, probs[scheme], text, None
+        if scheme in diacritics.SCHEMES and not detect.has_tone_numbers(text):
+            with _stage("diacritics"):
+                text = diacritics.to_numeric(text, scheme)
+        try:
+            analysis = analyze(text, i=scheme, parser=parser)
+        except (LarkError, KeyError):
+            return scheme, 0.0, text, None
+        return scheme, probs[scheme], text, analysis
+
+
+def to_ir(phrase, i="gdpi", parser="earley"):
+    """Analyze romanized Teochew into the compact intermediate representation
+
+    The result can be rendered into any output scheme with `render` or
+    `render_all`, many times and in other processes, without parsing again.
+
+    Arguments
+    ---------
+    phrase : str
+        Text to be parsed
+    i : str
+        Input format. Must match one of the available inputs
+    parser : str
+        Parser to use, one of PARSERS, see `analyze`
+
+    Returns
+    -------
+    parsetc.ir.Document
+        Text without any words, e.g. empty lines, gives a Document without
+        syllables
+    """
+    if phrase.strip(scanner.SEPARATORS) == "":
+        return ir.Document(i, separators=[phrase])
+    analysis = analyze(phrase, i=i, parser=parser)
+    _count_syllables(analysis)
+    if isinstance(analysis, ir.Document):
+        return analysis
+    with _stage("transform"):
+        return ir.from_analysis(analysis, i)
+
+
+def render_corpus(path, outputs=("tlo",), vectorized=False, batch_size=10000):
+    """Render the documents in a corpus file, without parsing
+
+    Arguments
+    ---------
+    path : str
+        Corpus file written with `parsetc.corpus.CorpusWriter`, e.g. with
+        the --emit-corpus command line option
+    outputs : list
+        Output formats. Must match available outputs
+    vectorized : bool
+        Render batches of documents with NumPy, see `parsetc.vectorized`;
+        requires numpy
+    batch_size : int
+        Number of documents per batch, with vectorized
+
+    Yields
+    ------
+    tuple
+        Rendered text (str) for each output scheme in a list, original text
+        (str), and whether the document is the end of a line (bool)
+    """
+    renderers = [TRANSFORMER_DICT[o] for o in outputs]
+    with corpus.Corpus(path) as docs:
+        if vectorized:
+            import parsetc.vectorized as vectorized_backend
+
+            for batch in _chunks(docs, batch_size):
+                try:
+                    with _stage("transform"):
+                        rendered = vectorized_backend.render_all(
+                            [doc for doc, text, line_end in batch], renderers
+                        )
+                except (KeyError, ValueError):
+                    # a document that cannot be rendered fails the whole
+                    # batch, so render one by one up to the one that fails
+                    yield from _render_documents(batch, renderers)
+                    continue
+                for n, (doc, text, line_end) in enumerate(batch):
+                    with _line(text):
+                        _count_syllables(doc)
+                    yield [r[n] for r in rendered], text, line_end
         else:
-            out.append(elem)
-    return "".join(out)
+            yield from _render_documents(docs, renderers)
+
+
+def _render_documents(docs, renderers):
+    """Render documents one by one, see `render_corpus`"""
+    renderer = ir.DocumentRenderer(renderers)
+    for doc, text, line_end in docs:
+        with _line(text):
+            _count_syllables(doc)
+            with _stage("transform"):
+                rendered = renderer.render(doc)
+        yield rendered, text, line_end
+
+
+def render(analysis, o="tlo"):
+    """Render output of `analyze` or `to_ir` in an output scheme
+
+    Arguments
+    ---------
+    analysis : lark.Tree, list or parsetc.ir.Document
+        Output from `analyze` or `to_ir`
+    o : str
+        Output format. Must match one of the available outputs
+
+    Returns
+    -------
+    str
+    """
+    _count_syllables(analysis)
+    with _stage("transform"):
+        if isinstance(analysis, ir.Document):
+            return ir.render(analysis, TRANSFORMER_DICT[o])
+        if isinstance(analysis, list):
+            return scanner.render(analysis, TRANSFORMER_DICT[o])
+        return TRANSFORMER_DICT[o].transform(analysis)
+
+
+def render_all(analysis, outputs):
+    """Render output of `analyze` or `to_ir` in several output schemes in a single pass
+
+    Arguments
+    ---------
+    analysis : lark.Tree, list or parsetc.ir.Document
+        Output from `analyze` or `to_ir`
+    outputs : list
+        Output formats. Must match available outputs
+
+    Returns
+    -------
+    list
+        Rendered text (str) for each output scheme, in the same order
+    """
+    if len(outputs) == 1:
+        return [render(analysis, outputs[0])]
+    renderers = [TRANSFORMER_DICT[o] for o in outputs]
+    _count_syllables(analysis)
+    with _stage("transform"):
+        if isinstance(analysis, ir.Document):
+            return ir.render_all(analysis, renderers)
+        if isinstance(analysis, list):
+            return scanner.render_all(analysis, renderers)
+        return translit.MultiRenderer(renderers).transform(analysis)
+
+
+# Opt-in cache of converted words, shared by all conversions
+# see enable_word_cache
+WORD_CACHE = None
+
+# Split text at spaces. Words where every syllable has a tone number are
+# unambiguous, so each run of non-space characters can be converted and cached
+# on its own
+SPACES = re.compile(r"( +)")
+
+# Split text into words and separators
+WORDS = scanner.WORDS
+
+# Ways to handle words that cannot be converted, when converting word by word
+ON_ERROR = ["raise", "skip", "mark", "passthrough"]
+
+# Replacement for words that cannot be converted, with on_error="mark"
+ERROR_MARK = "⟦{}⟧"
+
+
+def enable_word_cache(maxsize=100000):
+    """Cache converted words, keyed by input and output scheme and word
+
+    Arguments
+    ---------
+    maxsize : int
+        Maximum number of cached words; least recently used are evicted first
+
+    Returns
+    -------
+    parsetc.memo.LRUCache
+    """
+    global WORD_CACHE
+    WORD_CACHE = memo.LRUCache(maxsize)
+    return WORD_CACHE
+
+
+def disable_word_cache():
+    """Stop caching converted words and discard the cache"""
+    global WORD_CACHE
+    WORD_CACHE = None
+
+
+def word_cache_stats():
+    """Hit and miss statistics of the word cache, None if not enabled"""
+    cache = WORD_CACHE
+    if cache is None:
+        return None
+    return cache.stats()
+
+
+# Opt-in collection of time spent in each stage of conversion
+# see enable_profiling
+PROFILER = None
+
+# Stage of conversion that is not timed, when profiling is not enabled
+UNTIMED = nullcontext()
+
+
+def enable_profiling(slowest=instrument.SLOWEST, callback=None, functions=False):
+    """Measure time spent in each stage of conversion, in this process
+
+    Arguments are passed to `parsetc.instrument.Profiler`. Conversions in
+    worker processes, e.g. of `transliterate_many`, are not measured.
+
+    Returns
+    -------
+    parsetc.instrument.Profiler
+    """
+    global PROFILER
+    PROFILER = instrument.Profiler(slowest=slowest, callback=callback, functions=functions)
+    PROFILER.start()
+    return PROFILER
+
+
+def disable_profiling():
+    """Stop measuring conversion and discard the measurements"""
+    global PROFILER
+    profiler = PROFILER
+    PROFILER = None
+    if profiler is not None:
+        profiler.stop()
+
+
+def profiling_stats():
+    """Time spent in each stage of conversion and other statistics, None if
+    profiling is not enabled, see `parsetc.instrument.Profiler.stats`"""
+    profiler = PROFILER
+    if profiler is None:
+        return None
+    return profiler.stats()
+
+
+def _stage(name):
+    """Context manager counting time towards a stage when profiling"""
+    profiler = PROFILER
+    if profiler is None:
+        return UNTIMED
+    return profiler.stage(name)
+
+
+def _line(text):
+    """Context manager recording time spent on a line of text when profiling"""
+    profiler = PROFILER
+    if profiler is None:
+        return UNTIMED
+    return profiler.line(text)
+
+
+def _fallback(parser):
+    """Count text that is parsed again with a slower parser when profiling"""
+    profiler = PROFILER
+    if profiler is not None:
+        profiler.fallback(parser)
+
 
+def _failure(error):
+    """Count a word that cannot be converted when profiling"""
+    profiler = PROFILER
+    if profiler is not None:
+        profiler.failure(error)
 
-def transliterate_all(phrase, i="gdpi"):
+
+def _timed(name, iterable):
+    """Iterate, counting time spent getting items towards a stage when profiling"""
+    profiler = PROFILER
+    if profiler is None:
+        return iterable
+    return profiler.timed(name, iterable)
+
+
+def _open_output(path=None):
+    """Open file or STDOUT for writing, see `parsetc.stream.open_output`,
+    counting time spent writing when profiling"""
+    out = stream.open_output(path)
+    profiler = PROFILER
+    if profiler is None:
+        return out
+    return instrument.TimedFile(out, profiler)
+
+
+def _count_syllables(analysis):
+    """Count syllables that are converted when profiling"""
+    profiler = PROFILER
+    if profiler is not None:
+        profiler.add_syllables(instrument.count_syllables(analysis))
+
+
+def convert(
+    phrase, i="gdpi", outputs=("tlo",), parser="earley", on_error=None, analysis=None
+):
+    """Convert text into one or more output schemes, using the word cache
+
+    Arguments
+    ---------
+    phrase : str
+        Text to be transliterated
+    i : str
+        Input format. Must match one of the available inputs
+    outputs : list
+        Output formats. Must match available outputs
+    parser : str
+        Parser to use, one of PARSERS, see `analyze`
+    on_error : str
+        If given, parse each word separately, so that time taken grows
+        linearly with the length of the text, and handle words that cannot
+        be converted with one of the policies in ON_ERROR, see
+        `convert_words`. By default the whole text is parsed at once.
+    analysis
+        Output of `analyze` for phrase with the same input format and
+        parser, e.g. from detecting its scheme, which is rendered instead of
+        analyzing phrase again. Ignored with on_error.
+
+    Returns
+    -------
+    list
+        Converted text (str) for each output scheme, in the same order
+    """
+    with _line(phrase):
+        if analysis is not None and on_error is None:
+            return render_all(analysis, outputs)
+        return _convert(phrase, i, outputs, parser, on_error)
+
+
+def _convert(phrase, i, outputs, parser, on_error):
+    """Convert text, see `convert`"""
+    if on_error is not None:
+        return convert_words(phrase, i=i, outputs=outputs, parser=parser, on_error=on_error)
+    # the cache may be disabled by another thread meanwhile
+    cache = WORD_CACHE
+    if cache is None:
+        return render_all(analyze(phrase, i=i, parser=parser), outputs)
+    out = [[] for o in outputs]
+    for chunk in SPACES.split(phrase):
+        if chunk.strip(scanner.SEPARATORS) == "":
+            # spaces and punctuation are the same in all schemes
+            for pieces in out:
+                pieces.append(chunk)
+            continue
+        converted = [cache.get((i, o, chunk)) for o in outputs]
+        missing = [o for o, c in zip(outputs, converted) if c is None]
+        if missing:
+            with _stage("scan"):
+                scanned = SCANNER_DICT[i].scan(chunk)
+            if scanned is None:
+                # Syllable boundaries may be ambiguous, and how they are
+                # resolved can depend on the rest of the text, so only the
+                # whole phrase can be cached
+                return _convert_phrase(phrase, i, outputs, parser, cache)
+            rendered = dict(zip(missing, render_all(scanned, missing)))
+            for n, o in enumerate(outputs):
+                if converted[n] is None:
+                    converted[n] = rendered[o]
+                    cache.put((i, o, chunk), converted[n])
+        for pieces, c in zip(out, converted):
+            pieces.append(c)
+    return ["".join(pieces) for pieces in out]
+
+
+def convert_words(phrase, i="gdpi", outputs=("tlo",), parser="earley", on_error="raise"):
+    """Convert text word by word, using the word cache
+
+    Separators between words are kept as they are. Untoned words are parsed
+    without the rest of the text, so where syllable boundaries are ambiguous,
+    they may be resolved differently than when converting the whole text.
+
+    Arguments
+    ---------
+    phrase : str
+        Text to be transliterated
+    i : str
+        Input format. Must match one of the available inputs
+    outputs : list
+        Output formats. Must match available outputs
+    parser : str
+        Parser to use, one of PARSERS, see `analyze`
+    on_error : str
+        What to do with words that cannot be converted: "raise" the error,
+        "skip" the word, "mark" the word by enclosing it in ERROR_MARK, or
+        "passthrough" the word unchanged
+
+    Returns
+    -------
+    list
+        Converted text (str) for each output scheme, in the same order
+    """
+    if on_error not in ON_ERROR:
+        raise ValueError(f"Unknown on_error {on_error}, must be one of {', '.join(ON_ERROR)}")
+    out = [[] for o in outputs]
+    for n, chunk in enumerate(WORDS.split(phrase)):
+        if n % 2 == 0:
+            # separators
+            converted = [chunk] * len(outputs)
+        else:
+            converted = convert_word(chunk, i, outputs, parser, on_error)
+        for pieces, c in zip(out, converted):
+            pieces.append(c)
+    return ["".join(pieces) for pieces in out]
+
+
+def convert_word(word, i="gdpi", outputs=("tlo",), parser="earley", on_error="raise"):
+    """Convert a single word, using the word cache
+
+    Arguments are the same as for `convert_words`; `word` must be a single
+    word without separators around it, see WORDS.
+
+    Returns
+    -------
+    list
+        Converted word (str) for each output scheme, in the same order
+    """
+    converted = None
+    cache = WORD_CACHE
+    if cache is not None:
+        converted = [cache.get(_cache_key(i, o, word, parser)) for o in outputs]
+    if converted is None or None in converted:
+        try:
+            converted = render_all(analyze(word, i=i, parser=parser), outputs)
+        except (LarkError, KeyError) as e:
+            if on_error == "raise":
+                raise
+            _failure(e)
+            if on_error == "skip":
+                converted = [""] * len(outputs)
+            elif on_error == "mark":
+                converted = [ERROR_MARK.format(word)] * len(outputs)
+            else:
+                converted = [word] * len(outputs)
+        else:
+            if cache is not None:
+                for o, c in zip(outputs, converted):
+                    cache.put(_cache_key(i, o, word, parser), c)
+    return converted
+
+
+def _cache_key(i, o, text, parser):
+    """Key in the word cache for text that may not have tone numbers"""
+    # segmentation can differ from how the parsers split untoned words
+    if parser == "segment":
+        return (i, o, text, parser)
+    return (i, o, text)
+
+
+def _convert_phrase(phrase, i, outputs, parser, cache):
+    """Convert text with the word cache, using the whole phrase as key"""
+    out = [cache.get(_cache_key(i, o, phrase, parser)) for o in outputs]
+    missing = [o for o, c in zip(outputs, out) if c is None]
+    if missing:
+        t = analyze(phrase, i=i, parser=parser)
+        rendered = dict(zip(missing, render_all(t, missing)))
+        for n, o in enumerate(outputs):
+            if out[n] is None:
+                out[n] = rendered[o]
+                cache.put(_cache_key(i, o, phrase, parser), out[n])
+    return out
+
+
+def transliterate_all(
+    phrase, i="gdpi", parser="earley", targets=None, on_error=None, analysis=None
+):
     """Transliterate romanized Teochew into all available output schemes
 
     Arguments
@@ -255,24 +946,71 @@ def transliterate_all(phrase, i="gdpi"):
         Text to be transliterated
     i : str
         Input format. Must match one of the available inputs
+    parser : str
+        Parser to use, one of PARSERS, see `analyze`
+    targets : list
+        Only transliterate into these output schemes, in this order. Default:
+        all available schemes
+    on_error : str
+        If given, convert word by word and handle words that cannot be
+        converted with this policy, see `convert_words`
+    analysis
+        Output of `analyze` for phrase, rendered instead of analyzing it
+        again, see `convert`
 
     Returns
     -------
     list
-        Transliteration into all available schemes. Each item is a tuple of
+        Transliteration into all available (or requested) schemes. Each item is a tuple of
         str: scheme name and transliteration.
     """
-    try:
-        t = PARSER_DICT[i].parse(phrase)
-        out = []
-        for o in TRANSFORMER_DICT:
-            out.append((o, TRANSFORMER_DICT[o].transform(t)))
-        return out
-    except KeyError:
+    outputs = list(TRANSFORMER_DICT) if targets is None else list(targets)
+    unknown = [o for o in outputs if o not in TRANSFORMER_DICT]
+    if i not in PARSER_DICT:
         print(f"Unknown spelling scheme {i}")
+    elif unknown:
+        print(f"Unknown spelling scheme {', '.join(unknown)}")
+    else:
+        return list(
+            zip(
+                outputs,
+                convert(
+                    phrase,
+                    i=i,
+                    outputs=outputs,
+                    parser=parser,
+                    on_error=on_error,
+                    analysis=analysis,
+                ),
+            )
+        )
+
+
+# Tone numbers to superscript
+SUPERSCRIPT_TONES = str.maketrans(
+    {
+        "1": "¹",
+        "2": "²",
+        "3": "³",
+        "4": "⁴",
+        "5": "⁵",
+        "6": "⁶",
+        "7": "⁷",
+        "8": "⁸",
+        "0": "⁰",
+    }
+)
 
 
-def transliterate(phrase, i="gdpi", o="tlo", superscript_tone=False):
+def transliterate(
+    phrase,
+    i="gdpi",
+    o="tlo",
+    superscript_tone=False,
+    parser="earley",
+    on_error=None,
+    analysis=None,
+):
     """Transliterate romanized Teochew into different spelling scheme
 
     Arguments
@@ -285,47 +1023,212 @@ def transliterate(phrase, i="gdpi", o="tlo", superscript_tone=False):
         Output format. Must match one of the available outputs
     superscript_tone : bool
         Tone numbers in superscript
+    parser : str
+        Parser to use, one of PARSERS, see `analyze`
+    on_error : str
+        If given, convert word by word and handle words that cannot be
+        converted with this policy: "raise", "skip", "mark" or "passthrough",
+        see `convert_words`
+    analysis
+        Output of `analyze` for phrase, rendered instead of analyzing it
+        again, see `convert`
 
     Returns
     -------
     str
         Input text transliterated into requested phonetic spelling.
     """
-    try:
-        t = PARSER_DICT[i].parse(phrase)
-        try:
-            out = TRANSFORMER_DICT[o].transform(t)
-            if superscript_tone:
-                subst = {
-                    "1": "¹",
-                    "2": "²",
-                    "3": "³",
-                    "4": "⁴",
-                    "5": "⁵",
-                    "6": "⁶",
-                    "7": "⁷",
-                    "8": "⁸",
-                    "0": "⁰",
-                }
-                for num in subst:
-                    out = out.replace(num, subst[num])
-                return out
-            else:
-                return out
-        except KeyError:
-            print(f"Invalid output scheme {o}")
-            print(f"Must be one of {', '.join(list(TRANSFORMER_DICT.keys()))}")
-    except KeyError:
+    if i not in PARSER_DICT:
         print(f"Invalid input scheme {i}")
         print(f"Must be one of {', '.join(list(PARSER_DICT.keys()))}")
+    elif o not in TRANSFORMER_DICT:
+        print(f"Invalid output scheme {o}")
+        print(f"Must be one of {', '.join(list(TRANSFORMER_DICT.keys()))}")
+    else:
+        out = convert(
+            phrase, i=i, outputs=[o], parser=parser, on_error=on_error, analysis=analysis
+        )[0]
+        if superscript_tone:
+            return out.translate(SUPERSCRIPT_TONES)
+        else:
+            return out
+
+
+def _chunks(iterable, size):
+    """Split iterable into lists of at most size items"""
+    it = iter(iterable)
+    chunk = list(itertools.islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(it, size))
+
+
+class ConversionError(ValueError):
+    """Text that could not be converted in a worker process
+
+    Errors of the parsers cannot always be sent from worker processes to the
+    main process, so they are replaced by this error.
+
+    Arguments
+    ---------
+    index : int
+        Position of the text in the input
+    message : str
+        Type and message of the original error
+    """
+
+    def __init__(self, index, message):
+        super().__init__(index, message)
+        self.index = index
+        self.message = message
+
+    def __str__(self):
+        return f"Text {self.index} could not be converted: {self.message}"
+
+
+def _transliterate_chunk(lines, i, o, superscript_tone, parser, on_error, start=0):
+    """Transliterate a list of lines, run in worker processes or in this one
+
+    Lines that cannot be converted give a ConversionError instead, which
+    numbers them from start.
+    """
+    out = []
+    for n, line in enumerate(lines, start):
+        try:
+            out.append(
+                transliterate(
+                    line,
+                    i=i,
+                    o=o,
+                    superscript_tone=superscript_tone,
+                    parser=parser,
+                    on_error=on_error,
+                )
+            )
+        except (LarkError, KeyError) as e:
+            out.append(ConversionError(n, f"{type(e).__name__}: {e}"))
+    return out
+
+
+def _raise_errors(converted):
+    """Yield converted lines from `_transliterate_chunk`, raising their errors"""
+    for text in converted:
+        if isinstance(text, ConversionError):
+            raise text
+        yield text
+
+
+def transliterate_many(
+    phrases,
+    i="gdpi",
+    o="tlo",
+    superscript_tone=False,
+    parser="earley",
+    workers=None,
+    chunksize=256,
+    on_error=None,
+):
+    """Transliterate many texts in parallel with a pool of processes
+
+    Each worker process builds the parsers it needs once, and converts chunks
+    of the input. Only a few chunks per worker are in flight at any time, so
+    memory use stays bounded even if the input is very large or an endless
+    iterator.
+
+    Arguments
+    ---------
+    phrases : iterable
+        Texts (str) to be transliterated, e.g. lines of a file
+    i, o, superscript_tone, parser, on_error
+        See `transliterate`
+    workers : int
+        Number of worker processes, default number of CPUs. With 1, texts are
+        converted in the current process.
+    chunksize : int
+        Number of texts sent to a worker at a time
+
+    Yields
+    ------
+    str
+        Transliterated text, in the same order as the input. Errors of the
+        parsers while converting a text are raised here as ConversionError
+        when its result is reached, with one worker or several.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = _chunks(phrases, chunksize)
+    if workers == 1:
+        start = 0
+        for chunk in chunks:
+            yield from _raise_errors(
+                _transliterate_chunk(
+                    chunk, i, o, superscript_tone, parser, on_error, start
+                )
+            )
+            start += len(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        start = 0
+        for chunk in chunks:
+            pending.append(
+                pool.submit(
+                    _transliterate_chunk,
+                    chunk,
+                    i,
+                    o,
+                    superscript_tone,
+                    parser,
+                    on_error,
+                    start,
+                )
+            )
+            start += len(chunk)
+            if len(pending) >= 2 * workers:
+                yield from _raise_errors(pending.popleft().result())
+        while pending:
+            yield from _raise_errors(pending.popleft().result())
+
+
+def _prepare_input(text, scheme, parser):
+    """Detect the input scheme if "auto", and convert tone diacritics
+
+    Returns
+    -------
+    tuple
+        Text, input scheme, confidence of detection, and the analysis of the
+        text that confirmed the scheme, to be passed to `convert` (both None
+        if the scheme was given)
+    """
+    if scheme == "auto":
+        # tone diacritics were already converted while detecting
+        scheme, confidence, text, analysis = _detect_scheme(text, parser)
+        return text, scheme, confidence, analysis
+    if scheme in diacritics.SCHEMES:
+        # If Tie-lo or Tai-lo input, preprocess from diacritics to numeric tone marks
+        # Assumes that all syllables have tones marked!
+        # impossible otherwise, because tone1 cannot be distinguished from unmarked tone
+        with _stage("diacritics"):
+            text = diacritics.to_numeric(text, scheme)
+    return text, scheme, None, None
 
 
 def main():
+    if sys.argv[1:2] == ["serve"]:
+        import parsetc.server as server
+
+        return server.main(sys.argv[2:])
+    if sys.argv[1:2] == ["bench"]:
+        import parsetc.benchmark as benchmark
+
+        return benchmark.main(sys.argv[2:])
     parser = argparse.ArgumentParser(
         description="""
         Parse and convert romanized Teochew between different phonetic spelling schemes
 
-        Text is read from STDIN
+        Text is read from STDIN, or from --input-file. Run `parsetc serve` to
+        convert text sent over HTTP instead, see `parsetc serve --help`, and
+        `parsetc bench` to run benchmarks, see `parsetc bench --help`
         """
     )
     parser.add_argument(
@@ -333,7 +1236,7 @@ def main():
         "-i",
         type=str,
         default="gdpi",
-        help=f"Input romanization, available: {', '.join(list(PARSER_DICT.keys()))}",
+        help=f"Input romanization, available: {', '.join(list(PARSER_DICT.keys()))}, or auto to detect it for each line",
     )
     parser.add_argument(
         "--output",
@@ -342,6 +1245,20 @@ def main():
         default="tlo",
         help=f"Output romanization, available: {', '.join(list(TRANSFORMER_DICT.keys()))}",
     )
+    parser.add_argument(
+        "--parser",
+        type=str,
+        choices=PARSERS,
+        default="earley",
+        help="Parser algorithm; lalr and scan are faster but need tone numbers on every syllable, and fall back to lalr then earley for input they cannot handle; segment splits words without tone numbers into their most probable syllables",
+    )
+    parser.add_argument(
+        "--segment-model",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="JSON file of syllable frequencies for --parser segment, default all syllables equally likely",
+    )
     parser.add_argument(
         "--parse_only",
         "-p",
@@ -360,11 +1277,28 @@ def main():
         action="store_true",
         help="Output in all available formats, tab-separated (option --output ignored)",
     )
+    parser.add_argument(
+        "--targets",
+        "-t",
+        type=str,
+        default=None,
+        help="Comma-separated output romanizations for --all, default all available",
+    )
     parser.add_argument(
         "--show_lark",
         action="store_true",
         help="Show parse rules in Lark format for input romanization (output --output ignored)",
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run in the background with all parsers built, and convert for parsetc commands that are run meanwhile, which is faster for many short runs; listens on $PARSETC_SOCKET, default daemon.sock in a directory parsetc-UID in $XDG_RUNTIME_DIR or /tmp that only the user can access",
+    )
+    parser.add_argument(
+        "--build-cache",
+        action="store_true",
+        help="Compile parsers for all input romanizations and save them to the on-disk cache, then exit",
+    )
     parser.add_argument(
         "--delim_only",
         "-d",
@@ -372,54 +1306,297 @@ def main():
         default=None,
         help="Only parse and convert text that is contained within delimiters (not compatible with --parse_only)",
     )
+    parser.add_argument(
+        "--input-file",
+        type=str,
+        default=None,
+        help="Read text from this file instead of STDIN",
+    )
+    parser.add_argument(
+        "--output-file",
+        type=str,
+        default=None,
+        help="Write output to this file instead of STDOUT",
+    )
+    parser.add_argument(
+        "--segment-length",
+        type=int,
+        default=65536,
+        metavar="LENGTH",
+        help="Split lines longer than LENGTH characters after sentence punctuation or spaces, and convert the pieces separately",
+    )
+    parser.add_argument(
+        "--emit-corpus",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Parse input and save it to a corpus file at PATH, which can be converted into any output romanization later without parsing",
+    )
+    parser.add_argument(
+        "--from-corpus",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Convert corpus file at PATH written with --emit-corpus, instead of reading text (option --input ignored)",
+    )
+    parser.add_argument(
+        "--emit-index",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Index the syllables of the corpus file given with --from-corpus by initial, medial, coda and tone, and save the index at PATH",
+    )
+    parser.add_argument(
+        "--index",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Index file written with --emit-index to search with --query",
+    )
+    parser.add_argument(
+        "--query",
+        type=str,
+        default=None,
+        help="Print the document and syllable positions of syllables that match all terms of QUERY in --index, e.g. 'initial=INIT_Z tone=8' or 'final=ieng', with syllables and finals spelled in --input; with --from-corpus, also print the words in --output",
+    )
+    parser.add_argument(
+        "--numpy",
+        action="store_true",
+        help="Render with NumPy, faster for large corpus files (with --from-corpus, requires numpy)",
+    )
+    parser.add_argument(
+        "--on-error",
+        type=str,
+        choices=ON_ERROR,
+        default=None,
+        help="Parse each word separately, which is faster for long lines, and raise, skip, mark or pass through unchanged words that cannot be converted",
+    )
+    parser.add_argument(
+        "--word_cache",
+        type=int,
+        default=None,
+        metavar="SIZE",
+        help="Cache up to SIZE converted words, faster for text with many repeated words",
+    )
+    parser.add_argument(
+        "--cache_stats",
+        action="store_true",
+        help="Report word cache statistics to STDERR when done (with --word_cache)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Report time spent reading, detecting the input romanization, converting tone diacritics, scanning, parsing, rendering and writing, lines and syllables per second, the slowest lines, and parse failures to STDERR when done",
+    )
+    parser.add_argument(
+        "--stats-file",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Save the statistics of --stats as JSON to PATH",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Also profile function calls with cProfile, and report the functions that took longest with --stats or --stats-file (default --stats); slows down conversion",
+    )
     args = parser.parse_args()
 
-    if args.show_lark:
+    if args.stats or args.stats_file or args.profile:
+        profiler = enable_profiling(functions=args.profile)
+    else:
+        profiler = None
+    try:
+        _run(parser, args)
+    finally:
+        if profiler is not None:
+            disable_profiling()
+            stats = profiler.stats()
+            if args.stats_file:
+                with open(args.stats_file, "w", encoding="utf8") as fh:
+                    json.dump(stats, fh, indent=1)
+            if args.stats or not args.stats_file:
+                print(instrument.format_stats(stats), file=sys.stderr)
+
+
+def _run(parser, args):
+    """Run the command line tool with parsed arguments"""
+    if args.word_cache:
+        enable_word_cache(args.word_cache)
+    if args.segment_model:
+        load_segment_model(args.segment_model)
+
+    if args.daemon:
+        import parsetc.daemon as daemon
+
+        if not hasattr(os, "fork"):
+            parser.error("--daemon is only available on Unix")
+        try:
+            daemon.serve()
+        except RuntimeError as e:
+            parser.error(str(e))
+    elif args.build_cache:
+        print(f"Parsers cached in {build_cache()}")
+    elif args.show_lark:
         if args.input in LARK_DICT:
             print(LARK_DICT[args.input])
         else:
             print(
                 f"Invalid input scheme {args.input}, must be one of {', '.join(list(LARK_DICT.keys()))}"
             )
+    elif args.query:
+        import parsetc.index as phonindex
+
+        if not args.index:
+            parser.error("--query needs --index")
+        with phonindex.Index(args.index) as idx:
+            try:
+                terms = phonindex.parse_query(
+                    args.query, idx.scheme if args.input == "auto" else args.input
+                )
+            except ValueError as e:
+                parser.error(str(e))
+            hits = idx.locate(idx.search(terms))
+        docs = corpus.Corpus(args.from_corpus) if args.from_corpus else None
+        renderer = ir.DocumentRenderer([TRANSFORMER_DICT[args.output]])
+        try:
+            with _open_output(args.output_file) as out:
+                for doc, pos in hits:
+                    row = [str(doc), str(pos)]
+                    if docs is not None:
+                        word = phonindex.word_of(docs[doc][0], pos)
+                        row.append(renderer.render(word)[0])
+                    out.write("\t".join(row) + "\n")
+        finally:
+            if docs is not None:
+                docs.close()
+    elif args.emit_index:
+        import parsetc.index as phonindex
+
+        if not args.from_corpus:
+            parser.error("--emit-index needs --from-corpus")
+        phonindex.build(args.from_corpus, args.emit_index)
+    elif args.from_corpus:
+        if args.all:
+            outputs = args.targets.split(",") if args.targets else list(TRANSFORMER_DICT)
+        else:
+            outputs = [args.output]
+        with _open_output(args.output_file) as out:
+            for rendered, text, line_end in _timed(
+                "read", render_corpus(args.from_corpus, outputs, vectorized=args.numpy)
+            ):
+                if args.all:
+                    out.write("\t".join(["INPUT", text]) + "\n")
+                    for o, r in zip(outputs, rendered):
+                        out.write("\t".join([o, r]) + "\n")
+                elif args.superscript_tone:
+                    out.write(rendered[0].translate(SUPERSCRIPT_TONES))
+                else:
+                    out.write(rendered[0])
+                if line_end:
+                    out.write("\n")
+    elif args.emit_corpus:
+        if args.input == "auto":
+            parser.error("--emit-corpus needs a fixed input romanization, not auto")
+        infile = (
+            open(args.input_file, encoding="utf8") if args.input_file else sys.stdin
+        )
+        try:
+            with corpus.CorpusWriter(args.emit_corpus, args.input) as writer:
+                for intext, line_end in _timed(
+                    "read", stream.read_segments(infile, args.segment_length)
+                ):
+                    text = intext.rstrip() if line_end else intext
+                    text = text.lower()
+                    with _line(intext):
+                        if args.input in diacritics.SCHEMES:
+                            with _stage("diacritics"):
+                                text = diacritics.to_numeric(text, args.input)
+                        doc = to_ir(text, i=args.input, parser=args.parser)
+                        with _stage("write"):
+                            writer.add(doc, intext, line_end)
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
     else:
-        for intext in sys.stdin:
-            outtext = ""
-            # intext = sys.stdin.read().rstrip()
-            intext = intext.rstrip()
-            if args.delim_only:
-                in_splits = intext.split(args.delim_only)
-                for i in range(len(in_splits)):
-                    if i % 2 == 1:
-                        if args.input == "tlo":
-                            in_splits[i] = tlo_convert_to_numeric(in_splits[i].lower())
-                        outtext += transliterate(
-                            in_splits[i].lower(),
-                            i=args.input,
-                            o=args.output,
-                            superscript_tone=args.superscript_tone,
-                        )
+        infile = (
+            open(args.input_file, encoding="utf8") if args.input_file else sys.stdin
+        )
+        out = _open_output(args.output_file)
+        # whether the current segment begins inside delimiters, for lines
+        # that are split into several segments
+        inside = False
+        try:
+            for intext, line_end in _timed(
+                "read", stream.read_segments(infile, args.segment_length)
+            ):
+                outtext = []
+                if line_end:
+                    intext = intext.rstrip()
+                with _line(intext):
+                    if args.delim_only:
+                        in_splits = intext.split(args.delim_only)
+                        for i in range(len(in_splits)):
+                            # segments of split lines may end with spaces
+                            if (i % 2 == 1) != inside and in_splits[i].strip():
+                                text, scheme, confidence, analysis = _prepare_input(
+                                    in_splits[i].lower(), args.input, args.parser
+                                )
+                                outtext.append(
+                                    transliterate(
+                                        text,
+                                        i=scheme,
+                                        o=args.output,
+                                        superscript_tone=args.superscript_tone,
+                                        parser=args.parser,
+                                        on_error=args.on_error,
+                                        analysis=analysis,
+                                    )
+                                )
+                            else:
+                                outtext.append(in_splits[i])
+                        # an odd number of delimiters changes the state
+                        inside = (inside != (len(in_splits) % 2 == 0)) and not line_end
                     else:
-                        outtext += in_splits[i]
-            else:
-                intext = intext.lower()
-                if args.input == "tlo":
-                    # If Tie-lo input, preprocess from diacritics to numeric tone marks
-                    # Assumes that all syllables have tones marked!
-                    # impossible otherwise, because tone1 cannot be distinguished from unmarked tone
-                    intext = tlo_convert_to_numeric(intext)
-                if args.parse_only:
-                    parsetree = PARSER_DICT[args.input].parse(intext)
-                    print(parsetree.pretty())
-                elif args.all:
-                    out = transliterate_all(intext, i=args.input)
-                    print("\t".join(["INPUT", intext]))
-                    for line in out:
-                        print("\t".join(list(line)))
-                else:
-                    outtext = transliterate(
-                        intext,
-                        i=args.input,
-                        o=args.output,
-                        superscript_tone=args.superscript_tone,
-                    )
-            print(outtext)
+                        intext, scheme, confidence, analysis = _prepare_input(
+                            intext.lower(), args.input, args.parser
+                        )
+                        if args.parse_only:
+                            parsetree = parse(intext, i=scheme, parser=args.parser)
+                            _count_syllables(parsetree)
+                            out.write(parsetree.pretty() + "\n")
+                        elif args.all:
+                            converted = transliterate_all(
+                                intext,
+                                i=scheme,
+                                parser=args.parser,
+                                targets=args.targets.split(",") if args.targets else None,
+                                on_error=args.on_error,
+                                analysis=analysis,
+                            )
+                            out.write("\t".join(["INPUT", intext]) + "\n")
+                            if confidence is not None:
+                                out.write(f"SCHEME\t{scheme}\t{confidence:.3f}\n")
+                            for line in converted:
+                                out.write("\t".join(list(line)) + "\n")
+                        else:
+                            outtext.append(
+                                transliterate(
+                                    intext,
+                                    i=scheme,
+                                    o=args.output,
+                                    superscript_tone=args.superscript_tone,
+                                    parser=args.parser,
+                                    on_error=args.on_error,
+                                    analysis=analysis,
+                                )
+                            )
+                if line_end:
+                    outtext.append("\n")
+                out.write("".join(str(t) for t in outtext))
+        finally:
+            out.close()
+            if infile is not sys.stdin:
+                infile.close()
+        if args.cache_stats and WORD_CACHE is not None:
+            print(json.dumps(word_cache_stats()), file=sys.stderr)
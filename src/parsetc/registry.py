@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import threading
+
+from collections.abc import Mapping
+
+
+class Registry(Mapping):
+    """Read-only dict whose values are only built when first requested
+
+    Keys are known up front, so that available schemes can be listed and
+    checked without building anything. Safe to use from several threads:
+    each value is built only once, and built values are read without
+    locking.
+
+    Arguments
+    ---------
+    factories : dict
+        Functions without arguments that build the value for each key
+    """
+
+    def __init__(self, factories):
+        self._factories = dict(factories)
+        self._built = {}
+        # one lock per key, so that slow builds do not block other keys
+        self._locks = {key: threading.Lock() for key in self._factories}
+
+    def __getitem__(self, key):
+        try:
+            return self._built[key]
+        except KeyError:
+            pass
+        with self._locks[key]:
+            # another thread may have built it while waiting for the lock
+            try:
+                return self._built[key]
+            except KeyError:
+                value = self._factories[key]()
+                self._built[key] = value
+                return value
+
+    def __iter__(self):
+        return iter(self._factories)
+
+    def __len__(self):
+        return len(self._factories)
+
+    def __contains__(self, key):
+        return key in self._factories
+
+    def is_built(self, key):
+        """Check if the value for a key has already been built"""
+        return key in self._built
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import re
+
+from parsetc.translit import TERMINALS
+
+# Characters that separate words, same as PUNCTUATION and SPACE in the grammar
+SEPARATORS = ".,:;?!'-()[]“”‘’ "
+
+# Split text into words and separators. Words may contain single syllable
+# separators between syllables, e.g. "diê5-ghe2"
+WORDS = re.compile(
+    f"([^{re.escape(SEPARATORS)}]+(?:[-'’][^{re.escape(SEPARATORS)}]+)*)"
+)
+
+
+def _alternatives(group, scheme):
+    """Regex alternation for a group of terminals, and lookup of terminal type
+
+    Longer strings are listed first so that they are preferentially matched.
+    Where several terminals have the same string, the first one in
+    terminals.json is used, like the parsers do.
+    """
+    lookup = {}
+    for term in TERMINALS[group]:
+        if scheme in TERMINALS[group][term]:
+            lookup.setdefault(TERMINALS[group][term][scheme], term)
+    strings = sorted(lookup, key=len, reverse=True)
+    return "|".join(re.escape(s) for s in strings), lookup
+
+
+class Scanner:
+    """Split tone-marked text into syllables with a compiled regex
+
+    Much faster than parsing with Lark, but only handles text where every
+    syllable has a tone number, so that syllable boundaries are unambiguous.
+    Lines that cannot be scanned must be parsed instead.
+
+    Arguments
+    ---------
+    scheme : str
+        Input scheme
+    """
+
+    def __init__(self, scheme):
+        self.scheme = scheme
+        initials, self.initials = _alternatives("initials", scheme)
+        medials, self.medials = _alternatives("medials", scheme)
+        codanasals, self.codanasals = _alternatives("codanasals", scheme)
+        codastops, self.codastops = _alternatives("codastops", scheme)
+        nasal = re.escape(TERMINALS["nasal"]["NASAL"][scheme])
+        # Same structure as the 'syllable_tone' rule
+        syllable = (
+            f"(?P<initial>{initials})?"
+            f"(?:(?P<medial>{medials})"
+            f"(?:(?P<codanasal>{codanasals})|(?P<codastop>{codastops})"
+            f"|(?P<nasal>{nasal})(?P<nasalstop>{codastops})?)?"
+            f"|(?P<final>{codanasals}))"
+        )
+        tone = "(?P<tone>[0-8])(?:\\((?P<sandhi>[0-8])\\))?"
+        self.regex = re.compile(f"(?P<sep>[{re.escape(SEPARATORS)}]+)|{syllable}{tone}")
+        # Single syllable, with or without tone
+        self.syllable_regex = re.compile(f"{syllable}(?:{tone})?")
+
+    def scan(self, text):
+        """Split text into syllables
+
+        Arguments
+        ---------
+        text : str
+            Text in the input scheme, lowercase
+
+        Returns
+        -------
+        list
+            Separators (str) and words. Each word is a list of syllables, and
+            each syllable a tuple of initial, medial, nasal and coda terminal
+            types, citation tone and sandhi tone, with None for absent parts.
+            The nasal is given by its input string instead of terminal type.
+            None if the text cannot be scanned.
+        """
+        out = []
+        word = None
+        pos = 0
+        match = self.regex.match
+        while pos < len(text):
+            m = match(text, pos)
+            if m is None:
+                return None
+            pos = m.end()
+            if m.lastgroup == "sep":
+                out.append(m.group("sep"))
+                word = None
+                continue
+            if word is None:
+                word = []
+                out.append(word)
+            word.append(self.syllable(m))
+        if not any(isinstance(i, list) for i in out):
+            # the grammar requires at least one word
+            return None
+        return out
+
+    def syllable(self, m):
+        """Syllable tuple from a match of `regex` or `syllable_regex`, see `scan`"""
+        (initial, medial, codanasal, codastop, nasal, nasalstop, final) = m.group(
+            "initial", "medial", "codanasal", "codastop", "nasal", "nasalstop", "final"
+        )
+        if final is not None:
+            coda = self.codanasals[final]
+        elif codanasal is not None:
+            coda = self.codanasals[codanasal]
+        elif codastop is not None:
+            coda = self.codastops[codastop]
+        elif nasalstop is not None:
+            coda = self.codastops[nasalstop]
+        else:
+            coda = None
+        return (
+            self.initials[initial] if initial is not None else None,
+            self.medials[medial] if medial is not None else None,
+            nasal,
+            coda,
+            m.group("tone"),
+            m.group("sandhi"),
+        )
+
+
+def render(scanned, renderer):
+    """Render scanned text with an output Renderer
+
+    Arguments
+    ---------
+    scanned : list
+        Output from Scanner.scan
+    renderer : parsetc.translit.Renderer
+        Output scheme
+
+    Returns
+    -------
+    str
+        Same as transforming the parse tree of the text with the renderer
+    """
+    out = []
+    for item in scanned:
+        if isinstance(item, list):
+            out.append(renderer.word_sep([renderer.render_parts(*s) for s in item]))
+        else:
+            out.append(item)
+    return renderer.sentence(out)
+
+
+def render_all(scanned, renderers):
+    """Render scanned text with several output Renderers in a single pass
+
+    Arguments
+    ---------
+    scanned : list
+        Output from Scanner.scan
+    renderers : list
+        Output schemes, parsetc.translit.Renderer instances
+
+    Returns
+    -------
+    list
+        Rendered text, str for each renderer
+    """
+    out = [[] for r in renderers]
+    for item in scanned:
+        if isinstance(item, list):
+            for pieces, renderer in zip(out, renderers):
+                pieces.append(
+                    renderer.word_sep([renderer.render_parts(*s) for s in item])
+                )
+        else:
+            for pieces in out:
+                pieces.append(item)
+    return [r.sentence(pieces) for r, pieces in zip(renderers, out)]
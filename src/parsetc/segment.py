@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+import json
+import math
+
+from parsetc.ir import Document
+from parsetc.scanner import Scanner, WORDS
+from parsetc.translit import TERMINALS
+
+# Segment words without tone numbers or syllable separators, e.g. "pengim",
+# into syllables. Every way of splitting a word into valid syllables is
+# considered, and the most probable one under a syllable frequency model is
+# chosen by dynamic programming (Viterbi), in time linear in the length of
+# the word.
+
+# Syllable separators within words, see the SYLLABLE_SEP terminal
+SYLLABLE_SEPS = "-'’"
+
+# Default number of possible syllables, roughly the size of the Teochew
+# syllable inventory without tones
+VOCABULARY = 1000
+
+
+def syllable_key(syllable):
+    """Key for a syllable tuple in frequency models, ignoring tones
+
+    Arguments
+    ---------
+    syllable : tuple
+        Syllable tuple, see `parsetc.scanner.Scanner.scan`
+
+    Returns
+    -------
+    tuple
+        Initial, medial and coda terminal types, and whether the syllable is
+        nasalized
+    """
+    initial, medial, nasal, coda, tone, sandhi = syllable
+    return (initial, medial, nasal is not None, coda)
+
+
+class FrequencyModel:
+    """Syllable unigram and bigram frequencies, for scoring segmentations
+
+    Syllables are identified by their terminal types (see `syllable_key`), so
+    a model can be used with any input scheme. Probabilities are smoothed by
+    adding `smoothing` to every count, and bigram probabilities are
+    interpolated with unigram probabilities. Without any counts, every
+    syllable is equally likely, so segmentations with the fewest syllables
+    are preferred.
+
+    Arguments
+    ---------
+    unigrams : dict
+        Counts of syllable keys
+    bigrams : dict
+        Counts of pairs of syllable keys
+    smoothing : float
+        Added to every count
+    bigram_weight : float
+        Weight of bigram probability, between 0 and 1
+    vocabulary : int
+        Number of possible syllables, for smoothing
+    """
+
+    def __init__(
+        self,
+        unigrams=None,
+        bigrams=None,
+        smoothing=1.0,
+        bigram_weight=0.5,
+        vocabulary=VOCABULARY,
+    ):
+        self.unigrams = dict(unigrams or {})
+        self.bigrams = dict(bigrams or {})
+        self.smoothing = smoothing
+        self.bigram_weight = bigram_weight if self.bigrams else 0.0
+        self._total = sum(self.unigrams.values())
+        self._types = max(vocabulary, len(self.unigrams))
+        self._scores = {}
+
+    def unigram_prob(self, key):
+        return (self.unigrams.get(key, 0) + self.smoothing) / (
+            self._total + self.smoothing * self._types
+        )
+
+    def score(self, prev, key):
+        """Log probability of a syllable following another
+
+        Arguments
+        ---------
+        prev : tuple
+            Key of previous syllable in the word, or None at the start
+        key : tuple
+            Key of syllable
+        """
+        try:
+            return self._scores[prev, key]
+        except KeyError:
+            pass
+        prob = self.unigram_prob(key)
+        if self.bigram_weight and prev is not None:
+            count = self.bigrams.get((prev, key), 0)
+            prev_count = self.unigrams.get(prev, 0)
+            bigram = count / prev_count if prev_count else 0.0
+            prob = self.bigram_weight * bigram + (1 - self.bigram_weight) * prob
+        out = math.log(prob)
+        self._scores[prev, key] = out
+        return out
+
+    @classmethod
+    def load(cls, path):
+        """Read model from a JSON file
+
+        The file contains an object with the keys "scheme", the input scheme
+        that syllables are written in, "syllables", an object of syllable
+        counts, and optionally "bigrams", an object of counts of pairs of
+        syllables separated by a space, "smoothing", "bigram_weight" and
+        "vocabulary".
+        Tone numbers in syllables are ignored, e.g.
+
+            {"scheme": "gdpi",
+             "syllables": {"pêng": 120, "im": 80},
+             "bigrams": {"pêng im": 40}}
+
+        Raises
+        ------
+        ValueError
+            If a syllable is not valid in the scheme
+        """
+        with open(path, encoding="utf8") as fh:
+            data = json.load(fh)
+        scanner = Scanner(data["scheme"])
+
+        def key(text):
+            m = scanner.syllable_regex.fullmatch(text)
+            if m is None:
+                raise ValueError(f"Invalid syllable {text} in {path}")
+            return syllable_key(scanner.syllable(m))
+
+        unigrams = {}
+        for text, count in data["syllables"].items():
+            k = key(text)
+            unigrams[k] = unigrams.get(k, 0) + count
+        bigrams = {}
+        for text, count in data.get("bigrams", {}).items():
+            k = tuple(key(t) for t in text.split())
+            bigrams[k] = bigrams.get(k, 0) + count
+        return cls(
+            unigrams,
+            bigrams,
+            smoothing=data.get("smoothing", 1.0),
+            bigram_weight=data.get("bigram_weight", 0.5),
+            vocabulary=data.get("vocabulary", VOCABULARY),
+        )
+
+
+def _max_syllable_length(scheme):
+    """Upper bound on the length of a syllable in a scheme, with tone"""
+    length = 0
+    for group in ["initials", "medials", "codanasals", "codastops", "nasal"]:
+        length += max(
+            len(t[scheme]) for t in TERMINALS[group].values() if scheme in t
+        )
+    # citation and sandhi tone, e.g. "2(1)"
+    return length + 4
+
+
+class Segmenter:
+    """Split words into syllables by most probable segmentation
+
+    Arguments
+    ---------
+    scheme : str
+        Input scheme
+    model : FrequencyModel
+        Syllable frequencies, default all syllables equally likely
+    """
+
+    def __init__(self, scheme, model=None):
+        self.scheme = scheme
+        self.model = FrequencyModel() if model is None else model
+        self.scanner = Scanner(scheme)
+        self.max_length = _max_syllable_length(scheme)
+
+    def lattice(self, word):
+        """Candidate syllables in a word
+
+        Returns
+        -------
+        list
+            For each position in the word, list of candidate syllables that
+            start there, as tuples of end position and syllable tuple
+        """
+        fullmatch = self.scanner.syllable_regex.fullmatch
+        out = []
+        for start in range(len(word)):
+            candidates = []
+            for end in range(start + 1, min(len(word), start + self.max_length) + 1):
+                m = fullmatch(word, start, end)
+                if m is not None:
+                    candidates.append((end, self.scanner.syllable(m)))
+            out.append(candidates)
+        return out
+
+    def segment(self, word, n=1):
+        """Most probable segmentations of a word into syllables
+
+        Arguments
+        ---------
+        word : str
+            Word without separators, lowercase
+        n : int
+            Number of segmentations to return
+
+        Returns
+        -------
+        list
+            Up to n segmentations, most probable first, each a tuple of log
+            probability and list of syllable tuples (see
+            `parsetc.scanner.Scanner.scan`). Empty if the word cannot be
+            split into valid syllables.
+        """
+        score = self.model.score
+        # for each position, hypotheses by key of last syllable: lists of
+        # score and path, where a path is a linked list (syllable, path)
+        chart = [dict() for _ in range(len(word) + 1)]
+        chart[0][None] = [(0.0, None)]
+        for start, candidates in enumerate(self.lattice(word)):
+            if not chart[start]:
+                continue
+            for end, syllable in candidates:
+                key = syllable_key(syllable)
+                hyps = chart[end].setdefault(key, [])
+                for prev, prev_hyps in chart[start].items():
+                    step = score(prev, key)
+                    for prev_score, path in prev_hyps:
+                        hyps.append((prev_score + step, (syllable, path)))
+                if len(hyps) > n:
+                    hyps.sort(key=lambda h: -h[0])
+                    del hyps[n:]
+        final = [h for hyps in chart[len(word)].values() for h in hyps]
+        final.sort(key=lambda h: -h[0])
+        out = []
+        for total, path in final[:n]:
+            syllables = []
+            while path is not None:
+                syllable, path = path
+                syllables.append(syllable)
+            out.append((total, syllables[::-1]))
+        return out
+
+    def analyze(self, text):
+        """Segment all words of a text
+
+        Syllable separators within words are kept, after syllables without
+        tone; after syllables with tone, they separate words, as in the
+        grammar.
+
+        Arguments
+        ---------
+        text : str
+            Text in the input scheme, lowercase
+
+        Returns
+        -------
+        parsetc.ir.Document
+            None if any word cannot be split into valid syllables
+        """
+        doc = Document(self.scheme)
+        for n, chunk in enumerate(WORDS.split(text)):
+            if n % 2 == 0:
+                doc.add_separator(chunk)
+                continue
+            word_start = True
+            part_start = 0
+            for pos in range(len(chunk) + 1):
+                if pos < len(chunk) and chunk[pos] not in SYLLABLE_SEPS:
+                    continue
+                best = self.segment(chunk[part_start:pos])
+                if not best:
+                    return None
+                for initial, medial, nasal, coda, tone, sandhi in best[0][1]:
+                    doc.add_syllable(
+                        initial, medial, nasal is not None, coda, tone, sandhi, word_start
+                    )
+                    word_start = False
+                if pos < len(chunk):
+                    if tone is None:
+                        doc.add_syllable_sep(chunk[pos])
+                    else:
+                        doc.add_separator(chunk[pos])
+                        word_start = True
+                part_start = pos + 1
+        return doc
@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from lark.exceptions import LarkError
+
+import parsetc.parsetc as pt
+
+# Local HTTP service that converts text sent as JSON. Requests that arrive
+# at about the same time are grouped into batches, which are converted in a
+# pool of worker processes that have all parsers and renderers built, so
+# that neither process startup nor building parsers is paid per request.
+#
+#   POST /convert  {"text": ..., "i": "gdpi", "o": "tlo"}
+#                  {"text": ..., "i": "gdpi", "all": true, "targets": [...]}
+#                  or a list of such requests
+#   GET  /metrics  request latency and batch size histograms, queue depth
+#   GET  /health
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Most requests per batch, and how long to wait for more requests to join a
+# batch (seconds)
+BATCH_SIZE = 64
+BATCH_WAIT = 0.002
+
+# Largest request body, in bytes
+MAX_BODY = 1 << 20
+
+# Upper bounds of latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Upper bounds of batch size histogram buckets
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+def warm(word_cache=None):
+    """Build all parsers and renderers, run once in each worker"""
+    for scheme in pt.INPUT_SCHEMES:
+        pt.PARSER_DICT[scheme]
+        pt.LALR_PARSER_DICT[scheme]
+        pt.SCANNER_DICT[scheme]
+    for o in pt.TRANSFORMER_DICT:
+        pt.TRANSFORMER_DICT[o]
+    if word_cache:
+        pt.enable_word_cache(word_cache)
+
+
+def _ready():
+    """Nothing, run in workers to wait until they are started and warm"""
+
+
+def validate(request, parser="earley"):
+    """Check a conversion request and fill in defaults
+
+    Returns
+    -------
+    dict
+        Request with keys text, i, outputs (list), all, parser, on_error and
+        superscript_tone
+
+    Raises
+    ------
+    ValueError
+        If the request is not valid
+    """
+    if not isinstance(request, dict):
+        raise ValueError("Request must be a JSON object")
+    text = request.get("text")
+    if not isinstance(text, str):
+        raise ValueError("text must be a string")
+    i = request.get("i", "gdpi")
+    if not isinstance(i, str):
+        raise ValueError("i must be a string")
+    if i != "auto" and i not in pt.PARSER_DICT:
+        raise ValueError(
+            f"Invalid input scheme {i}, must be one of {', '.join(pt.PARSER_DICT)} or auto"
+        )
+    all_outputs = bool(request.get("all", False))
+    if all_outputs:
+        outputs = request.get("targets") or list(pt.TRANSFORMER_DICT)
+        if not isinstance(outputs, list) or not all(isinstance(o, str) for o in outputs):
+            raise ValueError("targets must be a list of strings")
+    else:
+        outputs = [request.get("o", "tlo")]
+        if not isinstance(outputs[0], str):
+            raise ValueError("o must be a string")
+    for o in outputs:
+        if o not in pt.TRANSFORMER_DICT:
+            raise ValueError(
+                f"Invalid output scheme {o}, must be one of {', '.join(pt.TRANSFORMER_DICT)}"
+            )
+    parser = request.get("parser", parser)
+    if not isinstance(parser, str) or parser not in pt.PARSERS:
+        raise ValueError(f"Unknown parser {parser}, must be one of {', '.join(pt.PARSERS)}")
+    on_error = request.get("on_error")
+    if on_error is not None and (not isinstance(on_error, str) or on_error not in pt.ON_ERROR):
+        raise ValueError(f"Unknown on_error {on_error}, must be one of {', '.join(pt.ON_ERROR)}")
+    return {
+        "text": text,
+        "i": i,
+        "outputs": outputs,
+        "all": all_outputs,
+        "parser": parser,
+        "on_error": on_error,
+        "superscript_tone": bool(request.get("superscript_tone", False)),
+    }
+
+
+def convert_request(request):
+    """Convert a validated request, line by line as on the command line
+
+    Returns
+    -------
+    dict
+        Response: "output" (str), or "outputs" by scheme if all outputs were
+        requested; "detected" input scheme and confidence of each line if
+        the input scheme is auto
+    """
+    outputs = request["outputs"]
+    converted = [[] for o in outputs]
+    detected = []
+    for line in request["text"].split("\n"):
+        if not line.strip():
+            for lines in converted:
+                lines.append(line)
+            continue
+        text, scheme, confidence, analysis = pt._prepare_input(
+            line.lower(), request["i"], request["parser"]
+        )
+        if confidence is not None:
+            detected.append([scheme, confidence])
+        results = pt.convert(
+            text,
+            i=scheme,
+            outputs=outputs,
+            parser=request["parser"],
+            on_error=request["on_error"],
+            analysis=analysis,
+        )
+        for lines, result in zip(converted, results):
+            if request["superscript_tone"]:
+                result = result.translate(pt.SUPERSCRIPT_TONES)
+            lines.append(result)
+    texts = ["\n".join(lines) for lines in converted]
+    if request["all"]:
+        response = {"outputs": dict(zip(outputs, texts))}
+    else:
+        response = {"output": texts[0]}
+    if request["i"] == "auto":
+        response["detected"] = detected
+    return response
+
+
+def convert_batch(requests):
+    """Convert a batch of validated requests, run in workers
+
+    Returns
+    -------
+    list
+        Response (dict) for each request; requests that cannot be converted
+        have an "error" instead
+    """
+    out = []
+    for request in requests:
+        try:
+            out.append(convert_request(request))
+        except (LarkError, KeyError, ValueError) as e:
+            lines = str(e).splitlines()
+            out.append({"error": f"{type(e).__name__}: {lines[0] if lines else ''}"})
+    return out
+
+
+class Histogram:
+    """Counts of observed values in cumulative buckets"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for n, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            n = len(self.bounds)
+        self.counts[n] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        buckets = {}
+        total = 0
+        for bound, count in zip(list(self.bounds) + ["+Inf"], self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class Server:
+    """HTTP conversion service
+
+    Arguments
+    ---------
+    host, port : str, int
+        Address to listen on; port 0 picks a free port, see `port` after
+        `start`
+    workers : int
+        Number of worker processes, default number of CPUs. With 0, batches
+        are converted in a thread of the server process.
+    batch_size : int
+        Most requests per batch
+    batch_wait : float
+        Seconds to wait for more requests to join a batch
+    parser : str
+        Default parser, one of parsetc.parsetc.PARSERS; requests may choose
+        another one
+    word_cache : int
+        Size of word cache in each worker, see
+        `parsetc.parsetc.enable_word_cache`; None to disable
+    """
+
+    def __init__(
+        self,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        workers=None,
+        batch_size=BATCH_SIZE,
+        batch_wait=BATCH_WAIT,
+        parser="earley",
+        word_cache=None,
+    ):
+        if parser not in pt.PARSERS:
+            raise ValueError(f"Unknown parser {parser}, must be one of {', '.join(pt.PARSERS)}")
+        self.host = host
+        self.port = port
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.parser = parser
+        self.word_cache = word_cache
+        self.requests = 0
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.batch_sizes = Histogram(BATCH_BUCKETS)
+        self.in_flight = 0
+        self._started = time.monotonic()
+        self._server = None
+        self._pool = None
+        self._batcher = None
+
+    async def start(self):
+        """Start the workers, wait until they are warm, and listen"""
+        loop = asyncio.get_running_loop()
+        if self.workers == 0:
+            self._pool = ThreadPoolExecutor(
+                max_workers=1, initializer=warm, initargs=(self.word_cache,)
+            )
+            slots = 1
+        else:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=warm, initargs=(self.word_cache,)
+            )
+            slots = self.workers
+        # workers are warmed by the initializer when they start, so wait for
+        # every worker before accepting requests
+        await asyncio.gather(
+            *[loop.run_in_executor(self._pool, _ready) for n in range(slots)]
+        )
+        self._queue = asyncio.Queue()
+        # at most two batches per worker are in flight, so that requests
+        # wait in the queue and join larger batches when busy
+        self._slots = asyncio.Semaphore(2 * slots)
+        self._batcher = loop.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if self._queue.qsize() < self.batch_size - 1:
+                # let requests that arrive meanwhile join the batch
+                await asyncio.sleep(self.batch_wait)
+            batch = [first]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._slots.acquire()
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        self.in_flight += len(batch)
+        self.batch_sizes.observe(len(batch))
+        try:
+            results = await loop.run_in_executor(
+                self._pool, convert_batch, [request for request, future in batch]
+            )
+        except Exception as e:
+            # e.g. a worker process died
+            results = [{"error": f"{type(e).__name__}: {e}"}] * len(batch)
+        finally:
+            self.in_flight -= len(batch)
+            self._slots.release()
+        for (request, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def convert(self, request):
+        """Convert a request in the next batch
+
+        Returns
+        -------
+        dict
+            Response, see `convert_request`, or with "error"
+        """
+        try:
+            request = validate(request, self.parser)
+        except ValueError as e:
+            return {"error": str(e)}
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+
+    def metrics(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "queue_depth": self._queue.qsize(),
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "uptime": time.monotonic() - self._started,
+            "latency_seconds": self.latency.to_dict(),
+            "batch_size": self.batch_sizes.to_dict(),
+        }
+
+    async def _route(self, method, path, body):
+        """Status and response for a request"""
+        if path == "/convert":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            try:
+                request = json.loads(body)
+            except ValueError as e:
+                return 400, {"error": f"Invalid JSON: {e}"}
+            if isinstance(request, list):
+                results = await asyncio.gather(*[self.convert(r) for r in request])
+                self.requests += len(results)
+                failed = sum("error" in r for r in results)
+                self.errors += failed
+                return 200, results
+            result = await self.convert(request)
+            self.requests += 1
+            if "error" in result:
+                self.errors += 1
+                return 400, result
+            return 200, result
+        if method != "GET":
+            return 405, {"error": "Use GET"}
+        if path == "/metrics":
+            return 200, self.metrics()
+        if path == "/health":
+            return 200, {"status": "ok"}
+        return 404, {"error": f"Not found: {path}"}
+
+    async def _handle(self, reader, writer):
+        """Serve requests on a connection, with keep-alive"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, version = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                start = time.monotonic()
+                if length > MAX_BODY:
+                    status, payload = 413, {"error": f"Body larger than {MAX_BODY} bytes"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self._route(
+                        method, urlsplit(target).path, body
+                    )
+                    connection = headers.get("connection", "").lower()
+                    if version == "HTTP/1.0":
+                        keep_alive = connection == "keep-alive"
+                    else:
+                        keep_alive = connection != "close"
+                data = json.dumps(payload, ensure_ascii=False).encode("utf8")
+                head = [
+                    f"HTTP/1.1 {status} {REASONS[status]}",
+                    "Content-Type: application/json; charset=utf-8",
+                    f"Content-Length: {len(data)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if method == "POST":
+                    self.latency.observe(time.monotonic() - start)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # client went away, or malformed request line or headers
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(server):
+    await server.start()
+    print(f"parsetc serving on http://{server.host}:{server.port}", file=sys.stderr)
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            # stop the worker processes too when stopped
+            loop.add_signal_handler(sig, task.cancel)
+        except NotImplementedError:
+            # not available on Windows
+            pass
+    try:
+        await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="parsetc serve",
+        description="Serve conversions over HTTP on localhost, see POST /convert and GET /metrics",
+    )
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="Port to listen on, 0 for any free port"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes, default number of CPUs; 0 to convert in the server process",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=BATCH_SIZE, help="Most requests per batch"
+    )
+    parser.add_argument(
+        "--batch-wait",
+        type=float,
+        default=BATCH_WAIT * 1000,
+        metavar="MS",
+        help="Milliseconds to wait for more requests to join a batch",
+    )
+    parser.add_argument(
+        "--parser",
+        type=str,
+        choices=pt.PARSERS,
+        default="earley",
+        help="Default parser algorithm, see parsetc --help; requests may set parser",
+    )
+    parser.add_argument(
+        "--word_cache",
+        type=int,
+        default=None,
+        metavar="SIZE",
+        help="Cache up to SIZE converted words in each worker",
+    )
+    args = parser.parse_args(argv)
+    server = Server(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        batch_wait=args.batch_wait / 1000,
+        parser=args.parser,
+        word_cache=args.word_cache,
+    )
+    try:
+        asyncio.run(_serve(server))
+    except KeyboardInterrupt:
+        pass
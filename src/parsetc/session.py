@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+from parsetc.parsetc import ON_ERROR, PARSER_DICT, TRANSFORMER_DICT, WORDS, convert_word
+
+# Incremental conversion of text that is edited, e.g. for a live preview.
+# The text is kept as a sequence of tokens, alternately separators and words
+# (see parsetc.parsetc.WORDS), together with the converted output of each
+# token. Tokens are stored in blocks, with the total length of the input and
+# output of each block, so that the tokens around an edit are found and
+# replaced in time that grows with the number of blocks, not with the length
+# of the text.
+
+# Number of tokens per block
+BLOCK_SIZE = 64
+
+# Converted words per session; there are few distinct words, so most are
+# looked up instead of converted
+MEMO_SIZE = 100000
+
+
+class _Block:
+    """Consecutive tokens, and their total length"""
+
+    __slots__ = ("inputs", "outputs", "in_len", "out_len")
+
+    def __init__(self, inputs, outputs):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.in_len = sum(map(len, inputs))
+        self.out_len = sum(map(len, outputs))
+
+
+class Session:
+    """Text that is converted again as it is edited
+
+    The output is the same as converting the whole text word by word with
+    `parsetc.parsetc.convert_words`, but after an edit only the words around
+    it are converted again.
+    A session must not be updated from several threads at once.
+
+    Arguments
+    ---------
+    i : str
+        Input format. Must match one of the available inputs
+    o : str
+        Output format. Must match one of the available outputs
+    text : str
+        Initial text
+    parser : str
+        Parser to use, one of parsetc.parsetc.PARSERS, see
+        `parsetc.parsetc.analyze`
+    on_error : str
+        What to do with words that cannot be converted, e.g. because they
+        are still being typed, see `parsetc.parsetc.convert_words`
+    """
+
+    def __init__(self, i="gdpi", o="tlo", text="", parser="scan", on_error="passthrough"):
+        if i not in PARSER_DICT:
+            raise ValueError(f"Invalid input scheme {i}, must be one of {', '.join(PARSER_DICT)}")
+        if o not in TRANSFORMER_DICT:
+            raise ValueError(
+                f"Invalid output scheme {o}, must be one of {', '.join(TRANSFORMER_DICT)}"
+            )
+        if on_error not in ON_ERROR:
+            raise ValueError(f"Unknown on_error {on_error}, must be one of {', '.join(ON_ERROR)}")
+        self.i = i
+        self.o = o
+        self.parser = parser
+        self.on_error = on_error
+        self._memo = {}
+        self.set_text(text)
+
+    @property
+    def text(self):
+        """Current input text"""
+        return "".join("".join(block.inputs) for block in self._blocks)
+
+    @property
+    def output(self):
+        """Current converted text"""
+        return "".join("".join(block.outputs) for block in self._blocks)
+
+    def __len__(self):
+        """Length of input text"""
+        return sum(block.in_len for block in self._blocks)
+
+    def _convert(self, word):
+        try:
+            return self._memo[word]
+        except KeyError:
+            pass
+        if len(self._memo) > MEMO_SIZE:
+            self._memo.clear()
+        out = convert_word(word, i=self.i, outputs=[self.o], parser=self.parser, on_error=self.on_error)[0]
+        self._memo[word] = out
+        return out
+
+    def _tokenize(self, text):
+        """Split text into tokens, and convert them"""
+        inputs = WORDS.split(text)
+        # separators at even positions are kept as they are
+        outputs = [t if n % 2 == 0 else self._convert(t) for n, t in enumerate(inputs)]
+        return inputs, outputs
+
+    @staticmethod
+    def _make_blocks(inputs, outputs):
+        return [
+            _Block(inputs[n : n + BLOCK_SIZE], outputs[n : n + BLOCK_SIZE])
+            for n in range(0, len(inputs), BLOCK_SIZE)
+        ]
+
+    def set_text(self, text):
+        """Replace the whole text
+
+        Returns
+        -------
+        str
+            Converted text
+        """
+        inputs, outputs = self._tokenize(text)
+        self._ntokens = len(inputs)
+        self._blocks = self._make_blocks(inputs, outputs)
+        return "".join(outputs)
+
+    def _token_at(self, pos):
+        """Index of the token that contains the character at pos
+
+        Positions before the text give the first token, and positions after
+        the text the last one.
+        """
+        start = 0
+        index = 0
+        for block in self._blocks:
+            if start + block.in_len > pos:
+                for token in block.inputs:
+                    start += len(token)
+                    if start > pos:
+                        return index
+                    index += 1
+            start += block.in_len
+            index += len(block.inputs)
+        return self._ntokens - 1
+
+    def _block_of(self, index):
+        """Position of the block that contains a token, and of its first token"""
+        first = 0
+        for n, block in enumerate(self._blocks):
+            if first + len(block.inputs) > index:
+                return n, first
+            first += len(block.inputs)
+        raise IndexError(index)
+
+    def _replace(self, a, b, inputs, outputs):
+        """Replace tokens a to b (inclusive)
+
+        Returns
+        -------
+        tuple
+            Input and output offsets of token a, and the replaced tokens'
+            input (str) and output (str)
+        """
+        ba, first = self._block_of(a)
+        bb, _ = self._block_of(b)
+        in_start = sum(block.in_len for block in self._blocks[:ba])
+        out_start = sum(block.out_len for block in self._blocks[:ba])
+        old_inputs = []
+        old_outputs = []
+        for block in self._blocks[ba : bb + 1]:
+            old_inputs += block.inputs
+            old_outputs += block.outputs
+        a -= first
+        b -= first
+        in_start += sum(map(len, old_inputs[:a]))
+        out_start += sum(map(len, old_outputs[:a]))
+        replaced = ("".join(old_inputs[a : b + 1]), "".join(old_outputs[a : b + 1]))
+        old_inputs[a : b + 1] = inputs
+        old_outputs[a : b + 1] = outputs
+        self._blocks[ba : bb + 1] = self._make_blocks(old_inputs, old_outputs)
+        self._ntokens += len(inputs) - (b - a + 1)
+        if len(self._blocks) > 2 * (self._ntokens // BLOCK_SIZE + 1):
+            # many small blocks left by earlier edits
+            self._blocks = self._make_blocks(
+                [t for block in self._blocks for t in block.inputs],
+                [t for block in self._blocks for t in block.outputs],
+            )
+        return in_start, out_start, replaced[0], replaced[1]
+
+    def update(self, edit_range, new_text):
+        """Replace part of the text, and convert the words around it again
+
+        Arguments
+        ---------
+        edit_range : tuple
+            Start and end (exclusive) position of the replaced input text;
+            start and end are the same for an insertion
+        new_text : str
+            Text that replaces it, empty for a deletion
+
+        Returns
+        -------
+        tuple
+            Start and end (exclusive) position of the changed part of the
+            previous output, and the converted text that replaces it
+        """
+        start, end = edit_range
+        length = len(self)
+        if not 0 <= start <= end <= length:
+            raise ValueError(f"Invalid edit range {edit_range} for text of length {length}")
+        # Tokens with characters next to the edit may join or split, and
+        # words right before and after them are included so that the new
+        # text is split into words the same way as the whole text would be
+        first = self._token_at(start - 1)
+        last = self._token_at(end)
+        a = first - 1 if first % 2 == 0 else first - 2
+        b = last + 1 if last % 2 == 0 else last + 2
+        a = max(a, 0)
+        b = min(b, self._ntokens - 1)
+        ba, first_index = self._block_of(a)
+        bb, _ = self._block_of(b)
+        region = []
+        for block in self._blocks[ba : bb + 1]:
+            region += block.inputs
+        region = region[a - first_index : b - first_index + 1]
+        region_start = sum(block.in_len for block in self._blocks[:ba]) + sum(
+            len(t) for t in self._blocks[ba].inputs[: a - first_index]
+        )
+        text = "".join(region)
+        text = text[: start - region_start] + new_text + text[end - region_start :]
+        inputs, outputs = self._tokenize(text)
+        # keep separators and words alternating: the region begins and ends
+        # with a word, unless it is at the start or end of the text
+        if a % 2 == 1:
+            del inputs[0], outputs[0]
+        if b % 2 == 1:
+            del inputs[-1], outputs[-1]
+        _, out_start, _, old_output = self._replace(a, b, inputs, outputs)
+        return out_start, out_start + len(old_output), "".join(outputs)
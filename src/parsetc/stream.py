@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+
+# Size of output buffer for the command line tool
+OUTPUT_BUFFER = 1 << 20
+
+# Places where overlong lines can be split: after the spaces following a
+# sentence-final punctuation mark, or else after any run of spaces
+SENTENCE_BREAK = re.compile(r"[.?!;:][\"'”’)\]]* +")
+WORD_BREAK = re.compile(r" +")
+
+
+def _split_point(text):
+    """Position after the last sentence break in text, else the last word break
+
+    Returns len(text) if there is neither.
+    """
+    for regex in (SENTENCE_BREAK, WORD_BREAK):
+        last = None
+        for last in regex.finditer(text):
+            pass
+        if last is not None:
+            return last.end()
+    return len(text)
+
+
+def read_segments(infile, max_length=65536):
+    """Read text from a file in pieces of bounded length
+
+    Lines are read whole if they are shorter than max_length. Longer lines
+    are split into segments after sentence-final punctuation or spaces,
+    so that text without line breaks can also be processed with constant
+    memory. Words longer than max_length are cut.
+
+    Arguments
+    ---------
+    infile : file
+        Text file opened for reading
+    max_length : int
+        Maximum number of characters to read at a time
+
+    Yields
+    ------
+    tuple
+        Segment of text without line break (str), and whether it is the
+        end of a line (bool)
+    """
+    pending = ""
+    while True:
+        chunk = infile.readline(max_length)
+        if not chunk:
+            if pending:
+                yield pending, True
+            return
+        text = pending + chunk
+        if text.endswith("\n"):
+            pending = ""
+            yield text.rstrip("\r\n"), True
+        elif len(chunk) < max_length:
+            # end of file without line break
+            pending = ""
+            yield text, True
+        else:
+            cut = _split_point(text)
+            pending = text[cut:]
+            yield text[:cut], False
+
+
+def open_output(path=None):
+    """Open file or STDOUT for writing with a large buffer
+
+    Arguments
+    ---------
+    path : str
+        Path to output file, or None for STDOUT, which is not closed when
+        the returned file is closed
+    """
+    if path is None:
+        sys.stdout.flush()
+        return open(
+            sys.stdout.fileno(),
+            "w",
+            encoding=sys.stdout.encoding,
+            buffering=OUTPUT_BUFFER,
+            closefd=False,
+        )
+    return open(path, "w", encoding="utf8", buffering=OUTPUT_BUFFER)
@@ -4,768 +4,595 @@ import re
 import json
 
 from importlib_resources import files
-from lark import Transformer
-
-# Load terminals data
-TERMINALS = json.loads(files("parsetc").joinpath("terminals.json").read_text())
-
-
-class Gdpi(Transformer):
-    """Convert Teochew pengim parse tree to Gengdang Pêng'im"""
+from lark import Transformer, Tree
+from lark.exceptions import VisitError
+
+# Load terminals data, shared with parsetc.parsetc
+TERMINALS_JSON = files("parsetc").joinpath("terminals.json").read_text()
+TERMINALS = json.loads(TERMINALS_JSON)
+
+# Groups of terminals in terminals.json that are rendered by table lookup, and
+# the Renderer attribute holding the table for each group
+TERMINAL_GROUPS = {
+    "initials": "initial_table",
+    "medials": "medial_table",
+    "codanasals": "codanasal_table",
+    "codastops": "codastop_table",
+}
+
+# Tone diacritics go after the first vowel letter
+FIRST_VOWEL = re.compile(r"[aeiou]")
+
+
+class Renderer(Transformer):
+    """Convert Teochew pengim parse tree to an output scheme
+
+    Output schemes are subclasses that only declare lookup tables and a few
+    options; the tables are compiled once per instance into a single dict
+    indexed by terminal type.
+
+    Attributes
+    ----------
+    initial_table, medial_table, codanasal_table, codastop_table : str or dict
+        Name of the scheme in terminals.json to take this group of terminals
+        from, or dict of terminal type to output string
+    extra_terminals : dict
+        Output for terminal types that are not in the tables above, e.g. for
+        codas that are absent from the output scheme
+    finals : dict
+        Replace whole finals by lookup, for finals in this dict
+    nasal : str
+        Output for nasalization marker
+    syllable_sep : str
+        Replace syllable separators with this, or None to keep them as is
+    word_joiner : str
+        Join syllables of a word with this
+    drop_hyphens : bool
+        Remove hyphens between syllables of a word before joining
+    tones : dict
+        Output for citation tone numbers, or None to keep the numbers
+    sandhi_tone : bool
+        Also give sandhi tone in parentheses after citation tone, if present
+    tone_marks : dict
+        Tone diacritics per tone number, which are placed after the first vowel
+        letter of the syllable instead of writing the tone, or None
+    """
+
+    initial_table = None
+    medial_table = None
+    codanasal_table = None
+    codastop_table = None
+    extra_terminals = {}
+    finals = {}
+    nasal = "n"
+    syllable_sep = None
+    word_joiner = ""
+    drop_hyphens = False
+    tones = None
+    sandhi_tone = False
+    tone_marks = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._terminals = {}
+        for group in TERMINAL_GROUPS:
+            table = getattr(self, TERMINAL_GROUPS[group])
+            if isinstance(table, str):
+                table = {
+                    term: TERMINALS[group][term][table]
+                    for term in TERMINALS[group]
+                    if table in TERMINALS[group][term]
+                }
+            self._terminals.update(table)
+        self._terminals.update(self.extra_terminals)
 
     def NASAL(self, value):
-        return "n"
-
-    def initial(self, items):
-        trdict = {
-            term: TERMINALS["initials"][term]["gdpi"]
-            for term in TERMINALS["initials"]
-            if "gdpi" in TERMINALS["initials"][term]
-        }
-        return trdict[items[0].type]
-
-    def medial(self, items):
-        trdict = {
-            term: TERMINALS["medials"][term]["gdpi"]
-            for term in TERMINALS["medials"]
-            if "gdpi" in TERMINALS["medials"][term]
-        }
-        return trdict[items[0].type]
-
-    def coda(self, items):
-        return "".join([str(i) for i in items])
-
-    def codastops(self, items):
-        trdict = {
-            term: TERMINALS["codastops"][term]["gdpi"]
-            for term in TERMINALS["codastops"]
-            if "gdpi" in TERMINALS["codastops"][term]
-        }
-        trdict["COD_T"] = "g"  # Gengdang Pêng'im does not have stop -t
-        return trdict[items[0].type]
-
-    def codanasal(self, items):
-        trdict = {
-            term: TERMINALS["codanasals"][term]["gdpi"]
-            for term in TERMINALS["codanasals"]
-            if "gdpi" in TERMINALS["codanasals"][term]
-        }
-        trdict["COD_N"] = "ng"  # Gengdang Pêng'im does not have coda n
-        return trdict[items[0].type]
-
-    def final(self, items):
-        return "".join([str(i) for i in items])
-
-    def tone(self, items):
-        if len(items) == 1:
-            return str(items[0])
-        elif len(items) == 2:
-            return str(items[0]) + "(" + str(items[1]) + ")"
-        else:
-            return ""
-
-    def syllable_tone(self, items):
-        return "".join([str(i) for i in items])
-
-    def syllable_toneless(self, items):
-        return "".join([str(i) for i in items])
-
-    def word_sep(self, items):
-        return "".join(items)
+        return self.nasal
 
-    def sentence(self, items):
-        return "".join(items)
+    def SYLLABLE_SEP(self, value):
+        if self.syllable_sep is None:
+            return value
+        return self.syllable_sep
 
+    def terminal(self, items):
+        return self._terminals[items[0].type]
 
-class Ggnn(Transformer):
-    """Convert Teochew pengim parse tree to Gaginang Peng'im"""
-
-    def NASAL(self, value):
-        return "n"
-
-    def initial(self, items):
-        trdict = {
-            term: TERMINALS["initials"][term]["ggnn"]
-            for term in TERMINALS["initials"]
-            if "ggnn" in TERMINALS["initials"][term]
-        }
-        return trdict[items[0].type]
-
-    def medial(self, items):
-        trdict = {
-            term: TERMINALS["medials"][term]["ggnn"]
-            for term in TERMINALS["medials"]
-            if "ggnn" in TERMINALS["medials"][term]
-        }
-        return trdict[items[0].type]
+    initial = terminal
+    medial = terminal
+    codastops = terminal
+    codanasal = terminal
 
     def coda(self, items):
-        return "".join([str(i) for i in items])
-
-    def codastops(self, items):
-        trdict = {
-            term: TERMINALS["codastops"][term]["ggnn"]
-            for term in TERMINALS["codastops"]
-            if "ggnn" in TERMINALS["codastops"][term]
-        }
-        return trdict[items[0].type]
-
-    def codanasal(self, items):
-        trdict = {
-            term: TERMINALS["codanasals"][term]["ggnn"]
-            for term in TERMINALS["codanasals"]
-            if "ggnn" in TERMINALS["codanasals"][term]
-        }
-        return trdict[items[0].type]
-
-    def final(self, items):
-        return "".join([str(i) for i in items])
-
-    def tone(self, items):
-        if len(items) == 1:
-            return str(items[0])
-        elif len(items) == 2:
-            return str(items[0]) + "(" + str(items[1]) + ")"
-        else:
-            return ""
-
-    def syllable_tone(self, items):
-        return "".join([str(i) for i in items])
-
-    def syllable_toneless(self, items):
-        return "".join([str(i) for i in items])
-
-    def word_sep(self, items):
         return "".join(items)
 
-    def sentence(self, items):
-        return "".join(items)
-
-
-class Tlo(Transformer):
-    """Convert Teochew pengim parse tree to Tie-lo"""
-
-    def NASAL(self, value):
-        return "nn"
-
-    def SYLLABLE_SEP(self, value):
-        # Change all syllable separators to hyphens
-        return "-"
-
-    def initial(self, items):
-        trdict = {
-            term: TERMINALS["initials"][term]["tlo"]
-            for term in TERMINALS["initials"]
-            if "tlo" in TERMINALS["initials"][term]
-        }
-        return trdict[items[0].type]
-
-    def medial(self, items):
-        trdict = {
-            term: TERMINALS["medials"][term]["tlo"]
-            for term in TERMINALS["medials"]
-            if "tlo" in TERMINALS["medials"][term]
-        }
-        return trdict[items[0].type]
-
-    def coda(self, items):
-        return "".join([str(i) for i in items])
-
-    def codastops(self, items):
-        trdict = {
-            term: TERMINALS["codastops"][term]["tlo"]
-            for term in TERMINALS["codastops"]
-            if "tlo" in TERMINALS["codastops"][term]
-        }
-        return trdict[items[0].type]
-
-    def codanasal(self, items):
-        trdict = {
-            term: TERMINALS["codanasals"][term]["tlo"]
-            for term in TERMINALS["codanasals"]
-            if "tlo" in TERMINALS["codanasals"][term]
-        }
-        return trdict[items[0].type]
-
     def final(self, items):
-        return "".join([str(i) for i in items])
+        pre = "".join(items)
+        return self.finals.get(pre, pre)
 
     def tone(self, items):
-        # Only return the citation tone
+        if self.tones is not None:
+            # citation tone only
+            return self.tones[str(items[0])]
+        elif self.sandhi_tone and len(items) == 2:
+            return items[0] + "(" + items[1] + ")"
         return str(items[0])
 
+    def render_syllable(self, syllab):
+        """Hook for changes to the whole syllable, after the tone is added"""
+        return syllab
+
     def syllable_tone(self, items):
-        # Tie-lo is less straightforward because it marks
-        # tones with diacritics
-        trdict = {
-            "1": "",
-            "2": "\u0301",
-            "3": "\u0300",
-            "4": "",
-            "5": "\u0302",
-            "6": "\u0306",
-            "7": "\u0304",
-            "8": "\u0302",
-            "0": "",
-        }
-        # TODO put tone mark on first vowel letter else on first letter of final
+        if self.tone_marks is None:
+            return self.render_syllable("".join(items))
         syllab = "".join(items[:-1])  # syllable without tone
-        tone = items[-1]
-        firstvowel = re.search(r"[aeiou]", syllab)
-        if firstvowel:
-            # put tone mark on first vowel letter
-            inspos = firstvowel.span()[1]
-            syllab = syllab[0:inspos] + trdict[tone] + syllab[inspos:]
-        else:
-            # no vowel in syllable, put on first character
-            syllab = syllab[0] + trdict[tone] + syllab[1:]
-        return syllab
+        firstvowel = FIRST_VOWEL.search(syllab)
+        # put tone mark on first vowel letter, else on first character
+        inspos = firstvowel.end() if firstvowel else 1
+        syllab = syllab[0:inspos] + self.tone_marks[items[-1]] + syllab[inspos:]
+        return self.render_syllable(syllab)
 
     def syllable_toneless(self, items):
-        return "".join([str(i) for i in items])
+        return self.render_syllable("".join(items))
+
+    def render_parts(self, initial, medial, nasal, coda, tone, sandhi=None):
+        """Render a syllable from its parts, without a parse tree
+
+        Arguments
+        ---------
+        initial, medial, coda : str
+            Terminal types, or None if absent
+        nasal : str
+            Nasalization marker as written in the input, or None
+        tone, sandhi : str
+            Citation tone and sandhi tone numbers; either may be None
+
+        Returns
+        -------
+        str
+            Same as transforming the equivalent 'syllable_tone' tree, or
+            'syllable_toneless' tree if tone is None
+        """
+        final = []
+        if medial is not None:
+            final.append(self._terminals[medial])
+        if nasal is not None:
+            final.append(self.NASAL(nasal))
+        if coda is not None:
+            final.append(self._terminals[coda])
+        items = [] if initial is None else [self._terminals[initial]]
+        items.append(self.final(final))
+        if tone is None:
+            return self.syllable_toneless(items)
+        items.append(self.tone([tone] if sandhi is None else [tone, sandhi]))
+        return self.syllable_tone(items)
 
     def word_sep(self, items):
-        # replace all syllable separators with hyphens
-        # and separate syllables with hyphens if no
-        # syllable separator is present
-        return "-".join([i for i in items if i != "-"])
+        # optionally replace all syllable separators with word_joiner and
+        # separate syllables with word_joiner if no syllable separator is
+        # present
+        if self.drop_hyphens:
+            return self.word_joiner.join([i for i in items if i != "-"])
+        return self.word_joiner.join(items)
 
     def sentence(self, items):
         return "".join(items)
 
 
-class Duffus(Transformer):
-    """Convert Teochew pengim parse tree to Duffus system"""
-
-    def NASAL(self, value):
-        return "\u207f"
-
-    def SYLLABLE_SEP(self, value):
-        # Change all syllable separators to hyphens
-        return "-"
-
-    def initial(self, items):
-        trdict = {
-            "INIT_BH": "b",
-            "INIT_P": "ph",
-            "INIT_B": "p",
-            "INIT_M": "m",
-            "INIT_NG": "ng",
-            "INIT_N": "n",
-            "INIT_GH": "g",
-            "INIT_K": "kh",
-            "INIT_G": "k",
-            "INIT_D": "t",
-            "INIT_T": "th",
-            "INIT_Z": "ts",
-            "INIT_C": "tsh",
-            "INIT_S": "s",
-            "INIT_H": "h",
-            "INIT_R": "z",
-            "INIT_L": "l",
-        }
-        return trdict[items[0].type]
-
-    def medial(self, items):
-        trdict = {
-            "MED_AI": "ai",
-            "MED_AU": "au",
-            "MED_IA": "ia",
-            "MED_IAU": "iau",
-            "MED_IEU": "ieu",
-            "MED_IOU": "iou",
-            "MED_IU": "iu",
-            "MED_IE": "ie",
-            "MED_IO": "io",
-            "MED_OI": "oi",
-            "MED_OU": "ou",
-            "MED_UAI": "uai",
-            "MED_UA": "ua",
-            "MED_UE": "ue",
-            "MED_UI": "ui",
-            "MED_A": "a",
-            "MED_V": "ṳ",
-            "MED_E": "e",
-            "MED_I": "i",
-            "MED_O": "o",
-            "MED_U": "u",
-        }
-        return trdict[items[0].type]
+class MultiRenderer(Transformer):
+    """Convert parse tree to several output schemes in a single pass
+
+    Each node of the tree is visited once and converted by every renderer;
+    intermediate results are tuples with one item per renderer.
+
+    Arguments
+    ---------
+    renderers : list
+        Renderer instances for each output scheme
+    """
+
+    def __init__(self, renderers):
+        super().__init__()
+        self.renderers = list(renderers)
+
+    def __default__(self, data, children, meta):
+        out = []
+        for n, renderer in enumerate(self.renderers):
+            items = [c[n] if isinstance(c, tuple) else c for c in children]
+            f = getattr(renderer, data, None)
+            if f is None:
+                out.append(Tree(data, items, meta))
+                continue
+            try:
+                out.append(f(items))
+            except Exception as e:
+                raise VisitError(data, Tree(data, children, meta), e)
+        return tuple(out)
+
+    def __default_token__(self, token):
+        if not any(hasattr(r, token.type) for r in self.renderers):
+            return token
+        return tuple(
+            getattr(r, token.type)(token) if hasattr(r, token.type) else token
+            for r in self.renderers
+        )
+
+    def transform(self, tree):
+        """Convert tree, returns list of str in the same order as renderers"""
+        return list(super().transform(tree))
+
+
+class Gdpi(Renderer):
+    """Convert Teochew pengim parse tree to Gengdang Pêng'im"""
 
-    def coda(self, items):
-        return "".join([str(i) for i in items])
-
-    def codastops(self, items):
-        trdict = {
-            "COD_P": "p",
-            "COD_K": "k",
-            "COD_H": "h",
-            "COD_T": "t",
-        }
-        return trdict[items[0].type]
-
-    def codanasal(self, items):
-        trdict = {
-            "COD_M": "m",
-            "COD_NG": "ng",
-            "COD_N": "n",
-        }
-        return trdict[items[0].type]
+    initial_table = "gdpi"
+    medial_table = "gdpi"
+    codanasal_table = "gdpi"
+    codastop_table = "gdpi"
+    extra_terminals = {
+        "COD_T": "g",  # Gengdang Pêng'im does not have stop -t
+        "COD_N": "ng",  # Gengdang Pêng'im does not have coda n
+    }
+    sandhi_tone = True
 
-    def final(self, items):
-        return "".join([str(i) for i in items])
 
-    def tone(self, items):
-        # Only return the citation tone
-        return str(items[0])
+class Ggnn(Renderer):
+    """Convert Teochew pengim parse tree to Gaginang Peng'im"""
 
-    def syllable_tone(self, items):
-        # Tie-lo is less straightforward because it marks
-        # tones with diacritics
-        trdict = {
-            "1": "",
-            "2": "\u0301",
-            "3": "\u0300",
-            "4": "",
-            "5": "\u0302",
-            "6": "\u0303",
-            "7": "\u0304",
-            "8": "\u0307",
-            "0": "",
-        }
-        # TODO put tone mark on first vowel letter else on first letter of final
-        syllab = "".join(items[:-1])  # syllable without tone
-        tone = items[-1]
-        firstvowel = re.search(r"[aeiou]", syllab)
-        if firstvowel:
-            # put tone mark on first vowel letter
-            inspos = firstvowel.span()[1]
-            syllab = syllab[0:inspos] + trdict[tone] + syllab[inspos:]
-        else:
-            # no vowel in syllable, put on first character
-            syllab = syllab[0] + trdict[tone] + syllab[1:]
-        return syllab
+    initial_table = "ggnn"
+    medial_table = "ggnn"
+    codanasal_table = "ggnn"
+    codastop_table = "ggnn"
+    sandhi_tone = True
 
-    def syllable_toneless(self, items):
-        return "".join([str(i) for i in items])
 
-    def word_sep(self, items):
-        # replace all syllable separators with hyphens
-        # and separate syllables with hyphens if no
-        # syllable separator is present
-        return "-".join([i for i in items if i != "-"])
-
-    def sentence(self, items):
-        return "".join(items)
+class Tlo(Renderer):
+    """Convert Teochew pengim parse tree to Tie-lo"""
 
+    initial_table = "tlo"
+    medial_table = "tlo"
+    codanasal_table = "tlo"
+    codastop_table = "tlo"
+    nasal = "nn"
+    # Change all syllable separators to hyphens
+    syllable_sep = "-"
+    word_joiner = "-"
+    drop_hyphens = True
+    # Tie-lo is less straightforward because it marks tones with diacritics
+    tone_marks = {
+        "1": "",
+        "2": "\u0301",
+        "3": "\u0300",
+        "4": "",
+        "5": "\u0302",
+        "6": "\u0306",
+        "7": "\u0304",
+        "8": "\u0302",
+        "0": "",
+    }
+
+
+class Duffus(Renderer):
+    """Convert Teochew pengim parse tree to Duffus system"""
 
-class Sinwz(Transformer):
+    initial_table = {
+        "INIT_BH": "b",
+        "INIT_P": "ph",
+        "INIT_B": "p",
+        "INIT_M": "m",
+        "INIT_NG": "ng",
+        "INIT_N": "n",
+        "INIT_GH": "g",
+        "INIT_K": "kh",
+        "INIT_G": "k",
+        "INIT_D": "t",
+        "INIT_T": "th",
+        "INIT_Z": "ts",
+        "INIT_C": "tsh",
+        "INIT_S": "s",
+        "INIT_H": "h",
+        "INIT_R": "z",
+        "INIT_L": "l",
+    }
+    medial_table = {
+        "MED_AI": "ai",
+        "MED_AU": "au",
+        "MED_IA": "ia",
+        "MED_IAU": "iau",
+        "MED_IEU": "ieu",
+        "MED_IOU": "iou",
+        "MED_IU": "iu",
+        "MED_IE": "ie",
+        "MED_IO": "io",
+        "MED_OI": "oi",
+        "MED_OU": "ou",
+        "MED_UAI": "uai",
+        "MED_UA": "ua",
+        "MED_UE": "ue",
+        "MED_UI": "ui",
+        "MED_A": "a",
+        "MED_V": "ṳ",
+        "MED_E": "e",
+        "MED_I": "i",
+        "MED_O": "o",
+        "MED_U": "u",
+    }
+    codanasal_table = {
+        "COD_M": "m",
+        "COD_NG": "ng",
+        "COD_N": "n",
+    }
+    codastop_table = {
+        "COD_P": "p",
+        "COD_K": "k",
+        "COD_H": "h",
+        "COD_T": "t",
+    }
+    nasal = "\u207f"
+    # Change all syllable separators to hyphens
+    syllable_sep = "-"
+    word_joiner = "-"
+    drop_hyphens = True
+    tone_marks = {
+        "1": "",
+        "2": "\u0301",
+        "3": "\u0300",
+        "4": "",
+        "5": "\u0302",
+        "6": "\u0303",
+        "7": "\u0304",
+        "8": "\u0307",
+        "0": "",
+    }
+
+
+class Sinwz(Renderer):
     """Convert Teochew pengim parse tree to Sinwenz system"""
 
+    initial_table = {
+        "INIT_BH": "bh",
+        "INIT_P": "p",
+        "INIT_B": "b",
+        "INIT_M": "m",
+        "INIT_NG": "ng",
+        "INIT_N": "n",
+        "INIT_GH": "gh",
+        "INIT_K": "k",
+        "INIT_G": "g",
+        "INIT_D": "d",
+        "INIT_T": "t",
+        "INIT_Z": "z",
+        "INIT_C": "c",
+        "INIT_S": "s",
+        "INIT_H": "x",
+        "INIT_R": "dz",
+        "INIT_L": "l",
+    }
+    medial_table = {
+        "MED_AI": "ai",
+        "MED_AU": "ao",
+        "MED_IA": "ia",
+        "MED_IAU": "iao",
+        "MED_IEU": "iao",
+        "MED_IOU": "iao",
+        "MED_IU": "iu",
+        "MED_IE": "io",
+        "MED_IO": "io",
+        "MED_OI": "oi",
+        "MED_OU": "ou",
+        "MED_UAI": "uai",
+        "MED_UA": "ua",
+        "MED_UE": "ue",
+        "MED_UI": "ui",
+        "MED_A": "a",
+        "MED_V": "y",
+        "MED_E": "e",
+        "MED_I": "i",
+        "MED_O": "o",
+        "MED_U": "u",
+    }
+    codanasal_table = {
+        "COD_M": "m",
+        "COD_NG": "ng",
+        "COD_N": "n",
+    }
+    codastop_table = {
+        "COD_P": "p",
+        "COD_K": "q",
+        "COD_H": "q",
+    }
+    # TODO: Check what syllable separators are used in Sinwenz
+    # Change all syllable separators to hyphens
+    syllable_sep = "-"
+    word_joiner = "-"
+    drop_hyphens = True
+
     def NASAL(self, items):
         # Nasal will end with vowel so we can keep this simple
         syllab = "".join(items[:-1])
         return syllab + "\u0303"
 
-    def SYLLABLE_SEP(self, value):
-        # TODO: Check what syllable separators are used in Sinwenz
-        # Change all syllable separators to hyphens
-        return "-"
-
-    def initial(self, items):
-        trdict = {
-            "INIT_BH": "bh",
-            "INIT_P": "p",
-            "INIT_B": "b",
-            "INIT_M": "m",
-            "INIT_NG": "ng",
-            "INIT_N": "n",
-            "INIT_GH": "gh",
-            "INIT_K": "k",
-            "INIT_G": "g",
-            "INIT_D": "d",
-            "INIT_T": "t",
-            "INIT_Z": "z",
-            "INIT_C": "c",
-            "INIT_S": "s",
-            "INIT_H": "x",
-            "INIT_R": "dz",
-            "INIT_L": "l",
-        }
-        return trdict[items[0].type]
-
-    def medial(self, items):
-        trdict = {
-            "MED_AI": "ai",
-            "MED_AU": "ao",
-            "MED_IA": "ia",
-            "MED_IAU": "iao",
-            "MED_IEU": "iao",
-            "MED_IOU": "iao",
-            "MED_IU": "iu",
-            "MED_IE": "io",
-            "MED_IO": "io",
-            "MED_OI": "oi",
-            "MED_OU": "ou",
-            "MED_UAI": "uai",
-            "MED_UA": "ua",
-            "MED_UE": "ue",
-            "MED_UI": "ui",
-            "MED_A": "a",
-            "MED_V": "y",
-            "MED_E": "e",
-            "MED_I": "i",
-            "MED_O": "o",
-            "MED_U": "u",
-        }
-        return trdict[items[0].type]
-
-    def coda(self, items):
-        return "".join([str(i) for i in items])
-
-    def codastops(self, items):
-        trdict = {
-            "COD_P": "p",
-            "COD_K": "q",
-            "COD_H": "q",
-        }
-        return trdict[items[0].type]
-
-    def codanasal(self, items):
-        trdict = {
-            "COD_M": "m",
-            "COD_NG": "ng",
-            "COD_N": "n",
-        }
-        return trdict[items[0].type]
-
-    def final(self, items):
-        return "".join([str(i) for i in items])
-
-    def tone(self, items):
-        # Only return the citation tone
-        return str(items[0])
-
-    def syllable_tone(self, items):
-        # Check if syllable begins with i or u
-        pre = list("".join([str(i) for i in items]))
-        if pre[0] == "i" and len(pre) > 1:
-            pre[0] = "j"
-        elif pre[0] == "u" and len(pre) > 1:
-            pre[0] = "w"
-        return "".join(pre)
-
-    def syllable_toneless(self, items):
+    def render_syllable(self, syllab):
         # Check if syllable begins with i or u
-        pre = list("".join([str(i) for i in items]))
-        if pre[0] == "i" and len(pre) > 1:
-            pre[0] = "j"
-        elif pre[0] == "u" and len(pre) > 1:
-            pre[0] = "w"
-        return "".join(pre)
-
-    def word_sep(self, items):
-        # replace all syllable separators with hyphens
-        # and separate syllables with hyphens if no
-        # syllable separator is present
-        return "-".join([i for i in items if i != "-"])
-
-    def sentence(self, items):
-        return "".join(items)
+        if syllab[0] == "i" and len(syllab) > 1:
+            return "j" + syllab[1:]
+        elif syllab[0] == "u" and len(syllab) > 1:
+            return "w" + syllab[1:]
+        return syllab
 
 
-class Zapngou(Transformer):
+class Zapngou(Renderer):
     INITS = ["柳", "邊", "求", "去", "地", "頗", "他", "貞", "入", "時", "文", "語", "出", "喜"]
 
-    def NASAL(self, value):
-        return "n"
-
-    def initial(self, items):
-        trdict = {
-            "INIT_L": "柳",
-            "INIT_N": "柳(n)",  # merged in Minnan/Hokkien
-            "INIT_B": "邊",
-            "INIT_M": "邊(m)",  # merged in Minnan/Hokkien
-            "INIT_G": "求",
-            "INIT_NG": "求(ng)",  # merged in Minnan/Hokkien
-            "INIT_K": "去",
-            "INIT_D": "地",
-            "INIT_P": "頗",
-            "INIT_T": "他",
-            "INIT_Z": "貞",
-            "INIT_R": "入",
-            "INIT_S": "時",
-            # null 英
-            "INIT_BH": "文",
-            "INIT_GH": "語",
-            "INIT_C": "出",
-            "INIT_H": "喜",
-        }
-        return trdict[items[0].type]
-
-    def medial(self, items):
-        trdict = {
-            term: TERMINALS["medials"][term]["dieghv"]
-            for term in TERMINALS["medials"]
-            if "dieghv" in TERMINALS["medials"][term]
-        }
-        return trdict[items[0].type]
-
-    def coda(self, items):
-        return "".join([str(i) for i in items])
-
-    def codastops(self, items):
-        trdict = {
-            term: TERMINALS["codastops"][term]["dieghv"]
-            for term in TERMINALS["codastops"]
-            if "dieghv" in TERMINALS["codastops"][term]
-        }
-        trdict["COD_T"] = "g"  # Dieghv does not have stop -t
-        return trdict[items[0].type]
-
-    def codanasal(self, items):
-        trdict = {
-            term: TERMINALS["codanasals"][term]["dieghv"]
-            for term in TERMINALS["codanasals"]
-            if "dieghv" in TERMINALS["codanasals"][term]
-        }
-        trdict["COD_N"] = "ng"  # Dieghv does not have coda n
-        return trdict[items[0].type]
-
-    def final(self, items):
-        trdict = {
-            "ung": "君",
-            "uk": "君",
-            "ieng": "堅",  # additional to Xu
-            "iang": "堅",
-            "iek": "堅",  # additional to Xu
-            "iak": "堅",
-            "im": "金",
-            "ip": "金",
-            "ui": "歸",
-            "uih": "歸",
-            "ia": "佳",
-            "iah": "佳",
-            "ang": "干",
-            "ak": "干",
-            "ong": "公",
-            "ok": "公",
-            "uai": "乖",
-            "uain": "乖（鼻）",  # not in Xu, only in suain 'mango'
-            "uaih": "乖",
-            "eng": "經",
-            "ek": "經",
-            "ueng": "關",  # different from Xu
-            "uek": "關",  # different from Xu
-            "ou": "孤",
-            "ouh": "孤",
-            "iau": "驕",
-            "iou": "驕",
-            "ieu": "驕",
-            "iauh": "驕",
-            "iouh": "驕",
-            "ieuh": "驕",
-            "oi": "雞",
-            "oih": "雞",
-            "iong": "恭",
-            "iok": "恭",
-            "o": "高",
-            "oh": "高",
-            "ai": "皆",
-            "aih": "皆",
-            "ing": "斤",  # different from Xu
-            "ik": "斤",  # different from Xu
-            "ion": "薑",
-            "ionh": "薑",
-            "ien": "薑",
-            "ienh": "薑",
-            "am": "甘",
-            "ap": "甘",
-            "ua": "柯",
-            "uah": "柯",
-            "ang": "江",
-            "ak": "江",
-            "iam": "兼",
-            "iap": "兼",
-            "iem": "兼",
-            "iep": "兼",
-            "au": "交",
-            "auh": "交",
-            "e": "家",
-            "eh": "家",
-            "ue": "瓜",
-            "ueh": "瓜",
-            "a": "膠",
-            "ah": "膠",
-            "u": "龜",
-            "uh": "龜",
-            "vng": "扛",
-            "ng": "扛",
-            "vk": "扛",
-            "i": "枝",
-            "ih": "枝",
-            "iu": "鳩",
-            "iuh": "鳩",
-            "uan": "官",
-            "uanh": "官",
-            "v": "車",
-            "vh": "車",
-            "an": "柑",
-            "anh": "柑",
-            "en": "更",
-            "enh": "更",
-            "ia": "京",
-            "ian": "京（鼻）",
-            "iah": "京",
-            "ianh": "京（鼻）",
-            "io": "蕉",
-            "ioh": "蕉",
-            "ie": "蕉",
-            "ieh": "蕉",
-            "iang": "姜",
-            "iak": "姜",
-            "in": "天",
-            "inh": "天",
-            "uang": "光",
-            "uak": "光",
-            "oin": "間",
-            "oinh": "間",
-        }
-        pre = "".join([str(i) for i in items])
-        if pre in trdict:
-            return trdict[pre]
-        else:
-            return pre
-
-    def tone(self, items):
-        trdict = {
-            "1": "上平",
-            "2": "上上",
-            "3": "上去",
-            "4": "上入",
-            "5": "下平",
-            "6": "下上",
-            "7": "下去",
-            "8": "下入",
-        }
-        if len(items) >= 1:
-            # citation tone only
-            return trdict[str(items[0])]
-        else:
-            return ""
-
-    def syllable_tone(self, items):
+    initial_table = {
+        "INIT_L": "柳",
+        "INIT_N": "柳(n)",  # merged in Minnan/Hokkien
+        "INIT_B": "邊",
+        "INIT_M": "邊(m)",  # merged in Minnan/Hokkien
+        "INIT_G": "求",
+        "INIT_NG": "求(ng)",  # merged in Minnan/Hokkien
+        "INIT_K": "去",
+        "INIT_D": "地",
+        "INIT_P": "頗",
+        "INIT_T": "他",
+        "INIT_Z": "貞",
+        "INIT_R": "入",
+        "INIT_S": "時",
+        # null 英
+        "INIT_BH": "文",
+        "INIT_GH": "語",
+        "INIT_C": "出",
+        "INIT_H": "喜",
+    }
+    medial_table = "dieghv"
+    codanasal_table = "dieghv"
+    codastop_table = "dieghv"
+    extra_terminals = {
+        "COD_T": "g",  # Dieghv does not have stop -t
+        "COD_N": "ng",  # Dieghv does not have coda n
+    }
+    finals = {
+        "ung": "君",
+        "uk": "君",
+        "ieng": "堅",  # additional to Xu
+        "iang": "堅",
+        "iek": "堅",  # additional to Xu
+        "iak": "堅",
+        "im": "金",
+        "ip": "金",
+        "ui": "歸",
+        "uih": "歸",
+        "ia": "佳",
+        "iah": "佳",
+        "ang": "干",
+        "ak": "干",
+        "ong": "公",
+        "ok": "公",
+        "uai": "乖",
+        "uain": "乖（鼻）",  # not in Xu, only in suain 'mango'
+        "uaih": "乖",
+        "eng": "經",
+        "ek": "經",
+        "ueng": "關",  # different from Xu
+        "uek": "關",  # different from Xu
+        "ou": "孤",
+        "ouh": "孤",
+        "iau": "驕",
+        "iou": "驕",
+        "ieu": "驕",
+        "iauh": "驕",
+        "iouh": "驕",
+        "ieuh": "驕",
+        "oi": "雞",
+        "oih": "雞",
+        "iong": "恭",
+        "iok": "恭",
+        "o": "高",
+        "oh": "高",
+        "ai": "皆",
+        "aih": "皆",
+        "ing": "斤",  # different from Xu
+        "ik": "斤",  # different from Xu
+        "ion": "薑",
+        "ionh": "薑",
+        "ien": "薑",
+        "ienh": "薑",
+        "am": "甘",
+        "ap": "甘",
+        "ua": "柯",
+        "uah": "柯",
+        "ang": "江",
+        "ak": "江",
+        "iam": "兼",
+        "iap": "兼",
+        "iem": "兼",
+        "iep": "兼",
+        "au": "交",
+        "auh": "交",
+        "e": "家",
+        "eh": "家",
+        "ue": "瓜",
+        "ueh": "瓜",
+        "a": "膠",
+        "ah": "膠",
+        "u": "龜",
+        "uh": "龜",
+        "vng": "扛",
+        "ng": "扛",
+        "vk": "扛",
+        "i": "枝",
+        "ih": "枝",
+        "iu": "鳩",
+        "iuh": "鳩",
+        "uan": "官",
+        "uanh": "官",
+        "v": "車",
+        "vh": "車",
+        "an": "柑",
+        "anh": "柑",
+        "en": "更",
+        "enh": "更",
+        "ia": "京",
+        "ian": "京（鼻）",
+        "iah": "京",
+        "ianh": "京（鼻）",
+        "io": "蕉",
+        "ioh": "蕉",
+        "ie": "蕉",
+        "ieh": "蕉",
+        "iang": "姜",
+        "iak": "姜",
+        "in": "天",
+        "inh": "天",
+        "uang": "光",
+        "uak": "光",
+        "oin": "間",
+        "oinh": "間",
+    }
+    tones = {
+        "1": "上平",
+        "2": "上上",
+        "3": "上去",
+        "4": "上入",
+        "5": "下平",
+        "6": "下上",
+        "7": "下去",
+        "8": "下入",
+    }
+    # replace all syllable separators with spaces and separate syllables
+    # with spaces if no syllable separator is present
+    drop_hyphens = True
+
+    def render_syllable(self, syllab):
         # If the first character is not in the list of initials, then assume
         # this is a null-initial syllable, and add 英 character. Workaround
         # because null is not permissible as a regex.
-        if str(items[0])[0] not in Zapngou.INITS:
-            return "【" + "英" + "".join([str(i) for i in items]) + "】"
+        if syllab[0] not in Zapngou.INITS:
+            return "【" + "英" + syllab + "】"
         else:
-            return "【" + "".join([str(i) for i in items]) + "】"
+            return "【" + syllab + "】"
 
-    def syllable_toneless(self, items):
-        if str(items[0])[0] not in Zapngou.INITS:
-            return "【" + "英" + "".join([str(i) for i in items]) + "】"
-        else:
-            return "【" + "".join([str(i) for i in items]) + "】"
 
-    def word_sep(self, items):
-        # replace all syllable separators with spaces and separate syllables
-        # with spaces if no syllable separator is present
-        return "".join([i for i in items if i != "-"])
-
-    def sentence(self, items):
-        return "".join(items)
-
-class Tailo(Transformer):
+class Tailo(Renderer):
     """Convert Teochew pengim parse tree to Tai-lo (closest Taiwanese syllable)"""
     """ (mostly copied from Tlo) """
 
-    def NASAL(self, value):
-        return "nn"
-
-    def SYLLABLE_SEP(self, value):
-        # Change all syllable separators to hyphens
-        return "-"
-
-    def initial(self, items):
-        trdict = {
-            term: TERMINALS["initials"][term]["tailo"]
-            for term in TERMINALS["initials"]
-            if "tailo" in TERMINALS["initials"][term]
-        }
-        return trdict[items[0].type]
-
-    def medial(self, items):
-        trdict = {
-            term: TERMINALS["medials"][term]["tlo"]
-            for term in TERMINALS["medials"]
-            if "tailo" in TERMINALS["medials"][term]
-        }
-        return trdict[items[0].type]
-
-    def coda(self, items):
-        return "".join([str(i) for i in items])
-
-    def codastops(self, items):
-        trdict = {
-            term: TERMINALS["codastops"][term]["tlo"]
-            for term in TERMINALS["codastops"]
-            if "tailo" in TERMINALS["codastops"][term]
-        }
-        return trdict[items[0].type]
-
-    def codanasal(self, items):
-        trdict = {
-            term: TERMINALS["codanasals"][term]["tlo"]
-            for term in TERMINALS["codanasals"]
-            if "tailo" in TERMINALS["codanasals"][term]
-        }
-        return trdict[items[0].type]
-
-    def final(self, items):
-        return "".join([str(i) for i in items])
-
-    def tone(self, items):
-        # Only return the citation tone
-        return str(items[0])
-
-    def syllable_tone(self, items):
-        # Tie-lo is less straightforward because it marks
-        # tones with diacritics
-        trdict = {
-            "1": "",
-            "2": "\u0301",
-            "3": "\u0300",
-            "4": "",
-            "5": "\u0302",
-            "6": "\u0306",
-            "7": "\u0304",
-            "8": "\u030d",
-        }
-        # TODO put tone mark on first vowel letter else on first letter of final
-        syllab = "".join(items[:-1])  # syllable without tone
-        tone = items[-1]
-        firstvowel = re.search(r"[aeiou]", syllab)
-        if firstvowel:
-            # put tone mark on first vowel letter
-            inspos = firstvowel.span()[1]
-            syllab = syllab[0:inspos] + trdict[tone] + syllab[inspos:]
-        else:
-            # no vowel in syllable, put on first character
-            syllab = syllab[0] + trdict[tone] + syllab[1:]
-        return syllab
-
-    def syllable_toneless(self, items):
-        return "".join([str(i) for i in items])
-
-    def word_sep(self, items):
-        # replace all syllable separators with hyphens
-        # and separate syllables with hyphens if no
-        # syllable separator is present
-        return "-".join([i for i in items if i != "-"])
-
-    def sentence(self, items):
-        return "".join(items)
-
-
+    initial_table = "tailo"
+    # finals are spelled as in Tie-lo
+    medial_table = "tlo"
+    codanasal_table = "tlo"
+    codastop_table = "tlo"
+    nasal = "nn"
+    # Change all syllable separators to hyphens
+    syllable_sep = "-"
+    word_joiner = "-"
+    drop_hyphens = True
+    tone_marks = {
+        "1": "",
+        "2": "\u0301",
+        "3": "\u0300",
+        "4": "",
+        "5": "\u0302",
+        "6": "\u0306",
+        "7": "\u0304",
+        "8": "\u030d",
+    }
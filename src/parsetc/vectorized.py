@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from parsetc.ir import (
+    INITIALS,
+    MEDIALS,
+    CODAS,
+    TONES,
+    NO_TONE,
+    NASAL,
+    WORD_START,
+    SEP_SHIFT,
+    SYLLABLE_SEPS,
+    RECORD_SIZE,
+)
+from parsetc.translit import TERMINALS
+
+# Rendering of parsetc.ir Documents with NumPy, for large numbers of
+# syllables. Requires numpy, which is an optional dependency.
+
+
+class Columns:
+    """Syllables of several Documents as integer columns
+
+    Arguments
+    ---------
+    docs : list
+        parsetc.ir.Document objects, all in the same input scheme
+
+    Attributes
+    ----------
+    initial, medial, coda, tone, sandhi, flags : numpy.ndarray
+        Ids of each syllable, see parsetc.ir
+    doc_ends : numpy.ndarray
+        Index after the last syllable of each document
+    """
+
+    def __init__(self, docs):
+        docs = list(docs)
+        schemes = set(doc.scheme for doc in docs)
+        if len(schemes) > 1:
+            raise ValueError(f"Documents must be in one input scheme, got {', '.join(schemes)}")
+        self.scheme = schemes.pop() if schemes else None
+        records = np.frombuffer(
+            b"".join(doc.syllables.tobytes() for doc in docs), dtype=np.uint8
+        ).reshape(-1, RECORD_SIZE)
+        (
+            self.initial,
+            self.medial,
+            self.coda,
+            self.tone,
+            self.sandhi,
+            self.flags,
+        ) = records.T
+        self.doc_ends = np.cumsum([len(doc) for doc in docs], dtype=np.int64)
+        self.leading = [doc.separators[0] for doc in docs]
+        # text after each word, in the same order as the last syllables of
+        # the words
+        self.trailing = np.array(
+            [s for doc in docs for s in doc.separators[1:]], dtype=object
+        )
+
+    def __len__(self):
+        return len(self.initial)
+
+    def syllable_keys(self):
+        """Distinct syllables, and index of each syllable into them
+
+        Returns
+        -------
+        tuple
+            numpy.ndarray of distinct syllable keys, and of the index of each
+            syllable's key
+        """
+        key = self.initial.astype(np.int64)
+        for col in (self.medial, self.coda, self.tone, self.sandhi):
+            key = key * 256 + col
+        key = key * 2 + (self.flags & NASAL)
+        return np.unique(key, return_inverse=True)
+
+
+def _decode_key(key):
+    """Syllable parts from a key made by Columns.syllable_keys"""
+    nasal = key & 1
+    key >>= 1
+    parts = []
+    for _ in range(5):
+        parts.append(key & 255)
+        key >>= 8
+    sandhi, tone, coda, medial, initial = parts
+    return initial, medial, coda, tone, sandhi, nasal
+
+
+def _syllable_table(keys, renderer, nasal):
+    """Render each distinct syllable"""
+    table = np.empty(len(keys), dtype=object)
+    for n, key in enumerate(keys.tolist()):
+        initial, medial, coda, tone, sandhi, has_nasal = _decode_key(key)
+        table[n] = renderer.render_parts(
+            INITIALS[initial],
+            MEDIALS[medial],
+            nasal if has_nasal else None,
+            CODAS[coda],
+            None if tone == NO_TONE else TONES[tone],
+            None if sandhi == NO_TONE else TONES[sandhi],
+        )
+    return table
+
+
+def _joiner_table(renderer):
+    """Text between syllables of a word, by id of syllable separator"""
+    table = np.empty(len(SYLLABLE_SEPS), dtype=object)
+    for n, sep in enumerate(SYLLABLE_SEPS):
+        # join a word of empty syllables
+        items = ["", ""] if sep is None else ["", renderer.SYLLABLE_SEP(sep), ""]
+        table[n] = renderer.word_sep(items)
+    return table
+
+
+def render_all(docs, renderers):
+    """Render Documents with several output Renderers, vectorized
+
+    Each distinct syllable is rendered once per renderer with
+    `parsetc.translit.Renderer.render_parts`, and the output is assembled by
+    lookup in tables of rendered syllables and of text between syllables.
+
+    Arguments
+    ---------
+    docs : list or Columns
+        parsetc.ir.Document objects, all in the same input scheme
+    renderers : list
+        Output schemes, parsetc.translit.Renderer instances
+
+    Returns
+    -------
+    list
+        For each renderer, list of rendered text (str) for each document;
+        the same as `parsetc.ir.render_all`
+    """
+    cols = docs if isinstance(docs, Columns) else Columns(docs)
+    if len(cols) == 0:
+        return [[renderer.sentence([s]) for s in cols.leading] for renderer in renderers]
+    nasal = TERMINALS["nasal"]["NASAL"][cols.scheme]
+    keys, inverse = cols.syllable_keys()
+    word_end = np.empty(len(cols), dtype=bool)
+    word_end[:-1] = (cols.flags[1:] & WORD_START) != 0
+    word_end[-1] = True
+    sep_ids = cols.flags >> SEP_SHIFT
+    starts = np.concatenate(([0], cols.doc_ends[:-1]))
+    out = []
+    for renderer in renderers:
+        syllables = _syllable_table(keys, renderer, nasal)[inverse]
+        gaps = _joiner_table(renderer)[sep_ids]
+        gaps[word_end] = cols.trailing
+        pieces = syllables + gaps
+        rendered = []
+        for lead, start, end in zip(cols.leading, starts.tolist(), cols.doc_ends.tolist()):
+            rendered.append(renderer.sentence([lead] + pieces[start:end].tolist()))
+        out.append(rendered)
+    return out
+
+
+def render(docs, renderer):
+    """Render Documents with an output Renderer, see `render_all`"""
+    return render_all(docs, [renderer])[0]
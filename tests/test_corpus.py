@@ -0,0 +1,42 @@
+import pytest
+
+import parsetc.corpus as corpus
+import parsetc.parsetc as pt
+
+LINES = ["ua2 ain3 oh8 diê5ghe2,", "ain3 dan3 diê5ziu1 uê7."]
+
+
+def write(writer):
+    for line in LINES:
+        writer.add(pt.to_ir(line, i="gdpi", parser="scan"), line)
+
+
+def test_corpus(tmp_path):
+    path = str(tmp_path / "test.ptc")
+    with corpus.CorpusWriter(path, "gdpi") as writer:
+        write(writer)
+    with corpus.Corpus(path) as docs:
+        assert [text for doc, text, line_end in docs] == LINES
+        assert [pt.render(doc) for doc, text, line_end in docs] == [
+            pt.transliterate(line, parser="scan") for line in LINES
+        ]
+
+
+def test_corpus_error(tmp_path):
+    path = str(tmp_path / "test.ptc")
+    with pytest.raises(KeyboardInterrupt):
+        with corpus.CorpusWriter(path, "gdpi") as writer:
+            write(writer)
+            raise KeyboardInterrupt
+    with pytest.raises(ValueError, match="incomplete"):
+        corpus.Corpus(path)
+
+
+def test_corpus_not_closed(tmp_path):
+    path = str(tmp_path / "test.ptc")
+    writer = corpus.CorpusWriter(path, "gdpi")
+    write(writer)
+    # as if the process ended here
+    writer._file.close()
+    with pytest.raises(ValueError, match="incomplete"):
+        corpus.Corpus(path)
@@ -0,0 +1,70 @@
+import unicodedata
+
+import pytest
+
+import parsetc.diacritics as diacritics
+
+# Tie-lo with diacritics, and with tone numbers as converted by the original
+# parsetc.parsetc.tlo_convert_to_numeric
+TLO = [
+    # unmarked syllables are tone 1, or tone 4 with a stop; the neutral
+    # tone cannot be written, and is read the same way
+    ("a", "a1"),
+    ("ah", "ah4"),
+    ("á", "a2"),
+    ("áh", "ah2"),
+    ("à", "a3"),
+    ("âh", "ah8"),
+    ("â", "a5"),
+    ("ă", "a6"),
+    # combining caron, often used for the breve
+    ("ǎ", "a6"),
+    ("ā", "a7"),
+    # the Tai-lo tone 8 mark is tone 5 without a stop
+    ("a̍", "a5"),
+    ("a̍h", "ah8"),
+    ("úa àinn ôh tîe-gúr, àinn tànn tîe-tsiu ūe.", "ua2 ainn3 oh8 tie5-gur2, ainn3 tann3 tie5-tsiu1 ue7."),
+    ("i khía siang hó khùann, hûe-khúe!", "i1 khia2 siang1 ho2 khuann3, hue5-khue2!"),
+    ("gúr tang búr tsîah pūe ngŏu khueh?", "gur2 tang1 bur2 tsiah8 pue7 ngou6 khueh4?"),
+    ("tsi̍ah pn̄g, tsia̍h-pn̄g", "tsiah8 png7, tsiah8-png7"),
+    ("ńg hm̄ ĥng", "ng2 hm7 hng5"),
+    ("  hó 'ā'", "  ho2 'a7'"),
+]
+
+# Tai-lo differs only in the vertical line, which is always tone 8
+TAILO = [(text, numeric) for text, numeric in TLO if "̍" not in text] + [
+    ("a̍", "a8"),
+    ("a̍h", "ah8"),
+    ("tsi̍ah pn̄g", "tsiah8 png7"),
+    # neutral tone after a double hyphen
+    ("tsia̍h--ah", "tsiah8--ah4"),
+]
+
+
+def forms(text):
+    """Text with precomposed and with combining diacritics"""
+    return {unicodedata.normalize("NFC", text), unicodedata.normalize("NFD", text)}
+
+
+@pytest.mark.parametrize("text, numeric", TLO)
+def test_tlo(text, numeric):
+    for t in forms(text):
+        assert diacritics.to_numeric(t, "tlo") == numeric
+
+
+@pytest.mark.parametrize("text, numeric", TAILO)
+def test_tailo(text, numeric):
+    for t in forms(text):
+        assert diacritics.to_numeric(t, "tailo") == numeric
+
+
+def test_memo(monkeypatch):
+    memo = {}
+    monkeypatch.setitem(diacritics._MEMO, "tlo", memo)
+    monkeypatch.setattr(diacritics, "MEMO_SIZE", 10)
+    for _ in range(2):
+        # converted, then looked up in the memo
+        for text, numeric in TLO:
+            assert diacritics.to_numeric(text, "tlo") == numeric
+    # replaced when full
+    assert diacritics._MEMO["tlo"] is not memo
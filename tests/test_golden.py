@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+import parsetc.parsetc as pt
+
+# Output of the original Transformers of parsetc.translit, which rendered
+# parse trees before Renderers replaced them. Each line has the input scheme,
+# input text, output scheme and output, separated by tabs.
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden.tsv")
+
+
+def golden():
+    """Expected output by output scheme, for each input scheme and text"""
+    out = {}
+    with open(GOLDEN, encoding="utf8") as f:
+        for line in f:
+            i, text, o, expected = line.rstrip("\n").split("\t")
+            out.setdefault((i, text), {})[o] = expected
+    return out
+
+
+GOLDEN_OUTPUT = golden()
+
+
+def test_golden_covers_all_schemes():
+    assert {i for i, text in GOLDEN_OUTPUT} == set(pt.INPUT_SCHEMES)
+    for expected in GOLDEN_OUTPUT.values():
+        assert list(expected) == list(pt.TRANSFORMER_DICT)
+
+
+@pytest.mark.parametrize("parser", ["earley", "lalr", "scan"])
+@pytest.mark.parametrize("i, text", list(GOLDEN_OUTPUT))
+def test_golden_output(i, text, parser):
+    expected = GOLDEN_OUTPUT[(i, text)]
+    assert dict(pt.transliterate_all(text, i=i, parser=parser)) == expected
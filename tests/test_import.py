@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+# Most time importing parsetc.parsetc may take, in seconds. Building all
+# parsers at import took about 0.6 s, importing without building about 0.1 s
+IMPORT_BUDGET = 0.5
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def run_python(*args):
+    """Run Python in a new process, with parsetc from this source tree"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC, env.get("PYTHONPATH")]))
+    return subprocess.run(
+        [sys.executable, *args],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+def import_seconds(module):
+    """Cumulative time to import module, from python -X importtime"""
+    result = run_python("-X", "importtime", "-c", f"import {module}")
+    for line in result.stderr.splitlines():
+        fields = [f.strip() for f in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1e6
+    raise AssertionError(f"{module} not found in import times")
+
+
+def test_import_builds_nothing():
+    code = """
+import parsetc.parsetc as pt
+
+registries = [
+    pt.LARK_DICT,
+    pt.LALR_LARK_DICT,
+    pt.PARSER_DICT,
+    pt.LALR_PARSER_DICT,
+    pt.SCANNER_DICT,
+    pt.SEGMENTER_DICT,
+    pt.TRANSFORMER_DICT,
+]
+print(sum(r.is_built(k) for r in registries for k in r))
+"""
+    assert run_python("-c", code).stdout.strip() == "0"
+
+
+def test_import_time_budget():
+    # best of a few runs, so that a busy machine does not fail the test
+    seconds = min(import_seconds("parsetc.parsetc") for _ in range(3))
+    assert seconds < IMPORT_BUDGET, f"importing took {seconds:.3f} s"
@@ -0,0 +1,57 @@
+import pytest
+
+from lark.exceptions import LarkError
+
+import parsetc.parsetc as pt
+
+# Punctuation, a hyphenated word, a word that is not gdpi and a hyphenated
+# word with a part that is not gdpi
+LINE = "ua2 ain3 xqz7, diê5-ghe2 (kuê2-xx9)!"
+
+EXPECTED = {
+    "skip": "úa àinn , tîe-gúr ()!",
+    "mark": "úa àinn ⟦xqz7⟧, tîe-gúr (⟦kuê2-xx9⟧)!",
+    "passthrough": "úa àinn xqz7, tîe-gúr (kuê2-xx9)!",
+}
+
+# Converts without errors
+GOOD_LINE = "ua2 ain3 oh8, diê5-ghe2 (kuê2-ziu1)!"
+
+PARSERS = ["earley", "lalr", "scan"]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("on_error", list(EXPECTED))
+def test_on_error(on_error, parser):
+    out = pt.transliterate(LINE, i="gdpi", o="tlo", parser=parser, on_error=on_error)
+    assert out == EXPECTED[on_error]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_on_error_raise(parser):
+    with pytest.raises(LarkError):
+        pt.transliterate(LINE, i="gdpi", o="tlo", parser=parser, on_error="raise")
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("on_error", pt.ON_ERROR)
+def test_on_error_good_line(on_error, parser):
+    # word by word gives the same as parsing the whole line
+    expected = pt.transliterate_all(GOOD_LINE, i="gdpi", parser=parser)
+    out = pt.transliterate_all(GOOD_LINE, i="gdpi", parser=parser, on_error=on_error)
+    assert out == expected
+
+
+def test_on_error_word_cache():
+    pt.enable_word_cache(100)
+    try:
+        for _ in range(2):
+            out = pt.transliterate(LINE, parser="scan", on_error="mark")
+            assert out == EXPECTED["mark"]
+    finally:
+        pt.disable_word_cache()
+
+
+def test_unknown_on_error():
+    with pytest.raises(ValueError):
+        pt.convert_words(LINE, on_error="ignore")
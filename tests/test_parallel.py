@@ -0,0 +1,25 @@
+import pytest
+
+import parsetc.parsetc as pt
+
+LINES = ["ua2 ai3 ziah8", "ghe2 dang1"]
+
+# not a syllable of gdpi
+BAD_LINE = "xx"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_transliterate_many(workers):
+    out = pt.transliterate_many(LINES, parser="scan", workers=workers, chunksize=1)
+    assert list(out) == [pt.transliterate(line, parser="scan") for line in LINES]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_transliterate_many_error(workers):
+    lines = LINES[:1] + [BAD_LINE] + LINES[1:]
+    out = pt.transliterate_many(lines, parser="scan", workers=workers, chunksize=1)
+    # lines before the one that fails are converted
+    assert next(out) == pt.transliterate(LINES[0], parser="scan")
+    with pytest.raises(pt.ConversionError) as e:
+        next(out)
+    assert e.value.index == 1
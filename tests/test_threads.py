@@ -0,0 +1,154 @@
+import itertools
+import random
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import parsetc.diacritics as diacritics
+import parsetc.parsetc as pt
+
+from parsetc.registry import Registry
+
+# Threads converting at the same time
+THREADS = 16
+
+# Times each conversion is repeated by the threads
+REPEAT = 4
+
+PARSERS = ["earley", "lalr", "scan"]
+
+# Lines of each input scheme, with tone numbers, that all output schemes can
+# render
+SAMPLES = {
+    "dieghv": [
+        "ain3 cua7 ho2bhou2 kv3 gang3suan1",
+        "da2bang3 ri5hu5 kv3 zo3guan1",
+    ],
+    "gdpi": [
+        "ua2 ain3 oh8 diê5ziu1, ain3 dan3 diê5ziu1 uê7.",
+        "i1 kia2 siang1 ho2 kuan3, huê5-kuê2!",
+    ],
+    "ggn": [
+        "ua2 ain3 oh8 die5jiu1, ain3 dan3 die5jiu1 ue7.",
+        "i1 kia2 siang1 ho2 kuan3, hue5-kue2!",
+    ],
+    "ggnn": [
+        "ua2 ain3 oh8 die5jiu1, ain3 dan3 die5jiu1 ue7.",
+        "i1 kia2 siang1 ho2 kuan3, hue5-kue2!",
+    ],
+    "tlo": [
+        "ua2 ainn3 oh8 tie5-tsiu1, ainn3 tann3 tie5-tsiu1 ue7.",
+        "i1 khia2 siang1 ho2 khuann3, hue5-khue2!",
+    ],
+    "tailo": [
+        "ua2 ainn3 oh8 tie5-tsiu1, ainn3 tann3 tie5-tsiu1 ue7.",
+        "i1 khia2 siang1 ho2 khuann3, hue5-khue2!",
+    ],
+}
+
+# Lines with tone diacritics
+DIACRITICS = {
+    "tlo": [
+        "úa àinn ôh tîe-tsiu, àinn tànn tîe-tsiu ūe.",
+        "i khía siang hó khùann, hûe-khúe!",
+        "gúr tang búr tsîah pūe ngŏu khueh",
+    ],
+    "tailo": [
+        "úa àinn o̍h tîe-tsiu, àinn tànn tîe-tsiu ūe.",
+        "i khía siang hó khùann, hûe-khúe!",
+        "gúr tang búr tsi̍ah pūe ngŏu khueh",
+    ],
+}
+
+# Registries of parsetc.parsetc that are built when first used
+REGISTRIES = [
+    "LARK_DICT",
+    "LALR_LARK_DICT",
+    "PARSER_DICT",
+    "LALR_PARSER_DICT",
+    "SCANNER_DICT",
+    "SEGMENTER_DICT",
+    "TRANSFORMER_DICT",
+]
+
+
+@pytest.fixture
+def cold(monkeypatch):
+    """Replace the registries with new ones, so that nothing is built yet"""
+    for name in REGISTRIES:
+        monkeypatch.setattr(pt, name, Registry(getattr(pt, name)._factories))
+    for scheme in diacritics.SCHEMES:
+        monkeypatch.setitem(diacritics._MEMO, scheme, {})
+
+
+def built():
+    return [
+        (name, key)
+        for name in REGISTRIES
+        for key in getattr(pt, name)
+        if getattr(pt, name).is_built(key)
+    ]
+
+
+def tasks():
+    """Lines of every input scheme, to parse with each parser"""
+    return [
+        (scheme, parser, line)
+        for scheme, lines in SAMPLES.items()
+        for parser in PARSERS
+        for line in lines
+    ]
+
+
+def convert(task):
+    scheme, parser, line = task
+    return pt.transliterate_all(line, i=scheme, parser=parser)
+
+
+def hammer(fn, items):
+    """Run fn on each item REPEAT times, from THREADS threads in random order
+
+    Returns
+    -------
+    dict
+        All results of fn for each item
+    """
+    jobs = list(itertools.chain.from_iterable([items] * REPEAT))
+    random.Random(0).shuffle(jobs)
+    results = {}
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        for item, result in zip(jobs, pool.map(fn, jobs)):
+            results.setdefault(item, []).append(result)
+    return results
+
+
+def check(fn, items):
+    # parsers and transformers are built by the threads, concurrently
+    assert built() == []
+    results = hammer(fn, items)
+    for item in items:
+        expected = fn(item)
+        assert results[item] == [expected] * REPEAT, item
+
+
+def test_transliterate_all_from_threads(cold):
+    check(convert, tasks())
+
+
+def test_word_cache_from_threads(cold):
+    pt.enable_word_cache(1000)
+    try:
+        check(convert, tasks())
+    finally:
+        pt.disable_word_cache()
+
+
+def test_diacritics_from_threads(cold):
+    items = [(scheme, line) for scheme, lines in DIACRITICS.items() for line in lines]
+
+    def to_numeric(item):
+        scheme, text = item
+        return diacritics.to_numeric(text, scheme)
+
+    check(to_numeric, items)